@@ -0,0 +1,115 @@
+''' This file contains the analysis functions that compute results without rendering them.
+They are shared by the Streamlit app (data_analysis_functions.py draws their results) and by the command line
+entry point in cli.py, and do not import streamlit. Results are memoized on the dataset version (see memo.py).
+'''
+
+import numpy as np
+import pandas as pd
+
+import memo
+import profiling
+
+# Most frequent values of each column listed in a report
+REPORT_TOP_VALUES = 10
+
+
+# Function to find categorical and numerical columns/variables in dataset
+# Without a profile each column is scanned only until it shows more than 30 distinct values
+@memo.memoize
+def categorical_numerical(df, profile=None):
+    if profile is None:
+        return profiling.classify_columns(df)
+    return profile.categorical_numerical()
+
+
+# Function to profile a single column, for the exact statistics of one feature when there is no dataset profile
+@memo.memoize
+def column_profile(df, column):
+    return profiling.profile_dataset(df[[column]]).columns[column]
+
+
+# Function to count the missing values of every column
+@memo.memoize
+def missing_value_counts(df):
+    return profiling.null_counts(df)
+
+
+# Function to find the columns of the given dtypes, e.g. ['number']
+@memo.memoize
+def columns_of_type(df, include):
+    return df.select_dtypes(include=include).columns
+
+
+# Function to find the columns with missing values, most missing first
+@memo.memoize
+def missing_values_summary(df, profile=None):
+    profile = profile or profiling.profile_dataset(df)
+    missing_data = profile.missing_summary()
+    return missing_data[missing_data['Missing Count'] > 0].sort_values(by='Missing Count', ascending=False)
+
+
+# Value counts and grouped means give the same result on every query engine, so the engine is not part of the key.
+# With `source`, the path of the file `df` was read from, the engine reads only the columns it needs from the file
+# (and every row of it, when `df` is a sample of the file)
+@memo.memoize(ignore=("backend",))
+def value_counts(df, column, backend, source=None):
+    return backend.value_counts(df if source is None else source, column)
+
+
+@memo.memoize(ignore=("backend",))
+def group_mean(df, by, column, backend, source=None):
+    return backend.group_mean(df if source is None else source, by, column)
+
+
+# Function to turn numpy and pandas scalars into plain python values, missing values into None
+def plain(value):
+    if isinstance(value, (np.generic, pd.Timestamp, pd.Timedelta)):
+        value = value.item() if isinstance(value, np.generic) else str(value)
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+# Function to build the report of a profiled dataset: the overview, missing values and statistics of the
+# Dataset Overview tab as plain python values, ready to be written as json or html
+def build_report(profile, name=None, top_values=REPORT_TOP_VALUES):
+    columns = []
+    for col, column in profile.columns.items():
+        entry = {
+            "name": str(col),
+            "dtype": str(column.dtype),
+            "kind": "categorical" if column.is_categorical else "numerical",
+            "count": int(column.count),
+            "missing": int(column.null_count),
+            "missing_percentage": plain(100 * column.null_count / profile.n_rows) if profile.n_rows else 0.0,
+            "distinct": int(column.cardinality),
+            "approximate": col in profile.approximate_columns,
+        }
+        if col in profile.numeric_summary.columns:
+            entry.update({
+                "mean": plain(column.mean),
+                "std": plain(column.std),
+                "min": plain(column.min),
+                "max": plain(column.max),
+                "quantiles": {f"{q:.0%}": plain(value) for q, value in column.quantiles.items()},
+            })
+        if column.top_values is not None:
+            entry["top_values"] = [{"value": plain(value), "count": int(count)} for value, count in column.top_values.head(top_values).items()]
+        columns.append(entry)
+
+    return {
+        "dataset": {
+            "name": name,
+            "rows": int(profile.n_rows),
+            "columns": int(profile.n_columns),
+            "duplicate_rows": plain(profile.duplicate_rows),
+            "approximate": profile.approximate,
+            "categorical_columns": [entry["name"] for entry in columns if entry["kind"] == "categorical"],
+            "numerical_columns": [entry["name"] for entry in columns if entry["kind"] == "numerical"],
+        },
+        "columns": columns,
+    }
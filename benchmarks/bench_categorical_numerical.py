@@ -0,0 +1,76 @@
+''' Benchmark of the column classification used by categorical_numerical.
+Compares the original loop, which materializes df[col].unique() for every column, with the early-exit
+classification in profiling.classify_columns, on wide and tall synthetic frames.
+
+Run from the repository root:  python benchmarks/bench_categorical_numerical.py
+'''
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import profiling
+
+
+# The classification loop as it was before the early-exit path, kept here as the reference
+def legacy_categorical_numerical(df):
+    num_columns, cat_columns = [], []
+    for col in df.columns:
+        if len(df[col].unique()) <= 30 or df[col].dtype == np.object_:
+            cat_columns.append(col.strip())
+        else:
+            num_columns.append(col.strip())
+    return num_columns, cat_columns
+
+
+# Function to build a synthetic frame cycling through high-cardinality ids, floats, low-cardinality codes and strings
+def synthetic_frame(rows, columns, seed=0):
+    rng = np.random.default_rng(seed)
+    data = {}
+    for i in range(columns):
+        kind = i % 4
+        if kind == 0:
+            data[f"id_{i}"] = rng.permutation(rows)
+        elif kind == 1:
+            data[f"value_{i}"] = rng.normal(size=rows)
+        elif kind == 2:
+            data[f"code_{i}"] = rng.integers(0, 12, size=rows)
+        else:
+            # object dtype on purpose, pandas 3 would otherwise infer its str dtype
+            data[f"key_{i}"] = pd.Series(rng.integers(0, rows, size=rows).astype(str), dtype=object)
+    return pd.DataFrame(data)
+
+
+def best_of(function, df, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shapes", default="1000000x8,200000x80,20000x800", help="comma separated ROWSxCOLUMNS grid")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'shape':>14} {'legacy (s)':>11} {'early exit (s)':>15} {'speedup':>8}")
+    for shape in args.shapes.split(","):
+        rows, columns = (int(part) for part in shape.lower().split("x"))
+        df = synthetic_frame(rows, columns)
+        legacy_time, legacy_result = best_of(legacy_categorical_numerical, df, args.repeat)
+        new_time, new_result = best_of(profiling.classify_columns, df, args.repeat)
+        assert legacy_result == new_result, "classifications differ"
+        print(f"{shape:>14} {legacy_time:>11.3f} {new_time:>15.3f} {legacy_time / new_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+''' Benchmark of outlier detection and handling.
+Compares the original list comprehension versions of detect_outliers_iqr / detect_outliers_zscore followed by
+an isin() removal with the vectorized masks in data_preprocessing_function.
+
+Run from the repository root:  python benchmarks/bench_outliers.py --rows 1000000,10000000
+'''
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import data_preprocessing_function as preprocessing_function
+
+
+# The detection functions as they were before the vectorized engine, kept here as the reference
+def legacy_detect_outliers_iqr(df, column_name):
+    data = df[column_name]
+    q25, q50, q75 = np.percentile(data, [25, 50, 75])
+    iqr = q75 - q25
+    lower_bound = q25 - 1.5 * iqr
+    upper_bound = q75 + 1.5 * iqr
+    outliers = [x for x in data if x < lower_bound or x > upper_bound]
+    outliers.sort()
+    return outliers
+
+
+def legacy_detect_outliers_zscore(df, column_name):
+    data = df[column_name]
+    z_scores = np.abs(stats.zscore(data))
+    threshold = 3
+    outliers = [data[i] for i in range(len(data)) if z_scores[i] > threshold]
+    return outliers
+
+
+def legacy_remove_outliers(df, column_name, outliers):
+    return df[~df[column_name].isin(outliers)]
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="100000,1000000", help="comma separated row counts")
+    parser.add_argument("--skip-legacy-above", type=int, default=2_000_000, help="do not run the legacy loops on larger columns")
+    args = parser.parse_args()
+
+    print(f"{'rows':>11} {'method':>7} {'legacy (s)':>11} {'vectorized (s)':>15} {'speedup':>8} {'outliers':>9}")
+    for rows in (int(value) for value in args.rows.split(",")):
+        rng = np.random.default_rng(0)
+        # heavy tailed values so that every method finds outliers
+        df = pd.DataFrame({"value": rng.standard_t(3, size=rows), "group": rng.integers(0, 8, size=rows)})
+
+        for method, legacy in (("iqr", legacy_detect_outliers_iqr), ("zscore", legacy_detect_outliers_zscore), ("mad", None)):
+            new_time, outliers = timed(lambda: preprocessing_function.remove_outliers(df, "value", preprocessing_function.detect_outliers(df, "value", method)))
+            removed = rows - len(outliers)
+            if legacy is None or rows > args.skip_legacy_above:
+                print(f"{rows:>11} {method:>7} {'-':>11} {new_time:>15.3f} {'-':>8} {removed:>9}")
+                continue
+            legacy_time, _ = timed(lambda: legacy_remove_outliers(df, "value", legacy(df, "value")))
+            print(f"{rows:>11} {method:>7} {legacy_time:>11.3f} {new_time:>15.3f} {legacy_time / new_time:>7.1f}x {removed:>9}")
+
+        grouped_time, grouped = timed(preprocessing_function.detect_outliers_iqr, df, "value", 1.5, "group")
+        print(f"{rows:>11} {'iqr/grp':>7} {'-':>11} {grouped_time:>15.3f} {'-':>8} {int(grouped.mask.sum()):>9}")
+
+
+if __name__ == "__main__":
+    main()
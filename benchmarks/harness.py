@@ -0,0 +1,395 @@
+''' Benchmark harness of the analysis and preprocessing functions.
+Builds synthetic frames over a grid of row counts, column counts, null rates and cardinalities, with float, integer,
+categorical, text, boolean and datetime columns, and times every function of data_analysis_functions and
+data_preprocessing_function on each frame. The Streamlit calls are replaced by a stub whose widgets return their
+default value and whose buttons are all pressed, so the work behind every button is measured without a server.
+Each function is timed over --repeat runs with the memo and figure caches bypassed, and its peak memory is
+measured in a separate run with tracemalloc.
+
+Results are written as a json baseline. Passing --baseline compares the run with an earlier one and exits with
+status 1 when a function got slower or uses more memory than the threshold allows:
+
+    python benchmarks/harness.py --rows 10000,1000000 --columns 10,100 -o baseline.json
+    python benchmarks/harness.py --rows 10000,1000000 --columns 10,100 -o new.json --baseline baseline.json
+    python benchmarks/harness.py --compare baseline.json new.json
+
+Grid points with more than --max-cells cells are skipped, raise it to reach 1e8 rows or 2000 columns on a machine
+with the memory for them.
+
+Run from the repository root:  python benchmarks/harness.py
+'''
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+import data_analysis_functions as analysis_functions
+import data_preprocessing_function as preprocessing_function
+import jobs
+import memo
+import profiling
+
+# Column kinds of the synthetic frames, repeated in this order up to the number of columns
+COLUMN_KINDS = ("float", "int", "category", "text", "bool", "datetime")
+
+# Functions that read uploaded files rather than frames, they are covered by the loader benchmarks
+NOT_BENCHMARKED = {"load_data", "load_data_optimized", "load_data_partitioned", "load_data_streaming"}
+# Column transforms and detection rules measured through the frame level functions that run them
+MEASURED_BY_CALLERS = {
+    "fill_column", "label_encode_column", "standard_scale_column", "min_max_scale_column",
+    "detect_outliers_iqr", "detect_outliers_zscore", "detect_outliers_mad",
+}
+
+
+# Function to build a frame of `rows` rows and `columns` columns. Integer, categorical and text columns take
+# `cardinality` distinct values, every column but the boolean ones has a share `null_rate` of missing values
+def synthetic_frame(rows, columns, null_rate, cardinality, seed=0):
+    rng = np.random.default_rng(seed)
+    labels = np.array([f"value_{i}" for i in range(cardinality)], dtype=object)
+    data = {}
+    for i in range(columns):
+        kind = COLUMN_KINDS[i % len(COLUMN_KINDS)]
+        name = f"{kind}_{i}"
+        if kind == "float":
+            values = pd.Series(rng.standard_t(3, size=rows))
+        elif kind == "int":
+            values = pd.Series(rng.integers(0, cardinality, size=rows)).astype("Int64")
+        elif kind == "category":
+            values = pd.Series(pd.Categorical(labels[rng.integers(0, cardinality, size=rows)]))
+        elif kind == "text":
+            values = pd.Series(labels[rng.integers(0, cardinality, size=rows)], dtype="str")
+        elif kind == "bool":
+            data[name] = rng.random(rows) < 0.5
+            continue
+        else:
+            values = pd.Series(pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 1_000_000, size=rows), unit="s"))
+        if null_rate > 0:
+            values = values.mask(rng.random(rows) < null_rate)
+        data[name] = values
+    return pd.DataFrame(data)
+
+
+class StreamlitStub:
+    '''Stands in for the streamlit module. Output calls do nothing, widgets return their default value unless
+    `choices` maps their label to another one, and buttons are pressed.'''
+
+    def __init__(self, choices=None):
+        self.choices = choices or {}
+        self.session_state = {}
+
+    def _choose(self, label, default):
+        return self.choices.get(label, default)
+
+    def selectbox(self, label, options, index=0, **kwargs):
+        options = list(options)
+        return self._choose(label, options[index] if options else None)
+
+    def multiselect(self, label, options, default=None, **kwargs):
+        return self._choose(label, list(default) if default is not None else [])
+
+    def slider(self, label, min_value=None, max_value=None, value=None, **kwargs):
+        return self._choose(label, min_value if value is None else value)
+
+    def number_input(self, label, min_value=None, max_value=None, value=None, **kwargs):
+        return self._choose(label, min_value if value is None else value)
+
+    def text_input(self, label, value="", **kwargs):
+        return self._choose(label, value)
+
+    def checkbox(self, label, value=False, **kwargs):
+        return self._choose(label, value)
+
+    def button(self, label, **kwargs):
+        return self._choose(label, True)
+
+    # fragments run once, in place
+    def fragment(self, func=None, **kwargs):
+        return func if func is not None else (lambda func: func)
+
+    def columns(self, spec, **kwargs):
+        return [self] * (spec if isinstance(spec, int) else len(spec))
+
+    def tabs(self, labels):
+        return [self] * len(labels)
+
+    def expander(self, *args, **kwargs):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __getattr__(self, name):
+        return self._ignore
+
+    def _ignore(self, *args, **kwargs):
+        return None
+
+
+# Every benchmarked call: (label, module, function name, widget choices, call). The call takes the context of the
+# frame, a dict with the frame, its profile and its columns. A label names the function and the variant it runs
+def _specs():
+    exploring = analysis_functions
+    preparing = preprocessing_function
+    specs = [
+        ("display_dataset_overview", exploring, "display_dataset_overview", {}, lambda c: exploring.display_dataset_overview(c["df"], c["cat"], c["num"], c["profile"])),
+        ("display_missing_values", exploring, "display_missing_values", {}, lambda c: exploring.display_missing_values(c["df"], c["profile"])),
+        ("display_statistics_visualization", exploring, "display_statistics_visualization", {}, lambda c: exploring.display_statistics_visualization(c["df"], c["cat"], c["num"], c["profile"])),
+        ("display_data_types", exploring, "display_data_types", {}, lambda c: exploring.display_data_types(c["df"], c["profile"])),
+        ("search_column", exploring, "search_column", {}, lambda c: exploring.search_column(c["df"])),
+        ("display_preview", exploring, "display_preview", {}, lambda c: exploring.display_preview(c["df"], key="preview")),
+        ("display_preview[sorted, filtered]", exploring, "display_preview", {"Sort By": "float_0", "Filter Column": "float_0", "Filter Value": ">0"},
+         lambda c: exploring.display_preview(c["df"], key="preview")),
+        ("display_sample_estimates", exploring, "display_sample_estimates", {}, lambda c: exploring.display_sample_estimates(c["sample"], c["num"][0])),
+        ("display_scatter_plot_of_two_numeric_features", exploring, "display_scatter_plot_of_two_numeric_features", {}, lambda c: exploring.display_scatter_plot_of_two_numeric_features(c["df"], c["num"])),
+        ("categorical_numerical_variable_analysis", exploring, "categorical_numerical_variable_analysis", {}, lambda c: exploring.categorical_numerical_variable_analysis(c["df"], c["cat"], c["num"])),
+        ("categorical_numerical_variable_analysis[sample]", exploring, "categorical_numerical_variable_analysis", {}, lambda c: exploring.categorical_numerical_variable_analysis(c["df"], c["cat"], c["num"], sample=c["sample"])),
+    ]
+    for plot_type in ("Histogram", "Scatter Plot", "Density Plot", "Box Plot"):
+        specs.append((f"display_individual_feature_distribution[{plot_type}]", exploring, "display_individual_feature_distribution", {"Select Plot Type": plot_type},
+                      lambda c: exploring.display_individual_feature_distribution(c["df"], c["num"], c["profile"])))
+    for plot_type in ("Bar Chart", "Pie Chart", "Stacked Bar Chart", "Frequency Count"):
+        specs.append((f"categorical_variable_analysis[{plot_type}]", exploring, "categorical_variable_analysis", {"Select Plot Type": plot_type},
+                      lambda c: exploring.categorical_variable_analysis(c["df"], c["cat"])))
+    buttons = ("Generate Scatter Plot Matrix", "Generate Pair Plot", "Generate Correlation Heatmap")
+    for button in buttons:
+        choices = {other: other == button for other in buttons}
+        specs.append((f"feature_exploration_numerical_variables[{button[len('Generate '):]}]", exploring, "feature_exploration_numerical_variables", choices,
+                      lambda c: exploring.feature_exploration_numerical_variables(c["df"], c["num"])))
+
+    # frames are passed as shallow copies to the functions that assign columns, copy on write keeps the original intact
+    specs += [
+        ("remove_selected_columns", preparing, "remove_selected_columns", {}, lambda c: preparing.remove_selected_columns(c["df"], c["cat"][:1])),
+        ("remove_rows_with_missing_data", preparing, "remove_rows_with_missing_data", {}, lambda c: preparing.remove_rows_with_missing_data(c["df"], list(c["df"].columns))),
+        ("one_hot_encode", preparing, "one_hot_encode", {}, lambda c: preparing.one_hot_encode(c["df"], c["low_cardinality"][:2])),
+        ("label_encode", preparing, "label_encode", {}, lambda c: preparing.label_encode(c["df"].copy(deep=False), c["labels"])),
+        ("standard_scale", preparing, "standard_scale", {}, lambda c: preparing.standard_scale(c["df"].copy(deep=False), c["num"])),
+        ("min_max_scale", preparing, "min_max_scale", {}, lambda c: preparing.min_max_scale(c["df"].copy(deep=False), c["num"])),
+        ("remove_outliers", preparing, "remove_outliers", {}, lambda c: preparing.remove_outliers(c["df"], c["num"][0], c["outliers"])),
+        ("transform_outliers", preparing, "transform_outliers", {}, lambda c: preparing.transform_outliers(c["df"].copy(deep=False), c["num"][0], c["outliers"])),
+    ]
+    for method in ("mean", "median", "mode"):
+        specs.append((f"fill_missing_data[{method}]", preparing, "fill_missing_data", {}, lambda c, method=method: preparing.fill_missing_data(c["df"].copy(deep=False), c["num"], method)))
+    for method in ("iqr", "zscore", "mad"):
+        specs.append((f"detect_outliers[{method}]", preparing, "detect_outliers", {}, lambda c, method=method: preparing.detect_outliers(c["df"], c["num"][0], method)))
+        specs.append((f"detect_outliers[{method}, by group]", preparing, "detect_outliers", {}, lambda c, method=method: preparing.detect_outliers(c["df"], c["num"][0], method, c["low_cardinality"][0])))
+    return specs
+
+
+def _public_functions(module):
+    return {
+        name for name, value in vars(module).items()
+        if callable(value) and not name.startswith("_") and getattr(value, "__module__", None) == module.__name__ and not isinstance(value, type)
+    }
+
+
+# Function to list the public functions of both modules that no spec calls, so new functions are not silently left out
+def uncovered_functions(specs):
+    covered = {(module.__name__, name) for _, module, name, _, _ in specs}
+    missing = []
+    for module in (analysis_functions, preprocessing_function):
+        for name in sorted(_public_functions(module) - NOT_BENCHMARKED - MEASURED_BY_CALLERS):
+            if (module.__name__, name) not in covered:
+                missing.append(f"{module.__name__}.{name}")
+    return missing
+
+
+# Function to gather what the calls of one frame need. Not part of the measured time, as the app computes these
+# once per dataset
+def frame_context(df):
+    profile = profiling.profile_dataset(df).compute()
+    num, cat = profile.categorical_numerical()
+    # datetime columns are classified as numerical, the statistics and correlations only take numbers
+    num = [column for column in num if pd.api.types.is_numeric_dtype(df[column])]
+    low_cardinality = [column for column in cat if profile.cardinality(column) <= 1000] or cat
+    return {
+        "df": df,
+        "profile": profile,
+        "num": num,
+        "cat": cat,
+        "low_cardinality": low_cardinality,
+        # the encoders take the text columns and the categorical columns without missing values
+        "labels": [column for column in cat if str(df[column].dtype) in ("str", "string", "object", "category")],
+        "outliers": preprocessing_function.detect_outliers.uncached(df, num[0], "zscore") if num else None,
+        "sample": analysis_functions.sampling.random_sample.uncached(df, min(len(df), analysis_functions.sampling.DEFAULT_SAMPLE_ROWS)),
+    }
+
+
+def _run(call, context):
+    # a new version makes every memoized result and cached figure of the frame a miss
+    memo.invalidate(context["df"])
+    call(context)
+    # the long exploration actions run as background jobs, they are part of the call
+    jobs.job_runner.wait()
+    plt.close("all")
+
+
+# Function to time a call `repeat` times and measure its peak traced memory in one more run
+def measure(call, context, repeat):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _run(call, context)
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        _run(call, context)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"min_seconds": min(seconds), "median_seconds": statistics.median(seconds), "peak_bytes": peak}
+
+
+def result_key(result):
+    return f"{result['function']}|rows={result['rows']}|columns={result['columns']}|null_rate={result['null_rate']}|cardinality={result['cardinality']}"
+
+
+def run_grid(args, specs):
+    results = []
+    for rows, columns, null_rate, cardinality in itertools.product(args.rows, args.columns, args.null_rates, args.cardinalities):
+        if rows * columns > args.max_cells:
+            print(f"skipping {rows} x {columns}: more than {args.max_cells} cells", file=sys.stderr)
+            continue
+        df = synthetic_frame(rows, columns, null_rate, cardinality, args.seed)
+        context = frame_context(df)
+        print(f"{rows} rows x {columns} columns, null rate {null_rate}, cardinality {cardinality}", file=sys.stderr)
+
+        for label, module, _, choices, call in specs:
+            if args.functions and not any(pattern in label for pattern in args.functions):
+                continue
+            result = {"function": label, "rows": rows, "columns": columns, "null_rate": null_rate, "cardinality": cardinality}
+            module.st = StreamlitStub(choices)
+            try:
+                result.update(measure(call, context, args.repeat))
+                print(f"  {label:<60} {result['min_seconds']:>9.3f} s {result['peak_bytes'] / 2**20:>9.1f} MB", file=sys.stderr)
+            except Exception as error:
+                # a failing function is recorded, the comparison reports functions that stopped working
+                result["error"] = f"{type(error).__name__}: {error}"
+                print(f"  {label:<60} error: {result['error']}", file=sys.stderr)
+            results.append(result)
+        del df, context
+    return results
+
+
+def environment():
+    import numpy
+    import streamlit
+    return {
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pandas": pd.__version__,
+        "numpy": numpy.__version__,
+        "streamlit": streamlit.__version__,
+    }
+
+
+# Function to compare two result files. A function regressed when it is slower (or uses more memory) than the
+# baseline by more than `threshold` and by more than the absolute floor, which keeps timer noise on fast calls out
+def compare(baseline, current, threshold, min_seconds, min_bytes):
+    old = {result_key(result): result for result in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        key = result_key(result)
+        before = old.get(key)
+        if before is None:
+            continue
+        if "error" in result or "error" in before:
+            if "error" in result and "error" not in before:
+                rows.append((key, "error", "-", "-", result["error"], True))
+            continue
+        for metric, floor, unit in (("min_seconds", min_seconds, "s"), ("peak_bytes", min_bytes, "B")):
+            was, now = before[metric], result[metric]
+            change = (now - was) / was if was else 0.0
+            if abs(now - was) <= floor or abs(change) <= threshold:
+                continue
+            rows.append((key, metric, was, now, f"{change:+.0%}", change > 0))
+    return rows
+
+
+def print_comparison(rows):
+    regressions = [row for row in rows if row[5]]
+    improvements = [row for row in rows if not row[5]]
+    for title, group in (("Regressions", regressions), ("Improvements", improvements)):
+        if not group:
+            continue
+        print(f"{title}:")
+        print(f"{'function':<110} {'metric':>12} {'baseline':>14} {'current':>14} {'change':>8}")
+        for key, metric, was, now, change, _ in group:
+            was = f"{was:.4g}" if isinstance(was, float) else str(was)
+            now = f"{now:.4g}" if isinstance(now, float) else str(now)
+            print(f"{key:<110} {metric:>12} {was:>14} {now:>14} {change:>8}")
+    if not rows:
+        print("No changes beyond the threshold")
+    return 1 if regressions else 0
+
+
+def _numbers(kind):
+    return lambda text: [kind(float(value)) for value in text.split(",")]
+
+
+def load_results(path):
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=_numbers(int), default=[10_000, 100_000], help="comma separated row counts, e.g. 1e4,1e6,1e8 (default: 1e4,1e5)")
+    parser.add_argument("--columns", type=_numbers(int), default=[10, 100], help="comma separated column counts (default: 10,100)")
+    parser.add_argument("--null-rates", type=_numbers(float), default=[0.0, 0.1], help="comma separated shares of missing values (default: 0,0.1)")
+    parser.add_argument("--cardinalities", type=_numbers(int), default=[10, 10_000], help="comma separated distinct value counts (default: 10,1e4)")
+    parser.add_argument("--max-cells", type=float, default=5e7, help="skip grid points with more cells (default: %(default).0e)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per function (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--functions", nargs="*", help="only run the functions whose label contains one of these")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="json file the results are written to (default: %(default)s)")
+    parser.add_argument("--baseline", help="json results of an earlier run to compare with")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="only compare two result files")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative change reported as a regression (default: %(default)s)")
+    parser.add_argument("--min-seconds", type=float, default=0.02, help="smaller time changes are ignored (default: %(default)s)")
+    parser.add_argument("--min-bytes", type=float, default=2**20, help="smaller memory changes are ignored (default: 1 MB)")
+    args = parser.parse_args()
+
+    if args.compare:
+        baseline, current = (load_results(path) for path in args.compare)
+        return print_comparison(compare(baseline, current, args.threshold, args.min_seconds, args.min_bytes))
+
+    specs = _specs()
+    missing = uncovered_functions(specs)
+    if missing:
+        print(f"not benchmarked: {', '.join(missing)}", file=sys.stderr)
+
+    current = {"environment": environment(), "results": run_grid(args, specs)}
+    with open(args.output, "w") as handle:
+        json.dump(current, handle, indent=2)
+    print(f"results written to {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        return print_comparison(compare(load_results(args.baseline), current, args.threshold, args.min_seconds, args.min_bytes))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
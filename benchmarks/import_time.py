@@ -0,0 +1,98 @@
+''' Start-up time budget of the app modules.
+Imports the modules main.py loads at start-up in a fresh interpreter with -X importtime, after streamlit and pandas
+which every view needs anyway, and parses the report. The run fails (exit status 1) when the app modules take
+longer than --budget-ms to import, best of --repeat runs, or when one of the heavy libraries that are meant to be
+imported lazily (see lazy_imports.py) is imported at start-up:
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --budget-ms 150 --top 20 -o import_time.json
+
+Run from the repository root:  python benchmarks/import_time.py
+'''
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported by every view, measured but not part of the budget
+PRELOADED = ["streamlit", "pandas", "numpy"]
+
+# What main.py imports at start-up
+STARTUP_MODULES = [
+    "streamlit_option_menu", "analysis", "data_analysis_functions", "data_preprocessing_function", "home_page",
+    "data_loader", "profiling", "preprocessing_pipeline", "session_store", "query_backend", "correlation", "sampling",
+    "charts", "memo", "exporter", "fitted_transformers", "instrumentation",
+]
+
+# Only imported by the views and actions that need them
+LAZY_MODULES = ["seaborn", "matplotlib.pyplot", "scipy.stats", "scipy.sparse", "plotly.express", "polars", "duckdb", "sklearn"]
+
+MARKER = "-- autoeda start-up modules --"
+
+
+# Function to parse the -X importtime report into (module, nesting level, self us, cumulative us) rows
+def parse_importtime(report):
+    rows = []
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), level, int(self_us), int(cumulative_us)))
+    return rows
+
+
+# Function to import the start-up modules in a fresh interpreter. Returns the rows of the preloaded modules and
+# of the start-up modules
+def measure_once():
+    code = f"import {', '.join(PRELOADED)}; import sys; sys.stderr.write({MARKER!r} + '\\n'); import {', '.join(STARTUP_MODULES)}"
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    preloaded, startup = completed.stderr.split(MARKER, 1)
+    return parse_importtime(preloaded), parse_importtime(startup)
+
+
+def total_ms(rows):
+    return sum(cumulative for _, level, _, cumulative in rows if level == 0) / 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=250.0, help="import time allowed for the app modules (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5, help="interpreters started, the fastest counts (default: %(default)s)")
+    parser.add_argument("--top", type=int, default=10, help="slowest start-up modules listed (default: %(default)s)")
+    parser.add_argument("-o", "--output", help="json file the measurement is written to")
+    args = parser.parse_args()
+
+    runs = [measure_once() for _ in range(args.repeat)]
+    preloaded, startup = min(runs, key=lambda run: total_ms(run[1]))
+    preloaded_ms, startup_ms = total_ms(preloaded), total_ms(startup)
+
+    print(f"{' + '.join(PRELOADED)}: {preloaded_ms:.1f} ms (not budgeted)")
+    print(f"start-up modules: {startup_ms:.1f} ms of {args.budget_ms:.1f} ms budget")
+    print(f"{'module':<60} {'self ms':>9} {'cumulative ms':>14}")
+    for name, _, self_us, cumulative_us in sorted(startup, key=lambda row: row[2], reverse=True)[:args.top]:
+        print(f"{name:<60} {self_us / 1000:>9.1f} {cumulative_us / 1000:>14.1f}")
+
+    imported = {name for name, _, _, _ in startup}
+    eager = [module for module in LAZY_MODULES if module in imported]
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump({"preloaded_ms": preloaded_ms, "startup_ms": startup_ms, "budget_ms": args.budget_ms, "eager_lazy_modules": eager,
+                       "modules": [{"name": name, "level": level, "self_us": self_us, "cumulative_us": cumulative_us} for name, level, self_us, cumulative_us in startup]}, handle, indent=2)
+
+    status = 0
+    if startup_ms > args.budget_ms:
+        print(f"over budget by {startup_ms - args.budget_ms:.1f} ms")
+        status = 1
+    if eager:
+        print(f"imported at start-up instead of lazily: {', '.join(eager)}")
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+''' Parity check and timing of the query backends in query_backend.
+Runs value_counts and group_mean on every installed backend against the pandas backend, for in-memory frames and
+for csv / parquet / feather files, over columns with missing values, ties, categories, booleans and mixed keys.
+Exits with status 1 if any backend returns a different result.
+
+Run from the repository root:  python benchmarks/parity_query_backends.py --rows 10000,1000000
+'''
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import query_backend
+
+# means are summed in a different order by every engine, they agree to the last few bits only
+MEAN_RTOL = 1e-12
+
+
+def synthetic_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "int_key": rng.integers(0, 20, size=rows),
+        "text_key": rng.choice(["alpha", "beta", "gamma", "delta", "a,b", 'quote"d'], size=rows),
+        "float_key": rng.integers(0, 5, size=rows) / 2,
+        "bool_key": rng.random(rows) < 0.3,
+        "value": rng.normal(100, 15, size=rows),
+        "int_value": rng.integers(-1000, 1000, size=rows),
+    })
+    # missing values in keys and values, and a low cardinality category column
+    df.loc[rng.random(rows) < 0.05, "text_key"] = None
+    df.loc[rng.random(rows) < 0.05, "float_key"] = np.nan
+    df.loc[rng.random(rows) < 0.1, "value"] = np.nan
+    df["category_key"] = df["text_key"].astype("category")
+    return df
+
+
+def sources(df, directory):
+    csv_path = os.path.join(directory, "parity.csv")
+    parquet_path = os.path.join(directory, "parity.parquet")
+    feather_path = os.path.join(directory, "parity.feather")
+    df.drop(columns=["category_key"]).to_csv(csv_path, index=False)
+    df.to_parquet(parquet_path, index=False)
+    df.to_feather(feather_path)
+    return {"frame": df, "csv": csv_path, "parquet": parquet_path, "feather": feather_path}
+
+
+def check(name, label, result, expected):
+    try:
+        if isinstance(expected, pd.Series):
+            pd.testing.assert_series_equal(result, expected)
+        else:
+            pd.testing.assert_frame_equal(result, expected, check_exact=False, rtol=MEAN_RTOL)
+    except AssertionError as error:
+        print(f"MISMATCH {name} {label}: {error}")
+        return False
+    return True
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="10000,1000000", help="comma separated row counts")
+    args = parser.parse_args()
+
+    reference = query_backend.get_backend("pandas")
+    backends = [query_backend.get_backend(name) for name in query_backend.available_backends() if name != "pandas"]
+    print(f"backends checked against pandas: {', '.join(backend.name for backend in backends) or 'none installed'}")
+
+    passed = True
+    print(f"{'rows':>9} {'source':>8} {'query':>28} {'backend':>8} {'pandas (s)':>11} {'backend (s)':>12}")
+    for rows in (int(value) for value in args.rows.split(",")):
+        with tempfile.TemporaryDirectory() as directory:
+            for source_name, source in sources(synthetic_frame(rows), directory).items():
+                keys = ["int_key", "text_key", "float_key", "bool_key"] + (["category_key"] if source_name != "csv" else [])
+                queries = [("value_counts", (key,)) for key in keys]
+                queries += [("group_mean", (key, value)) for key in keys for value in ("value", "int_value")]
+                for query, query_args in queries:
+                    reference_time, expected = timed(getattr(reference, query), source, *query_args)
+                    for backend in backends:
+                        backend_time, result = timed(getattr(backend, query), source, *query_args)
+                        label = f"{query}({', '.join(query_args)})"
+                        passed &= check(backend.name, f"{source_name} {label}", result, expected)
+                        print(f"{rows:>9} {source_name:>8} {label:>28} {backend.name:>8} {reference_time:>11.4f} {backend_time:>12.4f}")
+
+    print("parity: OK" if passed else "parity: FAILED")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+''' Load time of a partitioned dataset with partitioned.load_parts for a growing number of workers.
+Writes a synthetic dataset of csv, gzip csv and parquet parts in key=value directories, then loads it with thread
+and process pools of 1, 2, 4, ... workers up to the core count, and checks the result against a single-threaded
+pandas read of every part.
+
+Run from the repository root:  python benchmarks/partitioned_load.py --parts 200 --rows-per-part 50000
+'''
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import partitioned
+
+
+def write_parts(directory, parts, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    formats = ["csv", "csv.gz", "parquet"]
+    for part in range(parts):
+        df = pd.DataFrame({
+            "id": np.arange(part * rows, (part + 1) * rows),
+            "value": rng.normal(size=rows),
+            "count": rng.integers(0, 1000, size=rows),
+            "label": rng.choice(["alpha", "beta", "gamma"], size=rows),
+        })
+        # a few parts have a missing column or integers where the others have floats, as a report check
+        if part % 50 == 1:
+            df = df.drop(columns=["label"])
+        if part % 50 == 2:
+            df["value"] = df["value"].round().astype(np.int64)
+        part_directory = os.path.join(directory, f"group={part % 4}")
+        os.makedirs(part_directory, exist_ok=True)
+        extension = formats[part % len(formats)]
+        path = os.path.join(part_directory, f"part-{part:05d}.{extension}")
+        if extension == "parquet":
+            df.to_parquet(path, index=False)
+        else:
+            df.to_csv(path, index=False)
+
+
+def worker_counts(limit):
+    counts, workers = [], 1
+    while workers < limit:
+        counts.append(workers)
+        workers *= 2
+    return counts + [limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parts", type=int, default=200)
+    parser.add_argument("--rows-per-part", type=int, default=50_000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_parts(directory, args.parts, args.rows_per_part)
+
+        start = time.perf_counter()
+        expected = pd.concat([
+            pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path)
+            for path in partitioned.find_parts(directory)
+        ], ignore_index=True)
+        print(f"pandas, one file at a time: {time.perf_counter() - start:.2f} s for {len(expected)} rows")
+
+        print(f"{'executor':>8} {'workers':>8} {'seconds':>8} {'speedup':>8}")
+        for executor in ("thread", "process"):
+            baseline = None
+            for workers in worker_counts(args.max_workers):
+                start = time.perf_counter()
+                df, report = partitioned.load_parts(directory, workers=workers, executor=executor)
+                seconds = time.perf_counter() - start
+                baseline = baseline or seconds
+                print(f"{executor:>8} {workers:>8} {seconds:>8.2f} {baseline / seconds:>7.1f}x")
+
+        assert len(df) == len(expected), (len(df), len(expected))
+        np.testing.assert_allclose(df.sort_values("id")["value"].to_numpy(), expected.sort_values("id")["value"].to_numpy())
+        print(f"schema report: {len(report)} parts differ")
+        print(report.head(10).to_string())
+
+
+if __name__ == "__main__":
+    main()
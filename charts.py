@@ -0,0 +1,291 @@
+''' This file contains the rendering layer for the Plotly charts of the Data Exploration tab.
+Data is binned, counted or downsampled with NumPy and pandas before it reaches Plotly, so the figure
+sent to the browser has a bounded size no matter how many rows the dataset has.
+'''
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import lazy_imports
+import memo
+
+# plotly is imported the first time a chart is drawn, see lazy_imports.py
+px = lazy_imports.lazy_import("plotly.express")
+go = lazy_imports.lazy_import("plotly.graph_objects")
+plotly_subplots = lazy_imports.lazy_import("plotly.subplots")
+
+# Largest number of points drawn in a scatter plot before it is downsampled
+MAX_SCATTER_POINTS = int(os.environ.get("AUTOEDA_MAX_POINTS", 5000))
+
+# Upper limit on histogram bins and on the grid of a 2-D density plot
+MAX_BINS = 200
+DENSITY_GRID = 100
+
+# Categories shown in bar and pie charts, the remaining ones are grouped under OTHER_LABEL
+MAX_CATEGORIES = 50
+OTHER_LABEL = "Other"
+
+# Outliers drawn as points on a box plot, taken from both ends
+MAX_BOX_OUTLIERS = 200
+
+# Bins per axis of the histograms in a pair plot
+PAIR_BINS = 40
+
+# Rendered figures kept in memory, keyed by the version of the frame they were drawn from
+MAX_CACHED_FIGURES = 64
+
+
+# Function to get the non-missing values of a numeric column as a float array
+def finite_values(series):
+    values = pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    return values[np.isfinite(values)]
+
+
+# Function to compute histogram counts and bin edges, with the bin count chosen by numpy and capped at max_bins
+def histogram_bins(values, max_bins=MAX_BINS):
+    if len(values) == 0:
+        return np.zeros(0), np.zeros(1)
+    edges = np.histogram_bin_edges(values, bins="auto")
+    if len(edges) - 1 > max_bins:
+        edges = np.linspace(values.min(), values.max(), max_bins + 1)
+    counts, edges = np.histogram(values, bins=edges)
+    return counts, edges
+
+
+def histogram(series, title, max_bins=MAX_BINS):
+    counts, edges = histogram_bins(finite_values(series), max_bins)
+    fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges), name=series.name))
+    fig.update_layout(title=title, xaxis_title=series.name, yaxis_title="count", bargap=0)
+    return fig
+
+
+# Density curve from a fine histogram smoothed with a Gaussian kernel (a binned kernel density estimate)
+def density(series, title, grid=MAX_BINS):
+    values = finite_values(series)
+    fig = go.Figure()
+    if len(values) > 1 and values.min() < values.max():
+        counts, edges = np.histogram(values, bins=grid)
+        width = edges[1] - edges[0]
+        # Silverman's rule of thumb for the bandwidth, expressed in bins
+        bandwidth = 1.06 * values.std() * len(values) ** -0.2
+        sigma = max(bandwidth / width, 1e-3)
+        offsets = np.arange(-int(4 * sigma) - 1, int(4 * sigma) + 2)
+        kernel = np.exp(-0.5 * (offsets / sigma) ** 2)
+        smoothed = np.convolve(counts, kernel / kernel.sum(), mode="same")
+        fig.add_trace(go.Scatter(x=(edges[:-1] + edges[1:]) / 2, y=smoothed / (len(values) * width), mode="lines", fill="tozeroy", name=series.name))
+    fig.update_layout(title=title, xaxis_title=series.name, yaxis_title="density")
+    return fig
+
+
+# Function to compute the quartiles, whiskers (1.5 IQR rule) and the most extreme outliers of a column
+def box_summary(values, max_outliers=MAX_BOX_OUTLIERS):
+    q1, median, q3 = np.quantile(values, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+    outliers = values[(values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)]
+    if len(outliers) > max_outliers:
+        outliers = np.sort(outliers)
+        outliers = np.concatenate([outliers[:max_outliers // 2], outliers[-(max_outliers // 2):]])
+    return {
+        "q1": q1, "median": median, "q3": q3, "mean": values.mean(),
+        "lowerfence": inside.min(), "upperfence": inside.max(), "outliers": outliers,
+    }
+
+
+def box(series, title):
+    values = finite_values(series)
+    fig = go.Figure()
+    if len(values):
+        summary = box_summary(values)
+        fig.add_trace(go.Box(
+            q1=[summary["q1"]], median=[summary["median"]], q3=[summary["q3"]], mean=[summary["mean"]],
+            lowerfence=[summary["lowerfence"]], upperfence=[summary["upperfence"]], x=[series.name], name=series.name,
+        ))
+        if len(summary["outliers"]):
+            fig.add_trace(go.Scatter(x=[series.name] * len(summary["outliers"]), y=summary["outliers"], mode="markers", name="outliers"))
+    fig.update_layout(title=title, yaxis_title=series.name, showlegend=False)
+    return fig
+
+
+# Largest-Triangle-Three-Buckets downsampling of points sorted by x, keeps the visual shape of the curve
+def lttb(x, y, n_out):
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_start, next_stop = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else n
+        next_x, next_y = x[next_start:next_stop].mean(), y[next_start:next_stop].mean()
+        # pick the point of the bucket forming the largest triangle with the previous pick and the next bucket's mean
+        areas = np.abs((x[previous] - next_x) * (y[start:stop] - y[previous]) - (x[previous] - x[start:stop]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return x[selected], y[selected]
+
+
+# Scatter plot that draws every point up to max_points. Above the budget it becomes a 2-D density grid,
+# or with method='lttb' the points sorted by x are reduced to max_points with LTTB
+def scatter(df, x, y, title, max_points=MAX_SCATTER_POINTS, method="density"):
+    pairs = df[list(dict.fromkeys([x, y]))].apply(pd.to_numeric, errors="coerce").dropna()
+    x_values = pairs[x].to_numpy(dtype=np.float64)
+    y_values = pairs[y].to_numpy(dtype=np.float64)
+
+    if len(pairs) <= max_points:
+        fig = px.scatter(x=x_values, y=y_values, title=title, labels={"x": x, "y": y})
+        return fig
+
+    if method == "lttb":
+        order = np.argsort(x_values, kind="stable")
+        x_values, y_values = lttb(x_values[order], y_values[order], max_points)
+        fig = px.scatter(x=x_values, y=y_values, title=f"{title} (LTTB, {max_points} of {len(pairs)} points)", labels={"x": x, "y": y})
+        return fig
+
+    counts, x_edges, y_edges = np.histogram2d(x_values, y_values, bins=DENSITY_GRID)
+    fig = go.Figure(go.Heatmap(
+        x=(x_edges[:-1] + x_edges[1:]) / 2, y=(y_edges[:-1] + y_edges[1:]) / 2,
+        z=np.where(counts.T > 0, counts.T, np.nan), colorscale="Viridis", colorbar={"title": "points"},
+    ))
+    fig.update_layout(title=f"{title} (density of {len(pairs)} points)", xaxis_title=x, yaxis_title=y)
+    return fig
+
+
+# Function to count the values of a column, keeping the max_categories most frequent and grouping the rest.
+# Counts already computed, e.g. by a query backend, can be passed instead of being counted again
+def category_counts(series, max_categories=MAX_CATEGORIES, counts=None):
+    counts = series.value_counts() if counts is None else counts
+    if len(counts) > max_categories:
+        other = counts.iloc[max_categories:].sum()
+        counts = counts.iloc[:max_categories]
+        counts = pd.concat([counts, pd.Series([other], index=[OTHER_LABEL])])
+    # a new series, the counts passed in may be a memoized result shared with other callers
+    return counts.rename(index=str)
+
+
+def bar(series, title, max_categories=MAX_CATEGORIES, counts=None):
+    counts = category_counts(series, max_categories, counts)
+    return px.bar(x=counts.index, y=counts.to_numpy(), title=title, labels={"x": series.name, "y": "count"})
+
+
+def pie(series, title, max_categories=MAX_CATEGORIES, counts=None):
+    counts = category_counts(series, max_categories, counts)
+    return px.pie(names=counts.index, values=counts.to_numpy(), title=title)
+
+
+def stacked_bar(df, x, color, title, max_categories=MAX_CATEGORIES):
+    if x == color:
+        return bar(df[x], title, max_categories)
+
+    # keep the most frequent categories of both columns, the rest are grouped before counting
+    keys = {}
+    for col in (x, color):
+        values = df[col]
+        top = values.value_counts().index[:max_categories]
+        # a categorical column takes the grouped label as one more category
+        if isinstance(values.dtype, pd.CategoricalDtype) and OTHER_LABEL not in values.cat.categories:
+            values = values.cat.add_categories(OTHER_LABEL)
+        keys[col] = values.where(values.isin(top) | values.isna(), OTHER_LABEL)
+    # only the pairs present are counted, not every combination of the categories
+    grouped = pd.DataFrame(keys).groupby([x, color], observed=True).size().reset_index(name="count")
+    grouped[[x, color]] = grouped[[x, color]].astype(str)
+    return px.bar(grouped, x=x, y="count", color=color, title=title)
+
+
+# Function to split the range of the values into equal bins, a constant column gets one bin around its value
+def uniform_edges(values, bins):
+    if len(values) == 0:
+        return np.zeros(1)
+    low, high = values.min(), values.max()
+    if low == high:
+        return np.array([low - 0.5, high + 0.5])
+    return np.linspace(low, high, bins + 1)
+
+
+# Function to find the bin of every value given uniform bin edges. Missing values get the extra bin len(edges) - 1
+def bin_indices(values, edges):
+    nbins = len(edges) - 1
+    indices = np.full(len(values), max(nbins, 0), dtype=np.int64)
+    present = np.isfinite(values)
+    if nbins > 0:
+        with np.errstate(all="ignore"):
+            position = np.floor((values[present] - edges[0]) / (edges[-1] - edges[0]) * nbins)
+        # the last edge is inclusive, like numpy's histogram
+        indices[present] = np.clip(np.nan_to_num(position), 0, nbins - 1).astype(np.int64)
+    return indices
+
+
+# Pair plot of binned data: 1-D histograms on the diagonal and 2-D histograms of every pair of columns off it.
+# Each column is binned once and every pair is counted with one bincount, so the figure has at most bins^2
+# cells per panel whatever the number of rows
+# `progress` is called with the fraction of the work done after each column is binned and each row of plots is drawn
+def pair_plot(df, columns, title="Pair Plot", bins=PAIR_BINS, progress=None):
+    columns = list(columns)
+    progress = progress or (lambda fraction: None)
+    edges, indices = {}, {}
+    for number, col in enumerate(columns, start=1):
+        values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        edges[col] = uniform_edges(values[np.isfinite(values)], bins)
+        indices[col] = bin_indices(values, edges[col])
+        progress(0.5 * number / len(columns))
+
+    size = len(columns)
+    fig = plotly_subplots.make_subplots(rows=size, cols=size, horizontal_spacing=0.02, vertical_spacing=0.02)
+    for row, y_col in enumerate(columns, start=1):
+        for col_number, x_col in enumerate(columns, start=1):
+            x_edges, y_edges = edges[x_col], edges[y_col]
+            x_bins, y_bins = len(x_edges) - 1, len(y_edges) - 1
+            if x_bins < 1 or y_bins < 1:
+                continue
+            if x_col == y_col:
+                counts = np.bincount(indices[x_col], minlength=x_bins + 1)[:x_bins]
+                fig.add_trace(go.Bar(x=(x_edges[:-1] + x_edges[1:]) / 2, y=counts, width=np.diff(x_edges), showlegend=False), row=row, col=col_number)
+                continue
+            # one count over (bins + 1)^2 cells, the row and column of the missing bin are dropped afterwards
+            counts = np.bincount(indices[y_col] * (x_bins + 1) + indices[x_col], minlength=(x_bins + 1) * (y_bins + 1))
+            counts = counts.reshape(y_bins + 1, x_bins + 1)[:y_bins, :x_bins]
+            fig.add_trace(go.Heatmap(
+                x=(x_edges[:-1] + x_edges[1:]) / 2, y=(y_edges[:-1] + y_edges[1:]) / 2,
+                z=np.where(counts > 0, counts, np.nan), colorscale="Viridis", showscale=False,
+            ), row=row, col=col_number)
+        fig.update_yaxes(title_text=y_col, row=row, col=1)
+        progress(0.5 + 0.5 * row / size)
+    for col_number, x_col in enumerate(columns, start=1):
+        fig.update_xaxes(title_text=x_col, row=size, col=col_number)
+    fig.update_layout(title=title, height=max(400, 180 * size), bargap=0)
+    return fig
+
+
+_figures = OrderedDict()
+_figures_lock = threading.Lock()
+
+
+def _forget_figures(version):
+    with _figures_lock:
+        for cached in [cached for cached in _figures if cached[0] == version]:
+            del _figures[cached]
+
+
+# figures of a frame are dropped together with the frame, like the other results keyed on its version
+memo.add_forget_listener(_forget_figures)
+
+
+# Function to return the figure drawn by build() for this frame, chart and columns, drawing it only on the first call
+def cached_figure(df, chart, columns, build):
+    key = (memo.frame_version(df), chart, tuple(columns))
+    with _figures_lock:
+        if key in _figures:
+            _figures.move_to_end(key)
+            return _figures[key]
+    fig = build()
+    with _figures_lock:
+        _figures[key] = fig
+        while len(_figures) > MAX_CACHED_FIGURES:
+            _figures.popitem(last=False)
+    return fig
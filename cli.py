@@ -0,0 +1,228 @@
+''' Command line entry point of AutoEDA. Profiles datasets and replays saved preprocessing pipelines without
+starting the Streamlit server, using the same profiling and preprocessing code as the app.
+
+    python cli.py profile data.csv more/*.csv --format html -o reports/
+    python cli.py apply preprocessing_pipeline.json data.csv -o out.parquet
+    python cli.py transform fitted_transformers.json new_data.csv -o out.parquet
+
+Several files are processed in parallel, one file per worker process.
+'''
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import analysis
+import dtype_optimizer
+import exporter
+import partitioned
+import preprocessing_pipeline
+import profiling
+import report
+import streaming
+import fitted_transformers
+
+DEFAULT_WORKERS = int(os.environ.get("AUTOEDA_WORKERS", os.cpu_count() or 1))
+
+
+# Function to read a csv, parquet or feather file, or a directory of parts, into a dataframe, optionally with compact dtypes
+def read_frame(path, optimize=False):
+    name = os.fspath(path).lower()
+    if os.path.isdir(path):
+        # files are already spread over the worker processes, the parts of one directory are read on one thread each
+        df, _ = partitioned.load_parts(path, workers=1)
+    elif name.endswith((".parquet", ".pq")):
+        df = pd.read_parquet(path)
+    elif name.endswith((".feather", ".arrow")):
+        df = pd.read_feather(path)
+    else:
+        df = pd.read_csv(path)
+    if optimize:
+        df, _ = dtype_optimizer.optimize_dtypes(df)
+    return df
+
+
+def _stem(path):
+    name = os.path.basename(os.fspath(path))
+    for extension in (".gz", ".csv", ".parquet", ".pq", ".feather", ".arrow"):
+        if name.lower().endswith(extension):
+            name = name[:-len(extension)]
+    return name
+
+
+def _write_text(path, text):
+    with open(path, "w", encoding="utf-8") as handle:
+        handle.write(text)
+
+
+# Function to profile one file and write its report. Runs in a worker process
+def profile_file(path, output, report_format, streaming_mode=False, optimize=False):
+    if streaming_mode:
+        profile = streaming.stream_profile(path)
+    else:
+        profile = profiling.profile_dataset(read_frame(path, optimize)).compute()
+    text = report.render(analysis.build_report(profile, name=os.path.basename(path)), report_format)
+    if output is None:
+        return text
+    _write_text(output, text)
+    return output
+
+
+# Function to run a saved pipeline on one file and export the result. Runs in a worker process
+def apply_file(pipeline_json, path, output, optimize=False):
+    df = preprocessing_pipeline.replay(read_frame(path, optimize), pipeline_json)
+    with open(output, "wb") as handle:
+        exporter.export_frame(df, exporter.format_from_file_name(output), handle)
+    return output
+
+
+# Function to apply fitted transformers to one csv or parquet file chunk by chunk, so the file never has to fit in
+# memory, and export the result. A csv file is read twice: the first pass fixes the dtypes of the columns whose
+# inferred dtype changes from one chunk to another, so every chunk fits the schema of the output. Runs in a worker
+# process
+def transform_file(registry_json, path, output, chunk_rows=streaming.DEFAULT_CHUNK_ROWS):
+    registry = fitted_transformers.TransformerRegistry.from_json(registry_json)
+    dtypes = streaming.chunk_dtypes(path, chunk_rows)
+    chunks = (registry.transform(chunk) for chunk in streaming.read_chunks(path, chunk_rows, dtypes))
+    with open(output, "wb") as handle:
+        exporter.export_chunks(chunks, exporter.format_from_file_name(output), handle)
+    return output
+
+
+def _timed(function, args):
+    start = time.perf_counter()
+    return function(*args), time.perf_counter() - start
+
+
+# Function to run function(*args) for every task, in worker processes when there is more than one task.
+# Yields (label, result, error, seconds) as the tasks finish
+def run_tasks(tasks, workers=DEFAULT_WORKERS):
+    if workers <= 1 or len(tasks) <= 1:
+        for label, function, args in tasks:
+            try:
+                result, seconds = _timed(function, args)
+                yield label, result, None, seconds
+            except Exception as error:
+                yield label, None, error, 0.0
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        futures = {pool.submit(_timed, function, args): label for label, function, args in tasks}
+        for future in as_completed(futures):
+            try:
+                result, seconds = future.result()
+                yield futures[future], result, None, seconds
+            except Exception as error:
+                yield futures[future], None, error, 0.0
+
+
+# Function to find the output file of every input: `output` itself for a single input when it is named with one
+# of `file_extensions`, otherwise <output directory>/<input name>.<extension>
+def output_paths(parser, inputs, output, extension, file_extensions):
+    if len(inputs) == 1 and output.lower().endswith(tuple("." + ext for ext in file_extensions)):
+        return [output]
+    stems = [_stem(path) for path in inputs]
+    duplicates = sorted({stem for stem in stems if stems.count(stem) > 1})
+    if duplicates:
+        parser.error(f"several inputs would write the same output file: {', '.join(duplicates)}")
+    os.makedirs(output, exist_ok=True)
+    return [os.path.join(output, f"{stem}.{extension}") for stem in stems]
+
+
+def report_results(results):
+    failed = 0
+    for label, result, error, seconds in results:
+        if error is not None:
+            failed += 1
+            print(f"error: {label}: {error}", file=sys.stderr)
+        else:
+            print(f"{label} -> {result} ({seconds:.2f} s)", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def profile_command(parser, args):
+    if args.output == "-":
+        if len(args.files) != 1:
+            parser.error("writing to stdout (-o -) takes a single input file")
+        label, text, error, _ = next(run_tasks([(args.files[0], profile_file, (args.files[0], None, args.format, args.streaming, args.optimize))], 1))
+        if error is not None:
+            print(f"error: {label}: {error}", file=sys.stderr)
+            return 1
+        sys.stdout.write(text)
+        return 0
+
+    outputs = output_paths(parser, args.files, args.output, args.format, [args.format])
+    tasks = [(path, profile_file, (path, output, args.format, args.streaming, args.optimize)) for path, output in zip(args.files, outputs)]
+    return report_results(run_tasks(tasks, args.workers))
+
+
+def apply_command(parser, args):
+    with open(args.pipeline) as handle:
+        pipeline_json = handle.read()
+    # unknown operations are reported before any file is read
+    try:
+        preprocessing_pipeline.load_steps(pipeline_json)
+    except ValueError as error:
+        parser.error(str(error))
+
+    outputs = output_paths(parser, args.files, args.output, args.format, [extension for extension, _ in exporter.FORMATS.values()])
+    tasks = [(path, apply_file, (pipeline_json, path, output, args.optimize)) for path, output in zip(args.files, outputs)]
+    return report_results(run_tasks(tasks, args.workers))
+
+
+def transform_command(parser, args):
+    with open(args.transformers) as handle:
+        registry_json = handle.read()
+    try:
+        fitted_transformers.TransformerRegistry.from_json(registry_json)
+    except (ValueError, KeyError, TypeError) as error:
+        parser.error(f"invalid transformers file: {error}")
+
+    outputs = output_paths(parser, args.files, args.output, args.format, [extension for extension, _ in exporter.FORMATS.values()])
+    tasks = [(path, transform_file, (registry_json, path, output, args.chunk_rows)) for path, output in zip(args.files, outputs)]
+    return report_results(run_tasks(tasks, args.workers))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="files processed in parallel (default: %(default)s)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    profile = commands.add_parser("profile", help="write a json or html report of each file")
+    profile.add_argument("files", nargs="+", help="csv, parquet or feather files, or directories of csv / parquet parts")
+    profile.add_argument("--format", choices=report.FORMATS, default="json")
+    profile.add_argument("-o", "--output", default=".", help="report file for a single input, a directory, or - for stdout (default: current directory)")
+    profile.add_argument("--streaming", action="store_true", help="profile csv files in chunks, for files larger than memory")
+    profile.add_argument("--optimize", action="store_true", help="load with compact dtypes")
+    profile.set_defaults(run=profile_command)
+
+    apply = commands.add_parser("apply", help="run a saved preprocessing pipeline on each file")
+    apply.add_argument("pipeline", help="pipeline json downloaded from the Data Preprocessing tab")
+    apply.add_argument("files", nargs="+", help="csv, parquet or feather files, or directories of csv / parquet parts")
+    apply.add_argument("-o", "--output", required=True, help="output file for a single input, otherwise a directory")
+    apply.add_argument("--format", choices=[extension for extension, _ in exporter.FORMATS.values()], default="parquet", help="output format when writing to a directory (default: %(default)s)")
+    apply.add_argument("--optimize", action="store_true", help="load with compact dtypes")
+    apply.set_defaults(run=apply_command)
+
+    transform = commands.add_parser("transform", help="apply encoders and scalers fitted in the app to each file, chunk by chunk")
+    transform.add_argument("transformers", help="fitted transformers json downloaded from the Data Preprocessing tab")
+    transform.add_argument("files", nargs="+", help="csv or parquet files")
+    transform.add_argument("-o", "--output", required=True, help="output file for a single input, otherwise a directory")
+    transform.add_argument("--format", choices=[extension for extension, _ in exporter.FORMATS.values()], default="parquet", help="output format when writing to a directory (default: %(default)s)")
+    transform.add_argument("--chunk-rows", type=int, default=streaming.DEFAULT_CHUNK_ROWS, help="rows read and transformed at a time (default: %(default)s)")
+    transform.set_defaults(run=transform_command)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    return args.run(parser, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
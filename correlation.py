@@ -0,0 +1,232 @@
+''' This file contains the correlation service behind the correlation heatmap of the Data Exploration tab.
+It keeps sufficient statistics of every numeric column pair (counts, sums, sums of squares and cross-products over
+the rows where both values are present), so the Pearson matrix of any subset of columns is read off in O(k^2).
+Spearman uses the same statistics over the column ranks. When a frame derived from the previous one is
+refreshed, only the changed columns are recomputed and removed rows are subtracted from the sums. Only the k x k
+statistics are kept: the changed rows and columns are read again from the previous and the new frame.
+'''
+
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+PEARSON = "pearson"
+SPEARMAN = "spearman"
+
+# Rows whose products are summed at a time, which bounds the temporary arrays to ROW_BLOCK x k
+ROW_BLOCK = 65536
+
+
+class MomentMatrix:
+    '''Pairwise-complete counts, sums, sums of squares and cross-products of the numeric columns of a frame.
+    Only the k x k statistics are kept, the rows are read again from the frames passed in when they change.'''
+
+    def __init__(self, frame):
+        self.columns = list(frame.columns)
+        k = len(self.columns)
+        # values are summed shifted by each column's mean, which keeps the one-pass formulas numerically stable
+        with np.errstate(all="ignore"):
+            self.shift = np.nan_to_num(frame.mean().to_numpy(dtype=np.float64, na_value=np.nan)) if len(frame) else np.zeros(k)
+        # count[i, j] rows where both are present, total[i, j] sum of column i over those rows, likewise squares[i, j]
+        self.count, self.total, self.squares, self.products = (np.zeros((k, k)) for _ in range(4))
+        self._accumulate(frame, 1)
+
+    # Function to cut the rows of a frame into blocks of the presence mask and of the shifted values with zeros for
+    # the missing entries, in the column order of the statistics. Columns the frame lacks count as missing
+    def _terms(self, frame):
+        for start in range(0, len(frame), ROW_BLOCK):
+            values = frame.iloc[start:start + ROW_BLOCK].reindex(columns=self.columns).to_numpy(dtype=np.float64, na_value=np.nan)
+            mask = ~np.isnan(values)
+            yield mask.astype(np.float64), np.where(mask, values - self.shift, 0.0)
+
+    def _accumulate(self, frame, sign):
+        for mask, zeroed in self._terms(frame):
+            self.count += sign * (mask.T @ mask)
+            self.total += sign * (zeroed.T @ mask)
+            self.squares += sign * ((zeroed * zeroed).T @ mask)
+            self.products += sign * (zeroed.T @ zeroed)
+
+    # Function to add the statistics of the rows of a frame
+    def add_rows(self, frame):
+        self._accumulate(frame, 1)
+
+    # Function to subtract the statistics of rows that were added before, with the values they were added with
+    def remove_rows(self, frame):
+        self._accumulate(frame, -1)
+
+    # Function to replace or add the column `name` with its values in `frame`, recomputing only its row and column
+    # of the statistics in O(n * k). The other columns are read from `frame` too, which must hold all of them
+    def set_column(self, name, frame):
+        if name not in self.columns:
+            self.columns.append(name)
+            self.shift = np.append(self.shift, 0.0)
+            for statistic in ("count", "total", "squares", "products"):
+                setattr(self, statistic, np.pad(getattr(self, statistic), ((0, 1), (0, 1))))
+        i = self.columns.index(name)
+        # the whole row and column are recomputed, so the column can take the shift of its new values
+        with np.errstate(all="ignore"):
+            self.shift[i] = np.nan_to_num(np.nanmean(frame[name].to_numpy(dtype=np.float64, na_value=np.nan))) if len(frame) else 0.0
+
+        k = len(self.columns)
+        count, total_row, total_column, squares_row, squares_column, products = (np.zeros(k) for _ in range(6))
+        for mask, zeroed in self._terms(frame):
+            column_mask, column_zeroed = mask[:, i], zeroed[:, i]
+            count += column_mask @ mask
+            total_row += column_zeroed @ mask
+            total_column += zeroed.T @ column_mask
+            squares_row += (column_zeroed * column_zeroed) @ mask
+            squares_column += (zeroed * zeroed).T @ column_mask
+            products += column_zeroed @ zeroed
+        self.count[i, :] = self.count[:, i] = count
+        self.total[i, :], self.total[:, i] = total_row, total_column
+        self.squares[i, :], self.squares[:, i] = squares_row, squares_column
+        self.products[i, :] = self.products[:, i] = products
+
+    def drop_column(self, name):
+        i = self.columns.index(name)
+        del self.columns[i]
+        self.shift = np.delete(self.shift, i)
+        for statistic in ("count", "total", "squares", "products"):
+            setattr(self, statistic, np.delete(np.delete(getattr(self, statistic), i, axis=0), i, axis=1))
+
+    # Function to read the pairwise-complete Pearson correlation of `columns` off the statistics
+    def pearson(self, columns):
+        positions = [self.columns.index(col) for col in columns]
+        grid = np.ix_(positions, positions)
+        count, total, squares, products = self.count[grid], self.total[grid], self.squares[grid], self.products[grid]
+        with np.errstate(all="ignore"):
+            covariance = products - total * total.T / count
+            variance = squares - total * total / count
+            matrix = covariance / np.sqrt(variance * variance.T)
+        # like pandas, pairs with fewer than two rows or without variance have no correlation
+        matrix[(count < 2) | (variance <= 0) | (variance.T <= 0)] = np.nan
+        matrix = np.clip(matrix, -1.0, 1.0)
+        diagonal = np.diag_indices_from(matrix)
+        matrix[diagonal] = np.where(np.isnan(matrix[diagonal]), np.nan, 1.0)
+        return pd.DataFrame(matrix, index=list(columns), columns=list(columns))
+
+
+def _values(series):
+    return series.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+class CorrelationService:
+    '''Pearson and Spearman correlation matrices of the numeric columns of a frame, kept up to date incrementally.'''
+
+    def __init__(self):
+        self._frame = None
+        # the numeric columns of the refreshed frame. A shallow copy, it shares the column buffers of the frame, and
+        # the rows and columns of the statistics are updated from it and the next frame
+        self._numeric = None
+        self._moments = None
+        # statistics over the ranks of the columns Spearman was requested for, dropped when rows change
+        self._rank_moments = None
+        # Spearman coefficients of pairs with different missing rows, which are ranked again on their common rows
+        self._pairs = {}
+        self.rebuilds = 0
+        self.column_updates = 0
+        # background jobs of one session can refresh and read the service from several threads
+        self._lock = threading.RLock()
+
+    def _rebuild(self, numeric):
+        self._moments = MomentMatrix(numeric)
+        self._rank_moments = None
+        self._pairs.clear()
+        self.rebuilds += 1
+
+    # Function to bring the rows of the statistics in line with a new frame, subtracting the removed rows read from
+    # the previous frame or adding the new rows. Returns the positions of the rows both frames share, in the previous
+    # frame and in the new one, or None when the statistics cannot be updated (duplicate labels, or rows both removed
+    # and added) and must be rebuilt
+    def _align_rows(self, index, numeric):
+        old = self._numeric.index
+        if old.equals(index):
+            return slice(None), slice(None)
+        if not (old.is_unique and index.is_unique):
+            return None
+        positions = old.get_indexer(index)
+        kept = positions >= 0
+        if kept.all():
+            removed = np.ones(len(old), dtype=bool)
+            removed[positions] = False
+            self._moments.remove_rows(self._numeric.iloc[removed])
+        elif old.isin(index).all():
+            self._moments.add_rows(numeric.iloc[~kept])
+        else:
+            return None
+        self._rank_moments = None
+        self._pairs.clear()
+        return positions[kept], np.flatnonzero(kept)
+
+    def _drop(self, col):
+        self._moments.drop_column(col)
+        if self._rank_moments is not None and col in self._rank_moments.columns:
+            self._rank_moments.drop_column(col)
+        self._pairs = {pair: value for pair, value in self._pairs.items() if col not in pair}
+
+    # Function to update the statistics to `df`. Columns whose values did not change are not recomputed
+    def refresh(self, df):
+        if self._frame is not None and self._frame() is df:
+            return self
+        numeric = df.select_dtypes(include="number")
+        rows = None if self._moments is None else self._align_rows(df.index, numeric)
+        if rows is None:
+            self._rebuild(numeric)
+        else:
+            old_rows, new_rows = rows
+            for col in [col for col in self._moments.columns if col not in numeric.columns]:
+                self._drop(col)
+            for col in numeric.columns:
+                # rows added by the new frame were summed from it already, the shared rows are compared
+                if col in self._moments.columns and np.array_equal(_values(self._numeric[col])[old_rows], _values(numeric[col])[new_rows], equal_nan=True):
+                    continue
+                if self._rank_moments is not None and col in self._rank_moments.columns:
+                    self._rank_moments.drop_column(col)
+                self._pairs = {pair: value for pair, value in self._pairs.items() if col not in pair}
+                self._moments.set_column(col, numeric)
+                self.column_updates += 1
+        self._frame = weakref.ref(df)
+        self._numeric = numeric
+        return self
+
+    def _pair_spearman(self, a, b):
+        if (a, b) not in self._pairs:
+            x, y = _values(self._numeric[a]), _values(self._numeric[b])
+            both = ~(np.isnan(x) | np.isnan(y))
+            self._pairs[(a, b)] = pd.DataFrame({"x": x[both], "y": y[both]}).corr(method=SPEARMAN).iloc[0, 1] if both.sum() > 1 else np.nan
+        return self._pairs[(a, b)]
+
+    def _spearman(self, columns):
+        ranked = [] if self._rank_moments is None else self._rank_moments.columns
+        missing = [col for col in columns if col not in ranked]
+        if missing:
+            # ranks are not kept, the statistics over the ranks of the columns requested so far are built again
+            self._rank_moments = MomentMatrix(self._numeric[ranked + missing].rank())
+        matrix = self._rank_moments.pearson(columns)
+
+        # ranks are over each column's own values, pairs whose missing rows differ are ranked again on their common rows
+        count = self._moments.count
+        positions = [self._moments.columns.index(col) for col in columns]
+        for a, i in enumerate(positions):
+            for b in range(a + 1, len(positions)):
+                j = positions[b]
+                if count[i, j] != count[i, i] or count[i, j] != count[j, j]:
+                    matrix.iloc[a, b] = matrix.iloc[b, a] = self._pair_spearman(columns[a], columns[b])
+        return matrix
+
+    # Function to refresh the statistics to `df` and read the matrix of `columns` in one step, safe to call from
+    # several threads
+    def correlation_matrix(self, df, columns, method=PEARSON):
+        with self._lock:
+            return self.refresh(df).matrix(columns, method)
+
+    # Function to get the correlation matrix of `columns`, which must be numeric columns of the refreshed frame
+    def matrix(self, columns, method=PEARSON):
+        columns = list(columns)
+        if method == PEARSON:
+            return self._moments.pearson(columns)
+        if method == SPEARMAN:
+            return self._spearman(columns)
+        raise ValueError(f"Unknown correlation method: {method}")
@@ -4,40 +4,93 @@ This is so as to reduce the clutter in the main file and isolate the core functi
 
 import streamlit as st
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from collections import Counter
-import plotly.express as px
-
-# Function to load the csv data to a dataframe
+import functools
+import analysis
+import charts
+import correlation
+import data_loader
+import jobs
+import lazy_imports
+import preview
+import profiling
+import query_backend
+import sampling
+
+# Plotting libraries are imported the first time a chart of the Data Exploration tab is drawn, see lazy_imports.py
+px = lazy_imports.lazy_import("plotly.express")
+sns = lazy_imports.lazy_import("seaborn")
+matplotlib_figure = lazy_imports.lazy_import("matplotlib.figure")
+
+# Function to load the csv data to a dataframe. Reruns with the same file are served from the dataset cache
 def load_data(file):
-    return pd.read_csv(file)
+    return data_loader.load_cached(file)
+
+# Function to load the csv with compact dtypes (downcast numbers, categories, Arrow strings). Returns the frame and a per-column memory report
+def load_data_optimized(file):
+    return data_loader.load_optimized(file)
+
+# Function to load every csv / parquet part of a directory or glob pattern in parallel. Returns the frame, the report of
+# parts whose schema differs and, with optimize, the per-column memory report
+def load_data_partitioned(source, optimize=False):
+    return data_loader.load_partitioned(source, optimize, within=data_loader.data_root())
+
+# Function to profile a csv too large for memory in chunks. Returns the profile, with a bounded row sample in profile.sample
+def load_data_streaming(file):
+    return data_loader.load_streaming(file)
+
+# Function to display a window of the dataset: a page of rows and of columns, sorted and filtered on the server.
+# Only the window is sent to the browser, whatever the size of the frame. `key` tells the widgets of several previews apart
+def display_preview(df, key, columns=None):
+    columns = list(df.columns) if columns is None else list(columns)
+    if not columns:
+        st.info("No columns match the search")
+        return
+
+    sort_column, order_column, filter_column, value_column = st.columns(4)
+    sort_by = sort_column.selectbox("Sort By", [None] + columns, format_func=lambda col: "Original order" if col is None else str(col), key=f"{key}_sort_by")
+    descending = order_column.checkbox("Descending", key=f"{key}_descending", disabled=sort_by is None)
+    filter_by = filter_column.selectbox("Filter Column", [None] + columns, format_func=lambda col: "No filter" if col is None else str(col), key=f"{key}_filter_by")
+    filter_text = value_column.text_input("Filter Value", key=f"{key}_filter_value", disabled=filter_by is None, help="Rows whose value contains the text. Numeric columns also take comparisons such as >5 or <=2.5")
 
-# Function to find categorical and numerical columns/variables in dataset
-def categorical_numerical(df):
-    num_columns,cat_columns = [],[]
-    for col in df.columns:
-        if len(df[col].unique()) <= 30 or df[col].dtype== np.object_:
-            cat_columns.append(col.strip())
+    positions = preview.row_positions(df, sort_by, not descending, filter_by, filter_text or "")
+    total_rows = len(df) if positions is None else len(positions)
 
-        else:
-            num_columns.append(col.strip())
+    rows_column, page_column, columns_page_column = st.columns(3)
+    page_rows = rows_column.selectbox("Rows per Page", preview.PAGE_ROWS, key=f"{key}_page_rows")
+    pages = max(1, -(-total_rows // page_rows))
+    column_pages = -(-len(columns) // preview.PAGE_COLUMNS)
+    # a filter or search that leaves fewer pages brings the page widgets back within range
+    for page_key, last_page in ((f"{key}_page", pages), (f"{key}_column_page", column_pages)):
+        if st.session_state.get(page_key, 1) > last_page:
+            st.session_state[page_key] = last_page
+    page = int(page_column.number_input(f"Page (of {pages})", min_value=1, max_value=pages, key=f"{key}_page"))
+    column_page = int(columns_page_column.number_input(f"Column Page (of {column_pages})", min_value=1, max_value=column_pages, key=f"{key}_column_page")) if column_pages > 1 else 1
 
-    return num_columns,cat_columns
+    start = (page - 1) * page_rows
+    shown_columns = columns[(column_page - 1) * preview.PAGE_COLUMNS:column_page * preview.PAGE_COLUMNS]
+    st.dataframe(preview.window(df, positions, start, page_rows, shown_columns))
+
+    filtered = f" (filtered from {len(df)})" if total_rows != len(df) else ""
+    shown_rows = f"Rows {start + 1}–{min(start + page_rows, total_rows)} of {total_rows}" if total_rows else "No rows"
+    st.caption(f"{shown_rows}{filtered}, "
+               f"columns {(column_page - 1) * preview.PAGE_COLUMNS + 1}–{(column_page - 1) * preview.PAGE_COLUMNS + len(shown_columns)} of {len(columns)}")
 
 
 # Function to display dataset overview
-def display_dataset_overview(df,cat_columns,num_columns):
-    
-    display_rows = st.slider("Display Rows", 1, len(df), len(df) if len(df) < 20 else 20)
+def display_dataset_overview(df,cat_columns,num_columns,profile=None):
+    profile = profile or profiling.profile_dataset(df)
 
-    st.write(df.head(display_rows))
+    display_preview(df, key="overview")
 
     st.subheader("2. Dataset Overview")
-    st.write(f"**Rows:** {df.shape[0]}")
-    st.write(f"**Columns:** {df.shape[1]}")
-    st.write(f"**Duplicates:** {df.shape[0] - df.drop_duplicates().shape[0]}")
+    if profile.approximate:
+        st.info(f"Streaming mode: statistics cover all {profile.n_rows} rows, the preview and plots use a random sample of {len(df)} rows.")
+    st.write(f"**Rows:** {profile.n_rows}")
+    st.write(f"**Columns:** {profile.n_columns}")
+    if profile.duplicate_rows is not None:
+        st.write(f"**Duplicates:** {profile.duplicate_rows}")
+    else:
+        st.write("**Duplicates:** not available in streaming mode")
     st.write(f"**Categorical Columns:** {len(cat_columns)}")
     st.write(cat_columns)
     st.write(f"**Numerical Columns:** {len(num_columns)}")
@@ -45,11 +98,8 @@ def display_dataset_overview(df,cat_columns,num_columns):
     
 
 # Function to find the missing values in the dataset
-def display_missing_values(df):
-    missing_count = df.isnull().sum()
-    missing_percentage = (missing_count / len(df)) * 100
-    missing_data = pd.DataFrame({'Missing Count': missing_count, 'Missing Percentage': missing_percentage})
-    missing_data = missing_data[missing_data['Missing Count'] > 0].sort_values(by='Missing Count', ascending=False)
+def display_missing_values(df, profile=None):
+    missing_data = analysis.missing_values_summary(df, profile)
     if not missing_data.empty:
         st.write("Missing Data Summary:")
         st.write(missing_data)
@@ -58,12 +108,12 @@ def display_missing_values(df):
         st.info("No Missing Value present in the Dataset")
 
 # Function to display basic statistics and visualizations about the dataset
-def display_statistics_visualization(df,cat_columns,num_columns):
+def display_statistics_visualization(df,cat_columns,num_columns,profile=None):
+    profile = profile or profiling.profile_dataset(df)
     st.write("Summary Statistics for Numerical Columns")
 
     if len(num_columns)!=0:
-        num_df = df[num_columns]
-        st.write(num_df.describe())
+        st.write(profile.describe(num_columns))
 
     else:
         st.info("The dataset does not have any numerical columns")
@@ -76,12 +126,15 @@ def display_statistics_visualization(df,cat_columns,num_columns):
 
         for column in selected_cat_columns:
             st.write(f"**{column}**")
-            value_counts = df[column].value_counts()
+            value_counts = profile.top_values(column)
+            if profile.cardinality(column) > len(value_counts):
+                approximately = "approximately " if column in profile.approximate_columns else ""
+                st.caption(f"Showing the {len(value_counts)} most frequent of {approximately}{profile.cardinality(column)} distinct values")
             st.bar_chart(value_counts)
 
             # display the value count in tabular format
             st.write(f"Value Count for {column}")
-            value_counts_table = df[column].value_counts().reset_index()
+            value_counts_table = value_counts.reset_index()
             value_counts_table.columns = ['Value','Count']
             st.write(value_counts_table)
 
@@ -89,9 +142,9 @@ def display_statistics_visualization(df,cat_columns,num_columns):
         st.info("The dataset does not have any categorical columns")
 
 # Funciton to display the datatypes
-def display_data_types(df):
-
-    data_types_df = pd.DataFrame({'Data Type':df.dtypes})
+def display_data_types(df, profile=None):
+    dtypes = profile.dtypes if profile else df.dtypes
+    data_types_df = pd.DataFrame({'Data Type':dtypes})
     st.write(data_types_df)
 
 # Function to search for a particular column or particular datatype in the dataset
@@ -100,25 +153,47 @@ def search_column(df):
 
     selected_data_type = st.selectbox("Filter by Data Type:", ['All'] + df.dtypes.unique().tolist())
 
-    # Apply filters to the DataFrame
-    filtered_df = df.copy()
+    # Filter the column names, the frame itself is not copied
+    columns = df.columns
 
     # Filter by search query
     if search_query:
-        filtered_df = filtered_df.loc[:, filtered_df.columns.str.contains(search_query, case=False)]
+        columns = columns[columns.astype(str).str.contains(search_query, case=False, regex=False)]
 
     # Filter by data type
     if selected_data_type != 'All':
-        filtered_df = filtered_df.select_dtypes(include=[selected_data_type])
+        columns = columns[(df.dtypes[columns] == selected_data_type).to_numpy()]
 
-    # Display the filtered DataFrame
-    st.write(filtered_df)
+    # Display a window of the matching columns
+    display_preview(df, key="search", columns=columns)
 
 
 
 ## FUNCTIONS FOR TAB2: Data Exploration and Visualization
 
-def display_individual_feature_distribution(df,num_columns):
+# In fast exploration mode results are estimated from a sample until the user asks for the exact result.
+# The promoted results are remembered for the session
+def _is_exact(sample, key):
+    return sample is None or key in st.session_state.setdefault("exact_results", set())
+
+def _promote(key):
+    st.session_state.setdefault("exact_results", set()).add(key)
+
+# Function to show the estimates of a numerical feature from the sample, with their confidence intervals
+def display_sample_estimates(sample, feature):
+    missing = sample.proportion_missing(feature)
+    estimates = {
+        "Mean": sample.mean(feature),
+        "25%": sample.quantile(feature, 0.25),
+        "Median": sample.quantile(feature, 0.5),
+        "75%": sample.quantile(feature, 0.75),
+        "Missing Percentage": sampling.Estimate(*(100 * value for value in missing)),
+    }
+    st.write(f"Estimated from a {sample.method} sample of {len(sample)} of {sample.population_rows} rows")
+    st.write("Count (estimated): ", round(sample.population_rows * (1 - missing.value)))
+    st.dataframe(pd.DataFrame(estimates, index=["Estimate", f"{sampling.CONFIDENCE:.0%} CI Low", f"{sampling.CONFIDENCE:.0%} CI High"]).T)
+
+def display_individual_feature_distribution(df,num_columns,profile=None,max_points=charts.MAX_SCATTER_POINTS,sample=None):
     st.subheader("Analyze Individual Feature Distribution")
     st.markdown("Here, you can explore individual numerical features, visualize their distributions, and analyze relationships between features.")
 
@@ -128,37 +203,44 @@ def display_individual_feature_distribution(df,num_columns):
 
     st.write("#### Understanding Numerical Features")
     feature = st.selectbox(label="Select Numerical Feature", options=num_columns, index=0)
-    df_description = df.describe()
-
-    # Display summary statistics
-    null_count = df[feature].isnull().sum()
-    st.write("Count: ", df_description[feature]['count'])
-    st.write("Missing Count: ", null_count)
-    st.write("Mean: ", df_description[feature]['mean'])
-    st.write("Standard Deviation: ", df_description[feature]['std'])
-    st.write("Minimum: ", df_description[feature]['min'])
-    st.write("Maximum: ", df_description[feature]['max'])
+    exact = _is_exact(sample, ("distribution", feature))
+    if exact:
+        feature_profile = profile.columns[feature] if profile else analysis.column_profile(df, feature)
+
+        # Display summary statistics
+        st.write("Count: ", feature_profile.count)
+        st.write("Missing Count: ", feature_profile.null_count)
+        st.write("Mean: ", feature_profile.mean)
+        st.write("Standard Deviation: ", feature_profile.std)
+        st.write("Minimum: ", feature_profile.min)
+        st.write("Maximum: ", feature_profile.max)
+    else:
+        display_sample_estimates(sample, feature)
+        st.button("Compute Exactly", key=f"exact_distribution_{feature}", on_click=_promote, args=(("distribution", feature),), help="Compute the statistics and plots of this feature over every row")
+        df = sample.frame
 
     # create plots for distribution
     st.subheader("Distribution Plots")
     plot_type = st.selectbox(label="Select Plot Type",options=['Histogram','Scatter Plot','Density Plot','Box Plot'])
 
+    # every chart is aggregated before plotting, so the figure size does not grow with the number of rows
+    # and is drawn once per frame, feature and plot type
     if plot_type=='Histogram':
-        fig=px.histogram(df,x=feature,title=f'Histogram of {feature}')
+        fig = charts.cached_figure(df, "histogram", [feature], lambda: charts.histogram(df[feature],title=f'Histogram of {feature}'))
 
     elif plot_type=='Scatter Plot':
-        fig = px.scatter(df,x=feature,y=feature,title=f'Scatter plot of {feature}')
+        fig = charts.cached_figure(df, f"scatter_lttb_{max_points}", [feature], lambda: charts.scatter(df,feature,feature,title=f'Scatter plot of {feature}',max_points=max_points,method='lttb'))
 
     elif plot_type=='Density Plot':
-        fig = px.density_contour(df,x=feature,title=f'Density plot of {feature}')
+        fig = charts.cached_figure(df, "density", [feature], lambda: charts.density(df[feature],title=f'Density plot of {feature}'))
 
     elif plot_type=='Box Plot':
-        fig = px.box(df,y=feature,title=f'Box plot of {feature}')
+        fig = charts.cached_figure(df, "box", [feature], lambda: charts.box(df[feature],title=f'Box plot of {feature}'))
 
     st.plotly_chart(fig,use_container_width=True)
 
 
-def display_scatter_plot_of_two_numeric_features(df,num_columns):
+def display_scatter_plot_of_two_numeric_features(df,num_columns,max_points=charts.MAX_SCATTER_POINTS):
 
     if len(num_columns) == 0:
         st.info("The dataset does not have any numerical columns")
@@ -168,30 +250,32 @@ def display_scatter_plot_of_two_numeric_features(df,num_columns):
         x_feature = st.selectbox(label="Select X-Axis Feature", options=num_columns, index=0)
         y_feature = st.selectbox(label="Select Y-Axis Feature", options=num_columns, index=1)
 
-        scatter_fig = px.scatter(df, x=x_feature, y=y_feature, title=f'Scatter Plot: {x_feature} vs {y_feature}')
+        scatter_fig = charts.cached_figure(df, f"scatter_{max_points}", [x_feature, y_feature], lambda: charts.scatter(df, x_feature, y_feature, title=f'Scatter Plot: {x_feature} vs {y_feature}', max_points=max_points))
         st.plotly_chart(scatter_fig, use_container_width=True)
 
 
 
-def categorical_variable_analysis(df,cat_columns):
+# `source` is the file df was read from, see analysis.value_counts
+def categorical_variable_analysis(df,cat_columns,backend=None,source=None):
+    backend = query_backend.get_backend() if backend is None else backend
 
     categorical_feature = st.selectbox(label="Select Categorical Feature",options=cat_columns)
     categorical_plot_type = st.selectbox(label="Select Plot Type",options=["Bar Chart","Pie Chart","Stacked Bar Chart","Frequency Count"])
     
     if categorical_plot_type =="Bar Chart":
-        fig = px.bar(df,x=categorical_feature,title=f"Bar Chart of {categorical_feature}")
+        fig = charts.bar(df[categorical_feature],title=f"Bar Chart of {categorical_feature}",counts=analysis.value_counts(df,categorical_feature,backend,source))
 
     elif categorical_plot_type == "Pie Chart":
-        fig = px.pie(df,names=categorical_feature,title=f"Pie Chart of {categorical_feature}")
+        fig = charts.pie(df[categorical_feature],title=f"Pie Chart of {categorical_feature}",counts=analysis.value_counts(df,categorical_feature,backend,source))
 
     elif categorical_plot_type == "Stacked Bar Chart":
         st.write("Select a second categorical feature for stacking")
         second_categorical_feature = st.selectbox(label="Select Second Categorical Feature",options=cat_columns)
 
-        fig = px.bar(df,x=categorical_feature,color=second_categorical_feature,title=f"Stacked Bar Chart of {categorical_feature} by {second_categorical_feature}")
+        fig = charts.stacked_bar(df,categorical_feature,second_categorical_feature,title=f"Stacked Bar Chart of {categorical_feature} by {second_categorical_feature}")
 
     elif categorical_plot_type == "Frequency Count":
-        cat_value_counts = df[categorical_feature].value_counts()
+        cat_value_counts = analysis.value_counts(df,categorical_feature,backend,source)
         st.write(f"Frequency Count for {categorical_feature}: ")
         st.write(cat_value_counts)
 
@@ -199,43 +283,105 @@ def categorical_variable_analysis(df,cat_columns):
         st.plotly_chart(fig,use_container_width=True) 
 
 
-def feature_exploration_numerical_variables(df,num_columns):
+# Builders of the long exploration actions, run as background jobs. Each reports its progress to the job
+# the drawing steps of the scatter plot matrix and of the heatmap are single library calls that cannot be
+# interrupted, a job cancelled during one of them stops when it returns
+def _build_scatter_matrix(job, df, features):
+    job.report(0.1, "Drawing the scatter plot matrix")
+    return px.scatter_matrix(df, dimensions=features, title="Scatter Plot Matrix")
+
+def _build_pair_plot(job, df, features):
+    progress = lambda fraction: job.report(fraction, "Binning and drawing the pair plot")
+    return charts.cached_figure(df, "pair_plot", features, lambda: charts.pair_plot(df, features, progress=progress))
+
+def _build_correlation_heatmap(job, df, features, method, correlations):
+    job.report(0.05, "Computing the correlation statistics")
+    correlation_matrix = correlations.correlation_matrix(df, features, method)
+    job.report(0.8, "Drawing the heatmap")
+    # pyplot keeps global state and is not thread safe, the figure is built on its own
+    fig = matplotlib_figure.Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    sns.heatmap(correlation_matrix, annot=True, cmap="coolwarm", linewidths=0.5, ax=ax)
+    job.report(0.95, "Laying out the heatmap")
+    ax.set_title("Correlation Heatmap")
+    return fig
+
+def _job_progress(label, key):
+    job = jobs.job_runner.get(key)
+    if job is None or job.is_finished:
+        # the whole page runs again and draws the result in place of the progress bar
+        st.rerun()
+    if job.cancelled:
+        st.progress(job.progress, text=f"{label}: cancelling, the step running now cannot be interrupted ({job.elapsed():.0f} s)")
+        return
+    st.progress(job.progress, text=f"{label}: {job.message} ({job.elapsed():.0f} s)")
+    st.button("Cancel", key=f"cancel_{label}", on_click=job.cancel, help="A drawing step already running finishes before the job stops.")
+
+# Function to run a long action as a background job. The button starts the job, or joins the same job already
+# running for this dataset version and these parameters. While it runs its progress is polled with a cancel button,
+# once it is done its result is drawn with render(), also on later reruns
+def _background_action(label, key, build, render):
+    if st.button(label):
+        jobs.job_runner.submit(key, build)
+    job = jobs.job_runner.get(key)
+    if job is None:
+        return
+    if not job.is_finished:
+        st.fragment(_job_progress, run_every=jobs.POLL_SECONDS)(label, key)
+    elif job.state == jobs.DONE:
+        render(job.result)
+    elif job.state == jobs.FAILED:
+        st.error(f"{label} failed: {job.error}")
+    else:
+        st.info(f"{label} was cancelled")
+
+
+def feature_exploration_numerical_variables(df,num_columns,correlations=None):
     selected_features = st.multiselect("Select Features for Exploration:", num_columns, default=num_columns[:2], key="feature_exploration")
 
     if len(selected_features) < 2:
         st.warning("Please select at least two numerical features for exploration.")
     else:
         st.subheader("Explore Relationships Between Features")
+        # the plots run in the background, the page stays responsive and a finished plot is kept across reruns
+        render_plotly = lambda fig: st.plotly_chart(fig, use_container_width=True)
 
         # Scatter Plot Matrix
-        if st.button("Generate Scatter Plot Matrix"):
-            scatter_matrix_fig = px.scatter_matrix(df, dimensions=selected_features, title="Scatter Plot Matrix")
-            st.plotly_chart(scatter_matrix_fig, use_container_width=True)
+        _background_action("Generate Scatter Plot Matrix", jobs.job_key(df, "scatter_matrix", tuple(selected_features)),
+                           functools.partial(_build_scatter_matrix, df=df, features=selected_features), render_plotly)
 
         # Pair Plot
-        if st.button("Generate Pair Plot"):
-            pair_plot_fig = sns.pairplot(df[selected_features])
-            st.pyplot(pair_plot_fig)
+        _background_action("Generate Pair Plot", jobs.job_key(df, "pair_plot", tuple(selected_features)),
+                           functools.partial(_build_pair_plot, df=df, features=selected_features), render_plotly)
 
-        # Correlation Heatmap
-        if st.button("Generate Correlation Heatmap"):
-            correlation_matrix = df[selected_features].corr()
-            plt.figure(figsize=(10, 6))
-            sns.heatmap(correlation_matrix, annot=True, cmap="coolwarm", linewidths=0.5)
-            plt.title("Correlation Heatmap")
-            st.pyplot(plt)     
+        # Correlation Heatmap. The service keeps the statistics of every numeric column, any selection is read off them
+        correlation_method = st.selectbox("Correlation Method", [correlation.PEARSON, correlation.SPEARMAN], format_func=str.title, key="correlation_method")
+        correlations = correlation.CorrelationService() if correlations is None else correlations
+        _background_action("Generate Correlation Heatmap", jobs.job_key(df, "correlation_heatmap", tuple(selected_features), correlation_method),
+                           functools.partial(_build_correlation_heatmap, df=df, features=selected_features, method=correlation_method, correlations=correlations), st.pyplot)
 
 
-def categorical_numerical_variable_analysis(df,cat_columns,num_columns):
+def categorical_numerical_variable_analysis(df,cat_columns,num_columns,backend=None,sample=None,source=None):
+    backend = query_backend.get_backend() if backend is None else backend
     categorical_feature_1 = st.selectbox(label="Categorical Feature", options=cat_columns)        
     numerical_feature_1 = st.selectbox(label="Numerical Feature", options=num_columns)
 
-# Group by the selected categorical column and calculate the mean of the numerical column
-    group_data = df.groupby(categorical_feature_1)[numerical_feature_1].mean().reset_index()
-
     st.subheader("Relationship between Categorical and Numerical Variables")
     st.write(f"Mean {numerical_feature_1} by {categorical_feature_1}")
+
+# Group by the selected categorical column and calculate the mean of the numerical column
+    promotion = ("group_mean", categorical_feature_1, numerical_feature_1)
+    if _is_exact(sample, promotion):
+        group_data = analysis.group_mean(df,categorical_feature_1,numerical_feature_1,backend,source)
+        error = None
+    else:
+        # estimated from the sample, the error bars show the confidence interval of each group mean
+        group_data = sample.group_means(categorical_feature_1,numerical_feature_1)
+        group_data["error"] = group_data["high"] - group_data[numerical_feature_1]
+        error = "error"
+        st.caption(f"Estimated from a {sample.method} sample of {len(sample)} of {sample.population_rows} rows, with {sampling.CONFIDENCE:.0%} confidence intervals")
+        st.button("Compute Exactly", key="exact_group_mean", on_click=_promote, args=(promotion,), help="Compute the group means over every row")
     
     # Create a bar chart
-    fig = px.bar(group_data, x=categorical_feature_1, y=numerical_feature_1, title=f"{numerical_feature_1} by {categorical_feature_1}")
+    fig = px.bar(group_data, x=categorical_feature_1, y=numerical_feature_1, error_y=error, title=f"{numerical_feature_1} by {categorical_feature_1}")
     st.plotly_chart(fig, use_container_width=True)
@@ -0,0 +1,264 @@
+''' This file contains the dataset loading layer used by the application.
+Uploads are hashed by content and the parsed dataframe is kept in a process wide cache bounded by memory,
+so a Streamlit rerun serves the already parsed frame instead of parsing the csv again. The cache is shared by every
+browser session: sessions that open the same content get the same frame object, which no code modifies in place
+(steps work on copy-on-write shallow copies, see preprocessing_pipeline.py), so a session only holds the columns its
+own steps changed. A session holds the entry of its base frame while it lives, held entries are not evicted.
+'''
+
+import hashlib
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+import pandas as pd
+
+import dtype_optimizer
+import partitioned
+import streaming
+
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+# The cache budget can be tuned per deployment with the AUTOEDA_CACHE_BYTES environment variable
+DEFAULT_CACHE_BYTES = int(os.environ.get("AUTOEDA_CACHE_BYTES", 4 * 1024 ** 3))
+
+# The only directory the app may read files from by path, set per deployment with the AUTOEDA_DATA_DIR environment
+# variable. Files on the server cannot be read by path when it is not set
+DATA_DIR = os.environ.get("AUTOEDA_DATA_DIR") or None
+
+
+# Function to find the directory files may be read from by path, with its symlinks resolved. None when it is not set
+def data_root(data_dir=None):
+    data_dir = DATA_DIR if data_dir is None else data_dir
+    return os.path.realpath(data_dir) if data_dir else None
+
+
+def is_inside(path, root):
+    return os.path.commonpath([os.path.realpath(path), root]) == root
+
+
+# Function to resolve a path typed in the app, relative to the data directory or absolute inside it. A path that
+# leads outside the data directory, through .. or a symlink, raises ValueError
+def resolve_data_path(path, data_dir=None):
+    root = data_root(data_dir)
+    if root is None:
+        raise ValueError("Reading files on the server is disabled, set AUTOEDA_DATA_DIR to the directory they may be read from")
+    resolved = os.path.realpath(os.path.join(root, os.fspath(path)))
+    if not is_inside(resolved, root):
+        raise ValueError(f"{path} is outside the data directory")
+    return resolved
+
+
+# Function to compute a content hash of an uploaded file or of a file on disk
+def content_hash(file):
+    hasher = hashlib.blake2b(digest_size=16)
+
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as handle:
+            for chunk in iter(lambda: handle.read(HASH_CHUNK_SIZE), b""):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    # Streamlit uploads are in-memory buffers, hash them without copying when possible
+    if hasattr(file, "getbuffer"):
+        hasher.update(file.getbuffer())
+        return hasher.hexdigest()
+
+    position = file.tell()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+        hasher.update(chunk)
+    file.seek(position)
+    return hasher.hexdigest()
+
+
+# Function to identify a file on disk by path, size and modification time, without reading it.
+# Used for files too large to hash on every rerun
+def file_fingerprint(path):
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+# Function to find the number of bytes a dataframe holds, including the python strings in object columns
+def frame_nbytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class DatasetCache:
+    '''LRU cache of parsed dataframes keyed by content hash and evicted by total memory size.
+    Entries held by a live session (see hold) are reference counted and only the others are evicted.'''
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_held = 0
+        self._entries = OrderedDict()
+        # key -> number of live holders of the entry
+        self._holders = {}
+        # keys whose holder was collected. The finalizers only record them, they can run inside the garbage
+        # collector at any allocation, also while this cache holds its lock
+        self._released = []
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            self._collect_released()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, df, nbytes=None):
+        nbytes = frame_nbytes(df) if nbytes is None else nbytes
+        with self._lock:
+            self._collect_released()
+            if key in self._entries:
+                self.bytes_held -= self._entries.pop(key)[1]
+
+            # a frame larger than the whole budget is returned to the caller but never cached
+            if nbytes > self.max_bytes:
+                return df
+
+            self._entries[key] = (df, nbytes)
+            self.bytes_held += nbytes
+            self._evict()
+        return df
+
+    # least recently used entries first. Held entries stay, their memory could not be freed anyway, so the cache
+    # can be over its budget while sessions hold more than the budget
+    def _evict(self):
+        while self.bytes_held > self.max_bytes:
+            key = next((key for key in self._entries if not self._holders.get(key)), None)
+            if key is None:
+                break
+            self.bytes_held -= self._entries.pop(key)[1]
+            self.evictions += 1
+
+    def get_or_load(self, key, loader, sizeof=frame_nbytes):
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            value = self.put(key, value, sizeof(value))
+        return value
+
+    # Function to hold the entry of `value`, a cached value or a frame inside a cached tuple, for as long as `holder`
+    # lives, e.g. the preprocessing pipeline of a session. Returns False when `value` is not cached
+    def hold(self, value, holder):
+        with self._lock:
+            self._collect_released()
+            key = next((key for key, (cached, _) in self._entries.items()
+                        if cached is value or (isinstance(cached, tuple) and any(item is value for item in cached))), None)
+            if key is None:
+                return False
+            self._holders[key] = self._holders.get(key, 0) + 1
+        weakref.finalize(holder, self._released.append, key)
+        return True
+
+    # called with the lock held
+    def _collect_released(self):
+        while self._released:
+            key = self._released.pop()
+            holders = self._holders.get(key, 0) - 1
+            if holders > 0:
+                self._holders[key] = holders
+            else:
+                self._holders.pop(key, None)
+        self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._holders.clear()
+            self.bytes_held = 0
+
+    def stats(self):
+        with self._lock:
+            self._collect_released()
+            held = [key for key in self._holders if key in self._entries]
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes_held": self.bytes_held,
+                "max_bytes": self.max_bytes,
+                "held_entries": len(held),
+                "held_bytes": sum(self._entries[key][1] for key in held),
+                "holders": sum(self._holders[key] for key in held),
+            }
+
+
+# Module level cache, shared by every rerun of the script in this process
+dataset_cache = DatasetCache()
+
+
+# Function to load a csv once per distinct content and serve later calls from the cache
+def load_cached(file, reader=pd.read_csv, cache=None):
+    cache = dataset_cache if cache is None else cache
+    key = content_hash(file)
+
+    def parse():
+        if hasattr(file, "seek"):
+            file.seek(0)
+        return reader(file)
+
+    return cache.get_or_load(key, parse)
+
+
+# Function to load a csv with compact dtypes. The optimized frame and its report are cached separately from the
+# plain frame, so switching the option on and off does not parse the file again
+def load_optimized(file, reader=pd.read_csv, cache=None):
+    cache = dataset_cache if cache is None else cache
+    key = ("optimized", content_hash(file))
+
+    def optimize():
+        return dtype_optimizer.optimize_dtypes(load_cached(file, reader, cache))
+
+    return cache.get_or_load(key, optimize, sizeof=lambda loaded: frame_nbytes(loaded[0]))
+
+
+# Function to profile a csv in streaming mode once per distinct file. The cache holds the profile and its bounded sample
+def load_streaming(file, chunk_rows=streaming.DEFAULT_CHUNK_ROWS, sample_rows=streaming.DEFAULT_SAMPLE_ROWS, cache=None):
+    cache = dataset_cache if cache is None else cache
+    fingerprint = file_fingerprint(file) if isinstance(file, (str, os.PathLike)) else content_hash(file)
+    key = ("stream", fingerprint, chunk_rows, sample_rows)
+
+    def parse():
+        return streaming.stream_profile(file, chunk_rows=chunk_rows, sample_rows=sample_rows)
+
+    return cache.get_or_load(key, parse, sizeof=lambda profile: frame_nbytes(profile.sample))
+
+
+# Function to identify a directory or glob of part files by the fingerprints of its parts
+def parts_hash(source, within=None):
+    hasher = hashlib.blake2b(digest_size=16)
+    for path in partitioned.find_parts(source, within):
+        hasher.update(file_fingerprint(path).encode())
+    return hasher.hexdigest()
+
+
+# Function to load a directory or glob of csv / parquet parts once per distinct set of parts.
+# Returns the frame and the report of parts whose schema differs from the others. With `within`, every part must
+# resolve inside that directory
+def load_partitioned(source, optimize=False, cache=None, within=None):
+    cache = dataset_cache if cache is None else cache
+    key = ("parts", parts_hash(source, within))
+
+    def parse():
+        return partitioned.load_parts(source, within=within)
+
+    df, report = cache.get_or_load(key, parse, sizeof=lambda loaded: frame_nbytes(loaded[0]))
+    if not optimize:
+        return df, report, None
+
+    def optimize_frame():
+        return dtype_optimizer.optimize_dtypes(df)
+
+    optimized, dtype_report = cache.get_or_load(("optimized",) + key, optimize_frame, sizeof=lambda loaded: frame_nbytes(loaded[0]))
+    return optimized, report, dtype_report
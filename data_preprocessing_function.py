@@ -1,9 +1,9 @@
-import streamlit as st
 import numpy as np
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder
-from sklearn.preprocessing import StandardScaler, MinMaxScaler
-from scipy import stats
+from collections import namedtuple
+import memo
+import parallel_executor
+import fitted_transformers
 
 
 def remove_selected_columns(df,columns_remove):
@@ -13,70 +13,159 @@ def remove_selected_columns(df,columns_remove):
 def remove_rows_with_missing_data(df, columns):
     if columns:
         df = df.dropna(subset=columns)
-        return df
+    return df
+
+# Column level transforms. Each one takes a single column and returns its new values,
+# so the executor can run them over many columns in parallel
+
+def fill_column(values, method):
+    if method == 'mean':
+        return values.fillna(values.mean())
+    elif method == 'median':
+        return values.fillna(values.median())
+    elif method == 'mode':
+        return values.fillna(values.mode().iloc[0])
+    return values
+
+
+def label_encode_column(values):
+    return fitted_transformers.LabelEncoding.fit(values).transform(values)
+
+
+def standard_scale_column(values):
+    return fitted_transformers.StandardScaling.fit(values).transform(values)
+
+
+def min_max_scale_column(values, feature_range=(0, 1)):
+    return fitted_transformers.MinMaxScaling.fit(values, feature_range).transform(values)
+
+
+# Function to run a column transform over the selected columns with the executor and assign the results back
+def _transform_columns(df, columns, transform, executor=None, **kwargs):
+    executor = executor or parallel_executor.default_executor
+    transformed = executor.map_columns(df, columns, transform, **kwargs)
+    for column, values in transformed.items():
+        df[column] = values
+    return df
+
 
 # Create a function to fill missing data with mean, median, or mode (for numerical columns)
-def fill_missing_data(df, columns, method):
+def fill_missing_data(df, columns, method, executor=None):
+    return _transform_columns(df, columns, fill_column, executor, method=method)
+
+
+# Function to fit the transformer of an operation on each column, in parallel, and apply it. `fitted` maps columns
+# to transformers fitted earlier, which are applied as they are; the transformers fitted here are added to it,
+# so the caller keeps them to apply the same encoding or scaling to new data
+def _fit_transform_columns(df, columns, operation, fitted=None, executor=None, **options):
+    fitted = {} if fitted is None else fitted
+    executor = executor or parallel_executor.default_executor
+    unfitted = [column for column in columns if column not in fitted]
+    fitted.update(executor.map_columns(df, unfitted, fitted_transformers.fit_column, operation=operation, **options))
     for column in columns:
-        if method == 'mean':
-            df[column].fillna(df[column].mean(), inplace=True)
-        elif method == 'median':
-            df[column].fillna(df[column].median(), inplace=True)
-        elif method == 'mode':
-            mode_val = df[column].mode().iloc[0]
-            df[column].fillna(mode_val, inplace=True)
+        df = fitted[column].apply(df, column)
     return df
 
 
-def one_hot_encode(df, columns):
-    df = pd.get_dummies(df, columns=columns, prefix=columns, drop_first=False)
-    return df
+# One-hot columns are sparse (or the category codes of each column), so wide encodings stay small
+def one_hot_encode(df, columns, output=fitted_transformers.SPARSE, fitted=None, executor=None):
+    return _fit_transform_columns(df, columns, "one_hot_encode", fitted, executor, output=output)
 
 
-def label_encode(df, columns):
-    label_encoder = LabelEncoder()
-    for col in columns:
-        df[col] = label_encoder.fit_transform(df[col])
-    return df
+# Each column gets its own encoder, fitted on that column only
+def label_encode(df, columns, fitted=None, executor=None):
+    return _fit_transform_columns(df, columns, "label_encode", fitted, executor)
 
 
+def standard_scale(df, columns, fitted=None, executor=None):
+    return _fit_transform_columns(df, columns, "standard_scale", fitted, executor)
 
-def standard_scale(df, columns):
-    scaler = StandardScaler()
-    df[columns] = scaler.fit_transform(df[columns])
-    return df
+def min_max_scale(df, columns, feature_range=(0, 1), fitted=None, executor=None):
+    return _fit_transform_columns(df, columns, "min_max_scale", fitted, executor, feature_range=tuple(feature_range))
 
-def min_max_scale(df, columns, feature_range=(0, 1)):
-    scaler = MinMaxScaler(feature_range=feature_range)
-    df[columns] = scaler.fit_transform(df[columns])
-    return df
 
-def detect_outliers_iqr(df, column_name):
-    data = df[column_name]
-    q25, q50, q75 = np.percentile(data, [25, 50, 75])
-    iqr = q75 - q25
-    lower_bound = q25 - 1.5 * iqr
-    upper_bound = q75 + 1.5 * iqr
-    outliers = [x for x in data if x < lower_bound or x > upper_bound]
-    outliers.sort()
-    return outliers
+# Result of an outlier detection: a boolean mask over the rows of the frame and the lower / upper bounds.
+# With per-group detection the bounds are Series indexed by group
+Outliers = namedtuple('Outliers', ['mask', 'lower', 'upper'])
+
+OUTLIER_METHODS = {'iqr': 'IQR', 'zscore': 'Z-Score', 'mad': 'Modified Z-Score (MAD)'}
 
 
+# Function to compute a statistic of a column, either over the whole column or per group.
+# Per group statistics are broadcast back to the rows so the bounds can be compared elementwise
+def _column_statistic(values, groups, statistic):
+    if groups is None:
+        return statistic(values)
+    return statistic(values.groupby(groups, sort=False)).reindex(groups).to_numpy()
 
-# Function to detect outliers using z-score
-def detect_outliers_zscore(df, column_name):
-    data = df[column_name]
-    z_scores = np.abs(stats.zscore(data))
-    threshold = 3  # Define a threshold (e.g., 3 is commonly used)
-    outliers = [data[i] for i in range(len(data)) if z_scores[i] > threshold]
-    return outliers
+
+def _outliers(df, column_name, lower, upper, groups):
+    data = df[column_name].to_numpy(dtype=np.float64, na_value=np.nan)
+    # NaN compares False on both sides, so missing values are never outliers
+    mask = (data < np.asarray(lower)) | (data > np.asarray(upper))
+    if groups is not None:
+        lower = pd.Series(lower, index=groups).groupby(level=0).first()
+        upper = pd.Series(upper, index=groups).groupby(level=0).first()
+    return Outliers(pd.Series(mask, index=df.index), lower, upper)
+
+
+def _numeric_column(df, column_name, by):
+    values = pd.to_numeric(df[column_name], errors='coerce').astype(np.float64)
+    groups = None if by is None else pd.Index(df[by])
+    return values, groups
+
+
+# Function to detect outliers with the IQR rule (outside factor * IQR from the quartiles), optionally per group
+def detect_outliers_iqr(df, column_name, factor=1.5, by=None):
+    values, groups = _numeric_column(df, column_name, by)
+    if groups is None:
+        q25, q75 = np.nanquantile(values.to_numpy(), [0.25, 0.75]) if values.notna().any() else (np.nan, np.nan)
+    else:
+        q25 = _column_statistic(values, groups, lambda v: v.quantile(0.25))
+        q75 = _column_statistic(values, groups, lambda v: v.quantile(0.75))
+    iqr = q75 - q25
+    return _outliers(df, column_name, q25 - factor * iqr, q75 + factor * iqr, groups)
+
+
+# Function to detect outliers using z-score (more than threshold standard deviations from the mean), optionally per group
+def detect_outliers_zscore(df, column_name, threshold=3, by=None):
+    values, groups = _numeric_column(df, column_name, by)
+    # population standard deviation, as scipy.stats.zscore uses
+    mean = _column_statistic(values, groups, lambda v: v.mean())
+    std = _column_statistic(values, groups, lambda v: v.std(ddof=0))
+    return _outliers(df, column_name, mean - threshold * std, mean + threshold * std, groups)
+
+
+# Function to detect outliers using the modified z-score 0.6745 * (x - median) / MAD, optionally per group.
+# When the MAD is zero the mean absolute deviation is used instead (Iglewicz and Hoaglin)
+def detect_outliers_mad(df, column_name, threshold=3.5, by=None):
+    values, groups = _numeric_column(df, column_name, by)
+    median = _column_statistic(values, groups, lambda v: v.median())
+    deviation = (values - median).abs()
+    mad = _column_statistic(deviation, groups, lambda v: v.median())
+    mean_deviation = _column_statistic(deviation, groups, lambda v: v.mean())
+    scale = np.where(np.asarray(mad) > 0, np.asarray(mad) / 0.6745, np.asarray(mean_deviation) * 1.253314)
+    # a constant column has no outliers
+    scale = np.where(scale > 0, scale, np.inf)
+    return _outliers(df, column_name, median - threshold * scale, median + threshold * scale, groups)
+
+
+# Function to detect outliers with the given method ('iqr', 'zscore' or 'mad'), optionally per group of the `by` column.
+# The detection runs on every rerun of the preprocessing tab, it is memoized on the frame version and the arguments
+@memo.memoize
+def detect_outliers(df, column_name, method='zscore', by=None):
+    if method == 'iqr':
+        return detect_outliers_iqr(df, column_name, by=by)
+    if method == 'mad':
+        return detect_outliers_mad(df, column_name, by=by)
+    return detect_outliers_zscore(df, column_name, by=by)
 
 
 def remove_outliers(df, column_name, outliers):
-    return df[~df[column_name].isin(outliers)]
+    return df[~outliers.mask]
 
 def transform_outliers(df, column_name, outliers):
-    non_outliers = df[~df[column_name].isin(outliers)]
-    median_value = non_outliers[column_name].median()
-    df.loc[df[column_name].isin(outliers), column_name] = median_value
+    median_value = df.loc[~outliers.mask, column_name].median()
+    # where() upcasts integer columns when the median is fractional
+    df[column_name] = df[column_name].where(~outliers.mask, median_value)
     return df
@@ -0,0 +1,74 @@
+''' This file contains the optional dtype optimizer applied when a dataset is loaded.
+Numeric columns are downcast to the smallest dtype that holds their values exactly, repeated strings become
+categories and the remaining strings are stored as Arrow-backed strings when pyarrow is installed.
+'''
+
+import numpy as np
+import pandas as pd
+
+# Text columns whose distinct values are at most this fraction of the rows are stored as category
+CATEGORY_MAX_RATIO = 0.5
+
+try:
+    import pyarrow  # noqa: F401
+    ARROW_STRING_DTYPE = pd.StringDtype("pyarrow")
+except ImportError:
+    ARROW_STRING_DTYPE = None
+
+
+# the smallest signed integer dtype that holds every value of the column
+def _downcast_integer(values):
+    return pd.to_numeric(values, downcast="integer")
+
+
+def _downcast_float(values):
+    # float32 only when every value survives the round trip, so no precision is lost
+    candidate = values.astype(np.float32)
+    if np.array_equal(candidate.to_numpy(dtype=np.float64), values.to_numpy(dtype=np.float64), equal_nan=True):
+        return candidate
+    return values
+
+
+def _compact_text(values, category_ratio):
+    present = values.dropna()
+    if len(present) == 0:
+        return values
+    if values.nunique() <= category_ratio * len(values):
+        return values.astype("category")
+    # pandas 3 already stores strings in Arrow, only python object columns are converted
+    if ARROW_STRING_DTYPE is not None and pd.api.types.is_object_dtype(values.dtype) and pd.api.types.infer_dtype(present, skipna=True) == "string":
+        return values.astype(ARROW_STRING_DTYPE)
+    return values
+
+
+# Function to pick a compact dtype for one column
+def optimize_column(values, category_ratio=CATEGORY_MAX_RATIO):
+    dtype = values.dtype
+    if pd.api.types.is_bool_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype):
+        return values
+    if pd.api.types.is_integer_dtype(dtype) and isinstance(dtype, np.dtype):
+        return _downcast_integer(values)
+    if pd.api.types.is_float_dtype(dtype) and isinstance(dtype, np.dtype):
+        return _downcast_float(values)
+    if pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+        return _compact_text(values, category_ratio)
+    return values
+
+
+# Function to optimize every column of a dataframe. Returns the optimized frame and a per-column report
+# with the dtype and memory before and after
+def optimize_dtypes(df, category_ratio=CATEGORY_MAX_RATIO):
+    optimized, rows = {}, []
+    for col in df.columns:
+        before = df[col]
+        after = optimize_column(before, category_ratio)
+        optimized[col] = after
+        rows.append({
+            "Column": col,
+            "Dtype Before": str(before.dtype),
+            "Dtype After": str(after.dtype),
+            "Bytes Before": int(before.memory_usage(index=False, deep=True)),
+            "Bytes After": int(after.memory_usage(index=False, deep=True)),
+        })
+    report = pd.DataFrame(rows, columns=["Column", "Dtype Before", "Dtype After", "Bytes Before", "Bytes After"]).set_index("Column")
+    return pd.DataFrame(optimized, index=df.index), report
@@ -0,0 +1,193 @@
+''' This file contains the export of the preprocessed dataframe for download.
+The frame is encoded in chunks of rows, so memory is bounded by one chunk and the encoded output instead of
+several copies of the whole csv text, and the export only runs when the user asks for the download.
+'''
+
+import gzip
+import io
+import itertools
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import fitted_transformers
+
+EXPORT_CHUNK_ROWS = 100_000
+
+# gzip level of the compressed csv export, low levels are several times faster for a few percent larger files
+GZIP_LEVEL = 1
+
+# format -> (file extension, mime type)
+FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "CSV (gzip)": ("csv.gz", "application/gzip"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "Feather": ("feather", "application/vnd.apache.arrow.file"),
+}
+
+
+# object columns Arrow cannot type, such as numbers mixed with text, are exported as text like DataFrame.to_csv
+# writes them. Only the columns pandas sees as mixed are tried
+def _text_columns(df):
+    columns = []
+    for column in df.columns[(df.dtypes == object).to_numpy()]:
+        values = df[column]
+        if pd.api.types.infer_dtype(values, skipna=True) not in ("mixed", "mixed-integer"):
+            continue
+        try:
+            pa.array(values, from_pandas=True)
+        except (pa.ArrowException, TypeError, ValueError):
+            columns.append(column)
+    return columns
+
+
+def _as_text(frame, columns):
+    if not columns:
+        return frame
+    frame = frame.copy(deep=False)
+    for column in columns:
+        frame[column] = frame[column].astype("str")
+    return frame
+
+
+# the schema is inferred once over the whole frame, so a column that is empty in the first chunk keeps its type.
+# Arrow has no sparse type: sparse one-hot columns are typed from an empty dense copy and written dense chunk by chunk
+def _schema(df):
+    sparse = fitted_transformers.sparse_columns(df)
+    if not sparse:
+        return pa.Schema.from_pandas(df, preserve_index=False)
+    empty = pa.Schema.from_pandas(fitted_transformers.to_dense(df.iloc[:0]), preserve_index=False)
+    dense = iter(pa.Schema.from_pandas(df.drop(columns=list(sparse)), preserve_index=False))
+    return pa.schema([field if column in sparse else next(dense) for column, field in zip(df.columns, empty)], metadata=empty.metadata)
+
+
+# a frame that does not fit the schema, such as a later chunk whose column was read with another dtype, is given a
+# second chance with the values of the text columns of the schema written as text
+def _arrow_tables(frames, schema):
+    text_fields = [field.name for field in schema if pa.types.is_string(field.type) or pa.types.is_large_string(field.type)]
+    for frame in frames:
+        frame = fitted_transformers.to_dense(frame)
+        try:
+            yield pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            columns = [column for column in text_fields if column in frame.columns and frame[column].dtype != "str"]
+            if not columns:
+                raise
+            frame = frame.copy(deep=False)
+            for column in columns:
+                frame[column] = frame[column].astype("str").where(frame[column].notna())
+            yield pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+
+
+# an empty frame is one empty chunk, so the header or schema is still written
+def _chunks(df, chunk_rows):
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+# the csv is written by DataFrame.to_csv chunk by chunk: strings are quoted only when needed, booleans are True /
+# False and object columns of mixed types are written as they are
+def _write_csv(frames, schema, handle):
+    text = io.TextIOWrapper(handle, encoding="utf-8", newline="", write_through=True)
+    for number, frame in enumerate(frames):
+        fitted_transformers.to_dense(frame).to_csv(text, index=False, header=number == 0)
+    # the wrapper is detached so it does not close the handle
+    text.detach()
+
+
+def _write_csv_gzip(frames, schema, handle):
+    # closing the gzip stream writes its trailer but leaves the underlying file open
+    with gzip.GzipFile(fileobj=handle, mode="wb", compresslevel=GZIP_LEVEL) as compressed:
+        _write_csv(frames, schema, compressed)
+
+
+def _write_parquet(frames, schema, handle):
+    # every chunk becomes one row group
+    with pq.ParquetWriter(handle, schema, compression="snappy") as writer:
+        for table in _arrow_tables(frames, schema):
+            writer.write_table(table)
+
+
+def _write_feather(frames, schema, handle):
+    options = pa.ipc.IpcWriteOptions(compression="lz4")
+    with pa.ipc.new_file(handle, schema, options=options) as writer:
+        for table in _arrow_tables(frames, schema):
+            writer.write_table(table)
+
+
+# Formats written as Arrow tables, they need the schema of the frame
+ARROW_FORMATS = {"Parquet", "Feather"}
+
+WRITERS = {
+    "CSV": _write_csv,
+    "CSV (gzip)": _write_csv_gzip,
+    "Parquet": _write_parquet,
+    "Feather": _write_feather,
+}
+
+
+def _writer(export_format):
+    if export_format not in WRITERS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    return WRITERS[export_format]
+
+
+# Function to write a dataframe in one of FORMATS to a binary file object, chunk_rows rows at a time
+def export_frame(df, export_format, handle, chunk_rows=EXPORT_CHUNK_ROWS):
+    write = _writer(export_format)
+    if export_format not in ARROW_FORMATS:
+        write(_chunks(df, chunk_rows), None, handle)
+        return handle
+    text_columns = _text_columns(df)
+    schema = _schema(_as_text(df, text_columns))
+    write((_as_text(chunk, text_columns) for chunk in _chunks(df, chunk_rows)), schema, handle)
+    return handle
+
+
+# Function to write frames produced one after the other, such as the chunks of a file transformed as it is read,
+# to a binary file object. The schema is taken from the first frame, later frames are cast to it, so the frames should
+# have the same dtypes (see streaming.chunk_dtypes)
+def export_chunks(frames, export_format, handle):
+    write = _writer(export_format)
+    frames = iter(frames)
+    first = next(frames, None)
+    if first is None:
+        raise ValueError("Nothing to export: the input has no rows")
+    if export_format not in ARROW_FORMATS:
+        write(itertools.chain([first], frames), None, handle)
+        return handle
+    text_columns = _text_columns(first)
+    schema = _schema(_as_text(first, text_columns))
+    write((_as_text(frame, text_columns) for frame in itertools.chain([first], frames)), schema, handle)
+    return handle
+
+
+# Function to export a dataframe to an in-memory file, in the form st.download_button accepts
+def export(df, export_format, chunk_rows=EXPORT_CHUNK_ROWS):
+    handle = io.BytesIO()
+    export_frame(df, export_format, handle, chunk_rows)
+    handle.seek(0)
+    return handle
+
+
+# Function to export for a deferred download. The export runs when the download is requested, outside the script
+# run, so an error is appended to `errors` for the next rerun to show, and raised again so no broken file is served
+def export_reporting_errors(df, export_format, errors, chunk_rows=EXPORT_CHUNK_ROWS):
+    try:
+        return export(df, export_format, chunk_rows)
+    except Exception as error:
+        errors.append(f"{type(error).__name__}: {error}")
+        raise
+
+
+def file_name(stem, export_format):
+    return f"{stem}.{FORMATS[export_format][0]}"
+
+
+# Function to find the export format of a file name from its extension, the longest matching extension wins
+def format_from_file_name(name):
+    matches = [fmt for fmt, (extension, _) in FORMATS.items() if str(name).lower().endswith("." + extension)]
+    if not matches:
+        raise ValueError(f"Cannot tell the export format of {name!r}, use one of: {', '.join(extension for extension, _ in FORMATS.values())}")
+    return max(matches, key=lambda fmt: len(FORMATS[fmt][0]))
@@ -0,0 +1,231 @@
+''' This file contains the fitted encoders and scalers of the preprocessing tab.
+Fitting keeps the parameters of every column (the classes of a label encoding, the mean and scale of a
+standardization, ...), so a step can be replayed on new data with the parameters learnt on the original dataset,
+and the fitted transformers can be saved as json and applied to a file larger than memory chunk by chunk.
+One-hot encodings are sparse indicator columns built from the category codes, or the codes themselves, so their
+memory grows with the rows rather than with rows x categories.
+'''
+
+import json
+
+import numpy as np
+import pandas as pd
+
+import lazy_imports
+
+# scipy is imported the first time a sparse one-hot encoding is built, see lazy_imports.py
+sparse = lazy_imports.lazy_import("scipy.sparse")
+
+# One-hot output: sparse indicator columns named like get_dummies, or a single categorical column of codes
+SPARSE = "sparse"
+CODES = "codes"
+ONE_HOT_OUTPUTS = (SPARSE, CODES)
+
+
+def _observed_values(values):
+    return values.dropna().unique()
+
+
+class LabelEncoding:
+    '''Classes of a column in sorted order, as LabelEncoder keeps them. Missing values get the code after the last
+    class when the fitted column had any, values not seen when fitting get -1.'''
+
+    operation = "label_encode"
+
+    def __init__(self, classes, has_missing=False):
+        self.classes = list(classes)
+        self.has_missing = has_missing
+
+    @classmethod
+    def fit(cls, values):
+        return cls(np.sort(np.asarray(_observed_values(values), dtype=object)).tolist(), bool(values.isna().any()))
+
+    def transform(self, values):
+        codes = pd.Categorical(values, categories=self.classes).codes.astype(np.int64)
+        if self.has_missing:
+            codes[values.isna().to_numpy()] = len(self.classes)
+        return codes
+
+    def apply(self, df, column):
+        df[column] = self.transform(df[column])
+        return df
+
+    def to_dict(self):
+        return {"classes": self.classes, "has_missing": self.has_missing}
+
+
+class StandardScaling:
+    '''Mean and standard deviation of a column, missing values are ignored when fitting and stay missing.'''
+
+    operation = "standard_scale"
+
+    def __init__(self, mean, scale):
+        self.mean = mean
+        self.scale = scale
+
+    @classmethod
+    def fit(cls, values):
+        values = pd.to_numeric(values, errors="coerce").astype(np.float64)
+        std = values.std(ddof=0)
+        # a constant column is centred but not scaled, as StandardScaler does
+        return cls(float(values.mean()), float(std) if std > 0 else 1.0)
+
+    def transform(self, values):
+        return ((pd.to_numeric(values, errors="coerce").astype(np.float64) - self.mean) / self.scale).to_numpy()
+
+    def apply(self, df, column):
+        df[column] = self.transform(df[column])
+        return df
+
+    def to_dict(self):
+        return {"mean": self.mean, "scale": self.scale}
+
+
+class MinMaxScaling:
+    '''Minimum and maximum of a column, mapped to feature_range. New values outside them fall outside the range.'''
+
+    operation = "min_max_scale"
+
+    def __init__(self, data_min, data_max, feature_range=(0, 1)):
+        self.data_min = data_min
+        self.data_max = data_max
+        self.feature_range = tuple(feature_range)
+
+    @classmethod
+    def fit(cls, values, feature_range=(0, 1)):
+        values = pd.to_numeric(values, errors="coerce").astype(np.float64)
+        return cls(float(values.min()), float(values.max()), feature_range)
+
+    def transform(self, values):
+        low, high = self.feature_range
+        data_range = self.data_max - self.data_min
+        scale = (high - low) / (data_range if data_range > 0 else 1.0)
+        return (pd.to_numeric(values, errors="coerce").astype(np.float64) * scale + (low - self.data_min * scale)).to_numpy()
+
+    def apply(self, df, column):
+        df[column] = self.transform(df[column])
+        return df
+
+    def to_dict(self):
+        return {"data_min": self.data_min, "data_max": self.data_max, "feature_range": list(self.feature_range)}
+
+
+class OneHotEncoding:
+    '''Categories of a column in the order get_dummies uses: the categories of a categorical column, otherwise the
+    sorted values. Missing values and values not seen when fitting have no indicator set.'''
+
+    operation = "one_hot_encode"
+
+    def __init__(self, categories, output=SPARSE):
+        if output not in ONE_HOT_OUTPUTS:
+            raise ValueError(f"Unknown one-hot output: {output}")
+        self.categories = list(categories)
+        self.output = output
+
+    @classmethod
+    def fit(cls, values, output=SPARSE):
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            categories = values.cat.categories
+        else:
+            categories = np.sort(np.asarray(_observed_values(values), dtype=object))
+        return cls(categories.tolist(), output)
+
+    def codes(self, values):
+        return pd.Categorical(values, categories=self.categories)
+
+    def names(self, column):
+        return [f"{column}_{category}" for category in self.categories]
+
+    # Function to build the indicator columns of a column as one sparse matrix, each row stores at most one value
+    def indicators(self, values, column):
+        codes = self.codes(values).codes
+        rows = np.flatnonzero(codes >= 0)
+        matrix = sparse.csc_matrix((np.ones(len(rows), dtype=bool), (rows, codes[rows])), shape=(len(values), len(self.categories)))
+        return pd.DataFrame.sparse.from_spmatrix(matrix, index=values.index, columns=self.names(column))
+
+    def apply(self, df, column):
+        if self.output == CODES:
+            # a new frame, as get_dummies returned one
+            df = df.copy(deep=False)
+            df[column] = self.codes(df[column])
+            return df
+        # the indicator columns replace the column at the end of the frame, as get_dummies places them
+        return pd.concat([df.drop(columns=[column]), self.indicators(df[column], column)], axis=1)
+
+    def to_dict(self):
+        return {"categories": self.categories, "output": self.output}
+
+
+# operation -> transformer class
+TRANSFORMERS = {transformer.operation: transformer for transformer in (LabelEncoding, StandardScaling, MinMaxScaling, OneHotEncoding)}
+
+
+# Function to fit the transformer of an operation on one column. Module level, so the executor can run it in a worker
+def fit_column(values, operation, **options):
+    return TRANSFORMERS[operation].fit(values, **options)
+
+
+def transformer_to_dict(transformer):
+    return {"operation": transformer.operation, **transformer.to_dict()}
+
+
+def transformer_from_dict(entry):
+    entry = dict(entry)
+    operation = entry.pop("operation")
+    if operation not in TRANSFORMERS:
+        raise ValueError(f"Unknown transformer: {operation}")
+    return TRANSFORMERS[operation](**entry)
+
+
+# The fitted transformers of a step are stored as [column, transformer] pairs, json would turn non-string column
+# names into strings as object keys
+def fitted_to_list(entries):
+    return [[column, transformer_to_dict(transformer)] for column, transformer in entries]
+
+
+def fitted_from_list(entries):
+    return {column: transformer_from_dict(entry) for column, entry in entries or []}
+
+
+class TransformerRegistry:
+    '''Fitted transformers in the order they were fitted, each with the column it applies to.'''
+
+    def __init__(self, entries=()):
+        self.entries = list(entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, fitted):
+        self.entries.extend(fitted.items())
+
+    # Function to apply every transformer, in order, to a frame holding the columns they were fitted on
+    def transform(self, df):
+        for column, transformer in self.entries:
+            if column not in df.columns:
+                raise KeyError(f"Column {column!r} the transformers were fitted on is missing")
+            df = transformer.apply(df, column)
+        return df
+
+    def to_json(self):
+        return json.dumps({"transformers": fitted_to_list(self.entries)}, indent=2, default=str)
+
+    @classmethod
+    def from_json(cls, registry_json):
+        return cls((column, transformer_from_dict(entry)) for column, entry in json.loads(registry_json)["transformers"])
+
+
+def sparse_columns(df):
+    return {column for column, dtype in df.dtypes.items() if isinstance(dtype, pd.SparseDtype)}
+
+
+# Function to turn the sparse indicator columns of a frame into dense columns, for Arrow which has no sparse type.
+# Other columns are shared with the frame
+def to_dense(df):
+    columns = sparse_columns(df)
+    if not columns:
+        return df
+    df = df.copy(deep=False)
+    for column in columns:
+        df[column] = df[column].sparse.to_dense()
+    return df
@@ -0,0 +1,284 @@
+''' This file contains the timing and allocation instrumentation behind the Performance panel of the sidebar.
+Functions of the hot paths are wrapped once per process by instrument_module; a wrapper only records a span while
+a rerun of the current thread is traced (see begin_rerun), so a session without the panel pays one context variable
+lookup per call. Each span records its wall time, its self time (without the instrumented functions it called) and,
+when allocations are traced, the bytes it allocated and its peak with tracemalloc. Categories let the time of a
+rerun be attributed to parsing, statistics, plotting, rendering and serialization.
+Traces are aggregated per session by SessionPerformance and per process for the Prometheus text export. Spans of
+background jobs and of executor threads run outside the rerun context and are not recorded.
+'''
+
+import contextvars
+import functools
+import inspect
+import json
+import threading
+import time
+import tracemalloc
+import weakref
+from collections import namedtuple
+
+import pandas as pd
+
+# Categories of the instrumented layers
+PARSE = "parse"
+STATS = "stats"
+PLOT = "plot"
+RENDER = "render"
+SERIALIZE = "serialize"
+ANALYSIS = "analysis"
+PREPROCESS = "preprocess"
+
+# Reruns kept per session for the panel
+MAX_SESSION_RERUNS = 50
+
+# One call of an instrumented function. start is in seconds since the start of the rerun, bytes are None when
+# allocations were not traced
+Span = namedtuple('Span', ['name', 'category', 'start', 'seconds', 'self_seconds', 'allocated', 'peak', 'depth', 'thread'])
+
+# the trace of the rerun running in this context, None when it is not traced
+_active_trace = contextvars.ContextVar("autoeda_trace", default=None)
+
+# tracemalloc slows down every allocation of the process, it runs only while a traced rerun asks for allocations
+_tracemalloc_users = 0
+_tracemalloc_lock = threading.Lock()
+# a trace that is never finished (the rerun raised, or st.stop ended it) releases tracemalloc when it is collected.
+# Its finalizer only records the release here, the count is updated under the lock by the next rerun of any session
+_released_tracemalloc = []
+
+
+# Function to add `change` users of tracemalloc, after the releases of the collected traces. tracemalloc starts with
+# the first user and stops with the last one
+def _update_tracemalloc(change):
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        while _released_tracemalloc:
+            change -= _released_tracemalloc.pop()
+        if not change:
+            return
+        users = _tracemalloc_users
+        _tracemalloc_users += change
+        if users == 0 and _tracemalloc_users > 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif users > 0 and _tracemalloc_users == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+class RerunTrace:
+    '''Spans recorded during one rerun of the script.'''
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.started = time.perf_counter()
+        self.seconds = None
+        self.spans = []
+        # [children seconds, peak traced bytes seen by the children] of the spans open on this thread
+        self._stack = []
+        self._token = None
+        self._release = None
+        if memory:
+            _update_tracemalloc(1)
+            self._release = weakref.finalize(self, _released_tracemalloc.append, 1)
+
+    @property
+    def is_finished(self):
+        return self.seconds is not None
+
+    def record(self, name, category, function, args, kwargs):
+        stack = self._stack
+        start = time.perf_counter()
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1][1] = max(stack[-1][1], peak)
+            tracemalloc.reset_peak()
+        frame = [0.0, 0]
+        stack.append(frame)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            stack.pop()
+            allocated = peak_bytes = None
+            if self.memory:
+                after, peak = tracemalloc.get_traced_memory()
+                peak = max(peak, frame[1])
+                allocated, peak_bytes = after - current, peak - current
+                if stack:
+                    stack[-1][1] = max(stack[-1][1], peak)
+            if stack:
+                stack[-1][0] += seconds
+            self.spans.append(Span(name, category, start - self.started, seconds, seconds - frame[0], allocated, peak_bytes, len(stack), threading.current_thread().name))
+
+    def finish(self):
+        if self.is_finished:
+            return self
+        self.seconds = time.perf_counter() - self.started
+        if self._release is not None and self._release.detach() is not None:
+            _update_tracemalloc(-1)
+        if self._token is not None and _active_trace.get() is self:
+            _active_trace.reset(self._token)
+        process_totals.add(self)
+        return self
+
+    # Function to sum the spans of the trace per function, slowest self time first
+    def summary(self):
+        return summarize(self.spans)
+
+    # Function to sum the self time of the spans per category. The time no instrumented function accounts for is
+    # the script itself (widgets, layout and glue code)
+    def by_category(self):
+        seconds = {}
+        for span in self.spans:
+            seconds[span.category] = seconds.get(span.category, 0.0) + span.self_seconds
+        seconds["script"] = max(0.0, (self.seconds or 0.0) - sum(span.seconds for span in self.spans if span.depth == 0))
+        return pd.Series(seconds, name="Seconds").sort_values(ascending=False)
+
+    # Function to write the trace in the Trace Event Format read by chrome://tracing and Perfetto
+    def to_json(self):
+        events = []
+        for span in sorted(self.spans, key=lambda span: span.start):
+            args = {"self_seconds": span.self_seconds}
+            if span.allocated is not None:
+                args.update(allocated_bytes=span.allocated, peak_bytes=span.peak)
+            events.append({
+                "name": span.name, "cat": span.category, "ph": "X", "pid": 0, "tid": span.thread,
+                "ts": span.start * 1e6, "dur": span.seconds * 1e6, "args": args,
+            })
+        return json.dumps({"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"rerun_seconds": self.seconds}}, indent=2)
+
+
+# Function to sum spans per function: calls, total and self seconds, and allocated and peak bytes
+def summarize(spans):
+    rows = {}
+    for span in spans:
+        row = rows.setdefault((span.name, span.category), {"Function": span.name, "Category": span.category, "Calls": 0, "Seconds": 0.0, "Self Seconds": 0.0, "Allocated Bytes": None, "Peak Bytes": None})
+        row["Calls"] += 1
+        row["Seconds"] += span.seconds
+        row["Self Seconds"] += span.self_seconds
+        if span.allocated is not None:
+            row["Allocated Bytes"] = (row["Allocated Bytes"] or 0) + span.allocated
+            row["Peak Bytes"] = max(row["Peak Bytes"] or 0, span.peak)
+    columns = ["Function", "Category", "Calls", "Seconds", "Self Seconds", "Allocated Bytes", "Peak Bytes"]
+    # bytes are missing, not zero, for the spans recorded without tracemalloc
+    summary = pd.DataFrame(list(rows.values()), columns=columns).astype({"Allocated Bytes": "Int64", "Peak Bytes": "Int64"})
+    return summary.sort_values("Self Seconds", ascending=False, ignore_index=True)
+
+
+class SessionPerformance:
+    '''The traced reruns of one session, the most recent MAX_SESSION_RERUNS of them.'''
+
+    def __init__(self, max_reruns=MAX_SESSION_RERUNS):
+        self.max_reruns = max_reruns
+        self.reruns = []
+
+    def add(self, trace):
+        self.reruns = (self.reruns + [trace])[-self.max_reruns:]
+
+    @property
+    def last(self):
+        return self.reruns[-1] if self.reruns else None
+
+    def rerun_seconds(self):
+        return pd.Series([trace.seconds for trace in self.reruns], name="Rerun Seconds")
+
+    def summary(self):
+        return summarize([span for trace in self.reruns for span in trace.spans])
+
+
+class ProcessTotals:
+    '''Counters of every traced rerun of the process, for the Prometheus export.'''
+
+    def __init__(self):
+        self.reruns = 0
+        self.rerun_seconds = 0.0
+        # (function, category) -> [calls, seconds, self seconds, allocated bytes]
+        self.functions = {}
+        self._lock = threading.Lock()
+
+    def add(self, trace):
+        with self._lock:
+            self.reruns += 1
+            self.rerun_seconds += trace.seconds
+            for span in trace.spans:
+                totals = self.functions.setdefault((span.name, span.category), [0, 0.0, 0.0, 0])
+                totals[0] += 1
+                totals[1] += span.seconds
+                totals[2] += span.self_seconds
+                totals[3] += max(span.allocated or 0, 0)
+
+    # Function to write the counters in the Prometheus text exposition format
+    def to_prometheus(self):
+        with self._lock:
+            functions = sorted(self.functions.items())
+            lines = [
+                "# HELP autoeda_reruns_total Traced reruns of the script.",
+                "# TYPE autoeda_reruns_total counter",
+                f"autoeda_reruns_total {self.reruns}",
+                "# HELP autoeda_rerun_seconds_total Wall time of the traced reruns.",
+                "# TYPE autoeda_rerun_seconds_total counter",
+                f"autoeda_rerun_seconds_total {self.rerun_seconds!r}",
+            ]
+        metrics = [
+            ("autoeda_function_calls_total", "Calls of instrumented functions.", 0),
+            ("autoeda_function_seconds_total", "Wall time of instrumented functions, including the functions they call.", 1),
+            ("autoeda_function_self_seconds_total", "Wall time of instrumented functions, without the instrumented functions they call.", 2),
+            ("autoeda_function_allocated_bytes_total", "Bytes allocated by instrumented functions while allocations were traced.", 3),
+        ]
+        for metric, description, position in metrics:
+            lines += [f"# HELP {metric} {description}", f"# TYPE {metric} counter"]
+            for (name, category), totals in functions:
+                lines.append(f'{metric}{{function="{_label(name)}",category="{_label(category)}"}} {totals[position]!r}')
+        return "\n".join(lines) + "\n"
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+# Module level counters, shared by every session of this process
+process_totals = ProcessTotals()
+
+
+# Function to start tracing the rerun running in this context, or to stop tracing when `enabled` is False.
+# A trace left unfinished by the previous rerun of the context (st.stop, st.rerun) is finished first, the
+# allocation tracing of one left unfinished in another context is released once that trace is collected
+def begin_rerun(enabled=True, memory=False):
+    _update_tracemalloc(0)
+    previous = _active_trace.get()
+    if previous is not None:
+        previous.finish()
+        _active_trace.set(None)
+    if not enabled:
+        return None
+    trace = RerunTrace(memory)
+    trace._token = _active_trace.set(trace)
+    return trace
+
+
+# Function to wrap a function so its calls are recorded as spans of the traced rerun
+def instrument(function, category, name=None):
+    if getattr(function, "__instrumented__", False):
+        return function
+    name = name or f"{function.__module__}.{function.__qualname__}"
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        trace = _active_trace.get()
+        if trace is None:
+            return function(*args, **kwargs)
+        return trace.record(name, category, function, args, kwargs)
+
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
+# Function to instrument the functions defined in a module, or only those in `names`. The module attributes are
+# replaced, so calls between the functions of the module are recorded too. Calling it again does nothing
+def instrument_module(module, category, names=None, prefix=None):
+    if names is None:
+        names = [name for name, member in inspect.getmembers(module, inspect.isfunction)
+                 if member.__module__ == module.__name__ and not name.startswith("__")]
+    prefix = module.__name__ if prefix is None else prefix
+    for name in names:
+        setattr(module, name, instrument(getattr(module, name), category, f"{prefix}.{name}"))
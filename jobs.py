@@ -0,0 +1,184 @@
+''' This file contains the background job runner of the long exploration actions, such as the pair plot, the scatter
+plot matrix and the correlation heatmap. A job runs on a worker thread while the Streamlit script finishes, so the
+page stays responsive; the script polls the job on every rerun and draws its result once it is done. Jobs are keyed
+by (dataset version, action, parameters): a request for a job that is already queued or running joins it instead of
+starting the work again, and finished results are kept for later reruns until their dataset version is forgotten.
+Jobs report their progress and check for cancellation between the steps of their work.
+'''
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import memo
+
+# Worker threads of the job runner and how many finished jobs are kept, tunable per deployment
+DEFAULT_JOB_WORKERS = int(os.environ.get("AUTOEDA_JOB_WORKERS", 2))
+MAX_FINISHED_JOBS = int(os.environ.get("AUTOEDA_MAX_FINISHED_JOBS", 32))
+
+# Seconds between two polls of a running job by the page
+POLL_SECONDS = 0.5
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class Cancelled(Exception):
+    '''Raised inside a job by Job.report once the job was cancelled.'''
+
+
+class Job:
+    '''One background computation: its state, progress, and result or error.'''
+
+    def __init__(self, key):
+        self.key = key
+        self.state = PENDING
+        self.progress = 0.0
+        self.message = "Waiting for a worker"
+        self.result = None
+        self.error = None
+        self.started = None
+        self.finished = None
+        self.future = None
+        self._cancel = threading.Event()
+
+    @property
+    def is_finished(self):
+        return self.state in (DONE, FAILED, CANCELLED)
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    # Function called by the work of the job between its steps, with the fraction of the work done so far
+    def report(self, progress, message=None):
+        if self._cancel.is_set():
+            raise Cancelled()
+        self.progress = min(max(float(progress), 0.0), 1.0)
+        if message is not None:
+            self.message = message
+
+    # a queued job never starts, a running one stops at its next report or, if it reports no more, once its work
+    # returns
+    def cancel(self):
+        self._cancel.set()
+        if self.future is not None and self.future.cancel():
+            self._finish(CANCELLED)
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    def _finish(self, state, result=None, error=None):
+        self.result, self.error = result, error
+        self.finished = time.monotonic()
+        self.state = state
+
+
+class JobRunner:
+    '''Thread pool running jobs keyed by (dataset version, action, parameters), with the finished jobs in an LRU.'''
+
+    def __init__(self, workers=DEFAULT_JOB_WORKERS, max_finished=MAX_FINISHED_JOBS):
+        self.workers = workers
+        self.max_finished = max_finished
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="autoeda-job")
+        return self._pool
+
+    # Function to start function(job) as the job of `key`. A queued, running or finished job of the same key is
+    # returned instead, a failed or cancelled one is started again
+    def submit(self, key, function):
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.state not in (FAILED, CANCELLED):
+                self._jobs.move_to_end(key)
+                return job
+            job = Job(key)
+            self._jobs[key] = job
+            self._evict()
+            job.future = self._get_pool().submit(self._run, job, function)
+        return job
+
+    def _run(self, job, function):
+        job.started = time.monotonic()
+        job.state = RUNNING
+        job.message = "Running"
+        try:
+            job.report(0.0)
+            result = function(job)
+            # a job cancelled after its last report, during a step that cannot be interrupted, drops its result
+            job.report(1.0, "Done")
+        except Cancelled:
+            job._finish(CANCELLED)
+        except Exception as error:
+            job._finish(FAILED, error=error)
+        else:
+            job._finish(DONE, result)
+        with self._lock:
+            self._evict()
+
+    # finished jobs beyond max_finished are dropped, least recently requested first. Unfinished jobs are kept
+    def _evict(self):
+        finished = [key for key, job in self._jobs.items() if job.is_finished]
+        for key in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[key]
+
+    def get(self, key):
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                self._jobs.move_to_end(key)
+            return job
+
+    def cancel(self, key):
+        job = self.get(key)
+        if job is not None:
+            job.cancel()
+        return job
+
+    # Function to wait until every job submitted so far has finished, used by the benchmarks
+    def wait(self, timeout=None):
+        with self._lock:
+            futures = [job.future for job in self._jobs.values() if not job.is_finished]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for future in futures:
+            try:
+                future.result(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            except Exception:
+                pass
+
+    # jobs are keyed by dataset version first, the jobs of a version no frame holds any more are dropped
+    def forget_version(self, version):
+        with self._lock:
+            for key in [key for key in self._jobs if key[0] == version]:
+                self._jobs.pop(key).cancel()
+
+    def active_jobs(self):
+        with self._lock:
+            return [job for job in self._jobs.values() if not job.is_finished]
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+
+# Module level runner, shared by every session of this process
+job_runner = JobRunner()
+memo.add_forget_listener(job_runner.forget_version)
+
+
+# Function to build the key of a job on a frame
+def job_key(df, action, *params):
+    return (memo.frame_version(df), action) + tuple(params)
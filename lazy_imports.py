@@ -0,0 +1,38 @@
+''' This file contains the lazy imports of the heavy plotting and statistics libraries.
+Plotly, seaborn, matplotlib, scipy, polars and duckdb take most of the start-up time of a worker, and each of them
+is only needed by some views of the app. A lazy module is imported the first time one of its attributes is read,
+so the Home view never loads them and the other views load only what they draw with.
+benchmarks/import_time.py checks the start-up modules against a budget.
+'''
+
+import importlib
+import importlib.util
+
+
+class LazyModule:
+    '''Stands in for a module until one of its attributes is read. The import itself is thread safe.'''
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+    def __repr__(self):
+        state = "imported" if self._module is not None else "not imported yet"
+        return f"<lazy module {self._name!r}, {state}>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
+# Function to check that a module can be imported, without importing it
+def is_available(name):
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
@@ -1,16 +1,43 @@
+import os
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import numpy as np
-import seaborn as sns
-from collections import Counter
-import plotly.express as px
+import pyarrow as pa
 from streamlit_option_menu import option_menu
+import analysis
 import data_analysis_functions as function
 import data_preprocessing_function as preprocessing_function
 import home_page
-import base64
-
+import data_loader
+import profiling
+import preprocessing_pipeline
+import session_store
+import query_backend
+import correlation
+import sampling
+import charts
+import memo
+import functools
+import exporter
+import fitted_transformers
+import instrumentation
+
+# Hot paths timed by the Performance panel, grouped by what they spend their time on. Wrapping happens once per
+# process; while a session does not trace its rerun a wrapper costs one context variable lookup per call
+instrumentation.instrument_module(data_loader, instrumentation.PARSE, names=["load_cached", "load_optimized", "load_partitioned", "load_streaming", "content_hash", "parts_hash"])
+instrumentation.instrument_module(function, instrumentation.ANALYSIS)
+instrumentation.instrument_module(preprocessing_function, instrumentation.PREPROCESS)
+instrumentation.instrument_module(analysis, instrumentation.STATS)
+instrumentation.instrument_module(profiling, instrumentation.STATS)
+instrumentation.instrument_module(profiling.DatasetProfile, instrumentation.STATS, names=["compute"])
+instrumentation.instrument_module(correlation.CorrelationService, instrumentation.STATS, names=["refresh", "matrix"])
+instrumentation.instrument_module(sampling, instrumentation.STATS)
+instrumentation.instrument_module(charts, instrumentation.PLOT)
+instrumentation.instrument_module(exporter, instrumentation.SERIALIZE)
+instrumentation.instrument_module(session_store.SessionStore, instrumentation.SERIALIZE, names=["save_frame", "load_frame", "sync"])
+instrumentation.instrument_module(st, instrumentation.RENDER, names=["write", "dataframe", "table", "plotly_chart", "pyplot", "bar_chart", "download_button"], prefix="st")
+
+# The rerun is traced while the Performance panel at the bottom of the sidebar is on
+trace = instrumentation.begin_rerun(st.session_state.get("performance_panel", False), memory=st.session_state.get("performance_memory", False))
 
 
 # # page config sets the text and icon that we see on the tab
@@ -56,6 +83,26 @@ if selected == 'Home':
 uploaded_file = st.sidebar.file_uploader("Upload Your CSV File Here", type=["csv","xls"])
 use_example_data = st.sidebar.checkbox("Use Example Titanic Dataset", value=False)
 
+# Streaming mode reads the csv in chunks, so files larger than memory can be profiled
+streaming_mode = st.sidebar.checkbox("Streaming Mode for Large Files", value=False, help="Statistics are accumulated over every row in chunks, previews and plots use a random sample.")
+# Files on the server can only be read from the data directory of the deployment (AUTOEDA_DATA_DIR)
+server_path = st.sidebar.text_input("Or Stream a CSV From a Server Path", help="Relative to the data directory of the server.") if streaming_mode and data_loader.DATA_DIR else ""
+
+# Partitioned datasets in the data directory of the server are loaded part by part in parallel
+parts_path = st.sidebar.text_input("Or Load a Directory or Glob of CSV / Parquet Parts", help="Relative to the data directory of the server. Every csv, csv.gz and parquet file under the directory (or matching the pattern, e.g. sales/**/*.parquet) is loaded and concatenated.") if not streaming_mode and data_loader.DATA_DIR else ""
+
+# Compact dtypes cut the memory of the loaded frame and speed up every later statistic
+optimize_memory = st.sidebar.checkbox("Optimize Memory Usage", value=False, help="Downcast numeric columns, store repeated strings as categories and other strings as Arrow strings.")
+
+# Fast exploration estimates the charts and statistics of the exploration tab from a sample of the rows
+fast_exploration = st.sidebar.checkbox("Fast Exploration on a Sample", value=False, help="Charts and statistics of the Data Exploration and Visualization tab are estimated from a random or stratified sample, with confidence intervals. Any result can be computed exactly on demand.")
+sample_rows = st.sidebar.number_input("Sample Rows", min_value=1000, value=sampling.DEFAULT_SAMPLE_ROWS, step=10000) if fast_exploration else None
+
+# Grouped means and value counts can run on polars or duckdb when they are installed, pandas is the default
+query_backends = query_backend.available_backends()
+query_backend_name = st.sidebar.selectbox("Query Engine", query_backends, index=query_backends.index(query_backend.DEFAULT_BACKEND) if query_backend.DEFAULT_BACKEND in query_backends else 0) if len(query_backends) > 1 else query_backends[0]
+backend = query_backend.get_backend(query_backend_name)
+
 # ADDING LINKS TO MY PROFILES 
 st.sidebar.write("#")
 st.sidebar.write("#")
@@ -86,26 +133,118 @@ col2.markdown(f'<a href="https://github.com/Devang-C"><img src="data:image/png;b
 
 
 
-if uploaded_file:
-    df = function.load_data(uploaded_file)
-
-
-    # get a copy of original df from the session state or create a new one. this is for preprocessing purposes
-    if 'new_df' not in st.session_state:
-        st.session_state.new_df = df.copy()
+# Each browser session gets an id kept in the url, so its datasets and preprocessing steps stored on disk are
+# found again after a page reload or a restart of the server
+store = session_store.session_store
+session_id = st.query_params.get("session")
+if not session_store.is_valid_id(session_id):
+    session_id = session_store.new_session_id()
+    st.query_params["session"] = session_id
+    store.prune()
+
+profile = None
+# the file the dataset was read from, when the query engines can read its columns from it directly (projection and
+# predicate pushdown, see query_backend.py)
+data_source = None
+dtype_report = None
+schema_report = None
+if streaming_mode and (uploaded_file or server_path):
+    try:
+        server_source = data_loader.resolve_data_path(server_path) if server_path else None
+        profile = function.load_data_streaming(server_source or uploaded_file)
+    except (ValueError, OSError, pa.ArrowException) as error:
+        st.sidebar.error(f"Could not load {server_path or uploaded_file.name}: {error}")
+        st.stop()
+    # the queries read every row of the file, not only the sample the profile keeps
+    if server_source and query_backend.can_scan(server_source):
+        data_source = server_source
+    df = profile.sample
+
+    if 'pipeline' not in st.session_state:
+        st.session_state.pipeline = preprocessing_pipeline.PreprocessingPipeline(df)
+        # the profile and its sample are shared with every session streaming the same file while this session lives
+        data_loader.dataset_cache.hold(profile, st.session_state.pipeline)
+
+elif uploaded_file:
+    if optimize_memory:
+        df, dtype_report = function.load_data_optimized(uploaded_file)
+    else:
+        df = function.load_data(uploaded_file)
+
+
+    # the preprocessing pipeline starts from the original df and keeps it unchanged. this is for preprocessing purposes
+    # the original df is shared with every session that uploads the same file, the session holds it while it lives
+    if 'pipeline' not in st.session_state:
+        st.session_state.dataset_key = data_loader.content_hash(uploaded_file) + ("-optimized" if optimize_memory else "")
+        st.session_state.pipeline = store.open_pipeline(session_id, st.session_state.dataset_key, df)
+        data_loader.dataset_cache.hold(df, st.session_state.pipeline)
 
     
 
+elif parts_path:
+    try:
+        parts_source = data_loader.resolve_data_path(parts_path)
+        df, schema_report, dtype_report = function.load_data_partitioned(parts_source, optimize_memory)
+    except (ValueError, OSError, pa.ArrowException) as error:
+        st.sidebar.error(f"Could not load {parts_path}: {error}")
+        st.stop()
+    # a dataset of several parts has columns unified across them and partition columns, only a single file is queried directly
+    if os.path.isfile(parts_source) and query_backend.can_scan(parts_source):
+        data_source = parts_source
+
+    if 'pipeline' not in st.session_state:
+        st.session_state.dataset_key = data_loader.parts_hash(parts_source, data_loader.data_root()) + ("-optimized" if optimize_memory else "")
+        st.session_state.pipeline = store.open_pipeline(session_id, st.session_state.dataset_key, df)
+        data_loader.dataset_cache.hold(df, st.session_state.pipeline)
+
 # Create a checkbox in the sidebar to choose between the example dataset and uploaded dataset
 
 elif use_example_data:
     # Load the example dataset
-    df = function.load_data(file="example_dataset/titanic.csv")
-
-    # Set st.session_state.new_df to the example dataset for data preprocessing
-    if 'new_df' not in st.session_state:
-        st.session_state.new_df = df
-   
+    data_source = "example_dataset/titanic.csv"
+    if optimize_memory:
+        df, dtype_report = function.load_data_optimized(file="example_dataset/titanic.csv")
+    else:
+        df = function.load_data(file="example_dataset/titanic.csv")
+
+    # Start the preprocessing pipeline from the example dataset
+    if 'pipeline' not in st.session_state:
+        st.session_state.dataset_key = data_loader.content_hash("example_dataset/titanic.csv") + ("-optimized" if optimize_memory else "")
+        st.session_state.pipeline = store.open_pipeline(session_id, st.session_state.dataset_key, df)
+        data_loader.dataset_cache.hold(df, st.session_state.pipeline)
+
+# A session restored after a restart has no upload widget state, its original frame is read back from the store
+elif 'pipeline' in st.session_state or store.latest(session_id) is not None:
+    if 'pipeline' not in st.session_state:
+        st.session_state.dataset_key = store.latest(session_id)
+        original = store.load_frame(session_id, st.session_state.dataset_key, session_store.ORIGINAL)
+        st.session_state.pipeline = store.open_pipeline(session_id, st.session_state.dataset_key, original)
+    df = st.session_state.pipeline.base
+
+
+has_data = uploaded_file or parts_path or use_example_data or (streaming_mode and server_path) or 'pipeline' in st.session_state
+
+# Cache counters, used to size AUTOEDA_CACHE_BYTES and AUTOEDA_MEMO_BYTES for a deployment
+if has_data:
+    with st.sidebar.expander("Dataset Cache"):
+        cache_stats = data_loader.dataset_cache.stats()
+        st.write(f"**Hits:** {cache_stats['hits']}  **Misses:** {cache_stats['misses']}  **Evictions:** {cache_stats['evictions']}")
+        st.write(f"**Held:** {cache_stats['bytes_held'] / 1024 ** 2:.1f} MB of {cache_stats['max_bytes'] / 1024 ** 2:.0f} MB ({cache_stats['entries']} datasets)")
+        st.write(f"**Shared:** {cache_stats['held_entries']} datasets, {cache_stats['held_bytes'] / 1024 ** 2:.1f} MB, open in {cache_stats['holders']} sessions")
+        st.write(f"**Session Store:** {store.disk_usage(session_id) / 1024 ** 2:.1f} MB on disk")
+        memo_stats = memo.memo_cache.stats()
+        st.write(f"**Results:** {memo_stats['hits']} hits, {memo_stats['misses']} misses, {memo_stats['bytes_held'] / 1024 ** 2:.1f} MB of {memo_stats['max_bytes'] / 1024 ** 2:.0f} MB")
+
+if schema_report is not None and not schema_report.empty:
+    with st.sidebar.expander(f"Schema Mismatches ({len(schema_report)} files)"):
+        st.caption("Missing columns are filled with missing values, differing types are widened to a common type.")
+        st.dataframe(schema_report)
+
+if dtype_report is not None:
+    with st.sidebar.expander("Memory Optimization"):
+        bytes_before, bytes_after = dtype_report['Bytes Before'].sum(), dtype_report['Bytes After'].sum()
+        st.write(f"**{bytes_before / 1024 ** 2:.2f} MB → {bytes_after / 1024 ** 2:.2f} MB** ({bytes_before / max(bytes_after, 1):.1f}x smaller)")
+        st.dataframe(dtype_report)
 
 
 # TODO: Some issue related to session_state. When we upload a new dataset, it does not reflect changes in the data preprocessing tab as we are using session state.
@@ -114,7 +253,7 @@ elif use_example_data:
 
 
 # Display the dataset preview or any other content here
-if uploaded_file is None and selected!='Home' and not use_example_data:
+if not has_data and selected!='Home':
     # st.subheader("Welcome to DataExplora!")
     st.markdown("#### Use the sidebar to upload a CSV file or use the provided example dataset and explore your data.")
     
@@ -123,45 +262,69 @@ else:
     if selected=='Data Exploration':
 
         tab1, tab2 = st.tabs(['📊 Dataset Overview :clipboard', "🔎 Data Exploration and Visualization"])
-        num_columns, cat_columns = function.categorical_numerical(df)
+        # profile the dataset once, every overview and exploration function reads from it
+        if profile is None:
+            profile = profiling.get_profile(df)
+        num_columns, cat_columns = analysis.categorical_numerical(df, profile)
         
         
         with tab1: # DATASET OVERVIEW TAB
             st.subheader("1. Dataset Preview")
             st.markdown("This section provides an overview of your dataset. You can select the number of rows to display and view the dataset's structure.")
-            function.display_dataset_overview(df,cat_columns,num_columns)
+            function.display_dataset_overview(df,cat_columns,num_columns,profile)
 
 
             st.subheader("3. Missing Values")
-            function.display_missing_values(df)
+            function.display_missing_values(df,profile)
             
             st.subheader("4. Data Statistics and Visualization")
-            function.display_statistics_visualization(df,cat_columns,num_columns)
+            function.display_statistics_visualization(df,cat_columns,num_columns,profile)
 
             st.subheader("5. Data Types")
-            function.display_data_types(df)
+            function.display_data_types(df,profile)
 
             st.subheader("Search for a specific column or datatype")
             function.search_column(df)
 
         with tab2: 
 
-            function.display_individual_feature_distribution(df,num_columns)
+            # in fast exploration mode the tab works on a sample, drawn once per frame and sample settings
+            sample = None
+            explore_df = df
+            if fast_exploration:
+                strata_columns = [col for col in cat_columns if col in df.columns and profile.cardinality(col) <= sampling.MAX_STRATA]
+                stratify_by = st.selectbox("Stratify Sample By", [None] + strata_columns, format_func=lambda col: "No stratification (random sample)" if col is None else col)
+                sample = sampling.get_sample(df, int(sample_rows), stratify_by)
+                explore_df = sample.frame
+                st.info(f"Fast exploration: results below are estimated from a {sample.method} sample of {len(sample)} of {len(df)} rows.")
+
+            function.display_individual_feature_distribution(df,num_columns,None if sample else profile,sample=sample)
 
             st.subheader("Scatter Plot")
-            function.display_scatter_plot_of_two_numeric_features(df,num_columns)
+            function.display_scatter_plot_of_two_numeric_features(explore_df,num_columns)
 
 
             if len(cat_columns)!=0:
                 st.subheader("Categorical Variable Analysis")
-                function.categorical_variable_analysis(df,cat_columns)
+                function.categorical_variable_analysis(explore_df,cat_columns,backend,source=None if sample else data_source)
             else:
                 st.info("The dataset does not have any categorical columns")
 
 
             st.subheader("Feature Exploration of Numerical Variables")
-            if len(num_columns)!=0:
-                function.feature_exploration_numerical_variables(df,num_columns)
+            # once preprocessing steps were applied, the features can be explored as they are after the steps
+            feature_df, feature_columns = explore_df, num_columns
+            pipeline = st.session_state.get('pipeline')
+            if pipeline is not None and pipeline.steps:
+                feature_data = st.radio("Explore Features Of", ["Original dataset", "Preprocessed dataset"], horizontal=True, key="feature_exploration_data")
+                if feature_data == "Preprocessed dataset":
+                    feature_df, feature_columns = pipeline.df, list(analysis.columns_of_type(pipeline.df, ['number']))
+            if len(feature_columns)!=0:
+                # one correlation service per session, updated in place when the explored frame changes: after a
+                # preprocessing step only the columns it changed are recomputed
+                if 'correlations' not in st.session_state:
+                    st.session_state.correlations = correlation.CorrelationService()
+                function.feature_exploration_numerical_variables(feature_df,feature_columns,st.session_state.correlations)
 
             else:
                 st.warning("The dataset does not contain any numerical variables")
@@ -169,7 +332,7 @@ else:
             # Create a bar graph to get relationship between categorical variable and numerical variable
             st.subheader("Categorical and Numerical Variable Analysis")
             if len(num_columns)!=0 and len(cat_columns)!=0:
-                function.categorical_numerical_variable_analysis(df,cat_columns,num_columns)
+                function.categorical_numerical_variable_analysis(df,cat_columns,num_columns,backend,sample=sample,source=data_source)
                 
             else:
                 st.warning("The dataset does not have any numerical variables. Hence Cannot Perform Categorical and Numerical Variable Analysis")
@@ -177,26 +340,52 @@ else:
     # DATA PREPROCESSING  
     if selected=='Data Preprocessing':
         # st.header("🛠️ Data Preprocessing")
-        revert = st.button("Revert to Original Dataset",key="revert_button")
+        if profile is not None and profile.approximate:
+            st.info(f"Streaming mode: preprocessing works on a random sample of {len(df)} of the {profile.n_rows} rows.")
+
+        pipeline = st.session_state.pipeline
+
+        # callbacks run before the rerun, so every widget below already sees the reverted, undone or redone frame
+        revert_col, undo_col, redo_col = st.columns(3)
+        revert_col.button("Revert to Original Dataset",key="revert_button",on_click=pipeline.reset)
+        undo_col.button("Undo Last Step",key="undo_button",on_click=pipeline.undo,disabled=not pipeline.steps)
+        redo_col.button("Redo Step",key="redo_button",on_click=pipeline.redo,disabled=not pipeline.redo_stack)
+
+        # Lineage log of the applied steps. The saved json can be replayed on a fresh file
+        with st.expander(f"Preprocessing Steps ({len(pipeline.steps)})"):
+            if pipeline.steps:
+                st.dataframe(pipeline.lineage(), hide_index=True)
+                st.download_button("Download Pipeline", pipeline.to_json(), file_name="preprocessing_pipeline.json", mime="application/json")
+                # the fitted encoders and scalers alone, for `python cli.py transform` on new files
+                registry = pipeline.registry()
+                if len(registry):
+                    st.download_button("Download Fitted Transformers", registry.to_json(), file_name="fitted_transformers.json", mime="application/json")
+            else:
+                st.info("No preprocessing steps applied yet")
 
-        if revert:
-            st.session_state.new_df = df.copy()
+            saved_pipeline = st.file_uploader("Replay a Saved Pipeline", type=["json"])
+            if saved_pipeline is not None and st.button("Replay Pipeline"):
+                try:
+                    pipeline.replay(saved_pipeline.getvalue().decode())
+                    st.success("Pipeline replayed successfully.")
+                except (ValueError, KeyError, TypeError) as error:
+                    st.error(f"Could not replay the pipeline: {error}")
 
         # REMOVING UNWANTED COLUMNS
         st.subheader("Remove Unwanted Columns")
-        columns_to_remove = st.multiselect(label='Select Columns to Remove',options=st.session_state.new_df.columns)
+        columns_to_remove = st.multiselect(label='Select Columns to Remove',options=pipeline.df.columns)
 
         if st.button("Remove Selected Columns"):
             if columns_to_remove:
-                st.session_state.new_df = preprocessing_function.remove_selected_columns(st.session_state.new_df,columns_to_remove)
+                pipeline.apply("remove_columns",columns=columns_to_remove)
                 st.success("Selected Columns Removed Sucessfully")
                 
-        st.dataframe(st.session_state.new_df)
+        function.display_preview(pipeline.df, key="remove_columns_preview")
        
 
        # Handle missing values in the dataset
         st.subheader("Handle Missing Data")
-        missing_count = st.session_state.new_df.isnull().sum()
+        missing_count = analysis.missing_value_counts(pipeline.df)
 
         if missing_count.any():
 
@@ -206,23 +395,23 @@ else:
             )
 
             if selected_missing_option == "Remove Rows in Selected Columns":
-                columns_to_remove_missing = st.multiselect("Select columns to remove rows with missing data", options=st.session_state.new_df.columns)
+                columns_to_remove_missing = st.multiselect("Select columns to remove rows with missing data", options=pipeline.df.columns)
                 if st.button("Remove Rows with Missing Data"):
-                    st.session_state.new_df = preprocessing_function.remove_rows_with_missing_data(st.session_state.new_df, columns_to_remove_missing)
+                    pipeline.apply("remove_rows_with_missing_data", columns=columns_to_remove_missing)
                     st.success("Rows with missing data removed successfully.")
 
             elif selected_missing_option == "Fill Missing Data in Selected Columns (Numerical Only)":
-                numerical_columns_to_fill = st.multiselect("Select numerical columns to fill missing data", options=st.session_state.new_df.select_dtypes(include=['number']).columns)
+                numerical_columns_to_fill = st.multiselect("Select numerical columns to fill missing data", options=analysis.columns_of_type(pipeline.df, ['number']))
                 fill_method = st.selectbox("Select fill method:", ["mean", "median", "mode"])
                 if st.button("Fill Missing Data"):
                     if numerical_columns_to_fill:
-                        st.session_state.new_df = preprocessing_function.fill_missing_data(st.session_state.new_df, numerical_columns_to_fill, fill_method)
+                        pipeline.apply("fill_missing_data", columns=numerical_columns_to_fill, method=fill_method)
                         st.success(f"Missing data in numerical columns filled with {fill_method} successfully.")
 
                     else:
                         st.warning("Please select a column to fill in the missing data")
 
-            function.display_missing_values(st.session_state.new_df)
+            function.display_missing_values(pipeline.df)
 
         else:
             st.info("The dataset does not contain any missing values")
@@ -232,26 +421,28 @@ else:
         '''
         st.subheader("Encode Categorical Data")
 
-        new_df_categorical_columns = st.session_state.new_df.select_dtypes(include=['object']).columns
+        new_df_categorical_columns = analysis.columns_of_type(pipeline.df, ['object', 'string', 'category'])
 
         if not new_df_categorical_columns.empty:
             select_categorical_columns = st.multiselect("Select Columns to perform encoding",new_df_categorical_columns)
 
             #choose the encoding method
             encoding_method = st.selectbox("Select Encoding Method:",['One Hot Encoding','Label Encoding'],help=encoding_tooltip)
+            one_hot_outputs = {fitted_transformers.SPARSE: "Sparse Indicator Columns", fitted_transformers.CODES: "Category Codes"}
+            one_hot_output = st.selectbox("One-Hot Output:", list(one_hot_outputs), format_func=one_hot_outputs.get, help="Indicator columns are stored sparse, so many categories take little memory. Category codes keep one categorical column per feature.") if encoding_method == "One Hot Encoding" else None
     
 
             if st.button("Apply Encoding"):
                 if encoding_method=="One Hot Encoding":
-                    st.session_state.new_df = preprocessing_function.one_hot_encode(st.session_state.new_df,select_categorical_columns)
+                    pipeline.apply("one_hot_encode",columns=select_categorical_columns,output=one_hot_output)
                     st.success("One-Hot Encoding Applied Sucessfully")
 
                 if encoding_method=="Label Encoding":
-                    st.session_state.new_df = preprocessing_function.label_encode(st.session_state.new_df,select_categorical_columns)
+                    pipeline.apply("label_encode",columns=select_categorical_columns)
                     st.success("Label Encoding Applied Sucessfully")
 
 
-            st.dataframe(st.session_state.new_df)
+            function.display_preview(pipeline.df, key="encoding_preview")
         else:
             st.info("The dataset does not contain any categorical columns")
 
@@ -260,7 +451,7 @@ else:
 
 
         st.subheader("Feature Scaling")
-        new_df_numerical_columns = st.session_state.new_df.select_dtypes(include=['number']).columns
+        new_df_numerical_columns = analysis.columns_of_type(pipeline.df, ['number'])
         selected_columns = st.multiselect("Select Numerical Columns to Scale", new_df_numerical_columns)
 
         scaling_method = st.selectbox("Select Scaling Method:", ['Standardization', 'Min-Max Scaling'],help=feature_scaling_tooltip)
@@ -268,15 +459,15 @@ else:
         if st.button("Apply Scaling"):
             if selected_columns:
                 if scaling_method == "Standardization":
-                    st.session_state.new_df = preprocessing_function.standard_scale(st.session_state.new_df, selected_columns)
+                    pipeline.apply("standard_scale", columns=selected_columns)
                     st.success("Standardization Applied Successfully.")
                 elif scaling_method == "Min-Max Scaling":
-                    st.session_state.new_df = preprocessing_function.min_max_scale(st.session_state.new_df, selected_columns)
+                    pipeline.apply("min_max_scale", columns=selected_columns)
                     st.success("Min-Max Scaling Applied Successfully.")
             else:
                 st.warning("Please select numerical columns to scale.")
 
-        st.dataframe(st.session_state.new_df)
+        function.display_preview(pipeline.df, key="scaling_preview")
 
         st.subheader("Identify and Handle Outliers")
 
@@ -289,18 +480,25 @@ else:
         st.write(selected_numeric_column)
 
         
-        # Display outliers in a box plot
-        fig, ax = plt.subplots()
-        ax = sns.boxplot(data=st.session_state.new_df, x=selected_numeric_column)
-        st.pyplot(fig)
+        # Display outliers in a box plot drawn from the quartiles, redrawn only when the frame changes
+        box_fig = charts.cached_figure(pipeline.df, "box", [selected_numeric_column], lambda: charts.box(pipeline.df[selected_numeric_column], title=f"Box plot of {selected_numeric_column}"))
+        st.plotly_chart(box_fig, use_container_width=True)
+
 
+        outlier_method = st.selectbox("Select Outlier Detection Method:", list(preprocessing_function.OUTLIER_METHODS), index=1, format_func=preprocessing_function.OUTLIER_METHODS.get)
+        outlier_group = st.selectbox("Detect Outliers Within Groups Of (optional):", [None] + [col for col in pipeline.df.columns if col != selected_numeric_column], format_func=lambda col: "No grouping" if col is None else col)
 
-        outliers = preprocessing_function.detect_outliers_zscore(st.session_state.new_df, selected_numeric_column)
-        if outliers:
-            st.warning("Detected Outliers:")
-            st.write(outliers)
+        outliers = preprocessing_function.detect_outliers(pipeline.df, selected_numeric_column, outlier_method, outlier_group)
+        outlier_count = int(outliers.mask.sum())
+        if outlier_count:
+            st.warning(f"Detected {outlier_count} Outliers:")
+            if outlier_group is None:
+                st.write(f"Values outside [{outliers.lower:.4g}, {outliers.upper:.4g}]")
+            else:
+                st.write(pd.DataFrame({'Lower Bound': outliers.lower, 'Upper Bound': outliers.upper}))
+            st.write(pipeline.df.loc[outliers.mask, selected_numeric_column].sort_values().head(1000).reset_index(drop=True))
         else:
-            st.info("No outliers detected using IQR.")
+            st.info(f"No outliers detected using {preprocessing_function.OUTLIER_METHODS[outlier_method]}.")
 
 
         # Choose handling method
@@ -310,26 +508,57 @@ else:
         if st.button("Apply Outlier Handling"):
             if outlier_handling_method == "Remove Outliers":
                
-                st.session_state.new_df = preprocessing_function.remove_outliers(st.session_state.new_df, selected_numeric_column,outliers)
+                pipeline.apply("remove_outliers", column=selected_numeric_column, method=outlier_method, by=outlier_group)
                 st.success("Outliers removed successfully.")
 
             elif outlier_handling_method == "Transform Outliers":
                 # Provide options for transforming outliers (e.g., capping, log transformation)
-                # Update st.session_state.new_df after transforming outliers
-                st.session_state.new_df = preprocessing_function.transform_outliers(st.session_state.new_df, selected_numeric_column,outliers)
+                pipeline.apply("transform_outliers", column=selected_numeric_column, method=outlier_method, by=outlier_group)
                 st.success("Outliers transformed successfully.")
 
         # Show the updated dataset
-        st.dataframe(st.session_state.new_df)
+        function.display_preview(pipeline.df, key="outliers_preview")
         
-        if st.session_state.new_df is not None:
-            # Convert the DataFrame to CSV
-            csv = st.session_state.new_df.to_csv(index=False)
-            # Encode as base64
-            b64 = base64.b64encode(csv.encode()).decode()
-            # Create a download link
-            href = f'data:file/csv;base64,{b64}'
-            # Display a download button
-            st.markdown(f'<a href="{href}" download="preprocessed_data.csv"><button>Download Preprocessed Data</button></a>', unsafe_allow_html=True)
+        if pipeline.df is not None:
+            # The export only runs when the button is clicked, in chunks, on a thread of its own.
+            # Its errors are kept for the session and shown on the next rerun
+            export_errors = st.session_state.setdefault("export_errors", [])
+            while export_errors:
+                st.error(f"Could not export the data: {export_errors.pop(0)}")
+            export_format = st.selectbox("Export Format", list(exporter.FORMATS))
+            st.download_button(
+                "Download Preprocessed Data",
+                data=functools.partial(exporter.export_reporting_errors, pipeline.df, export_format, export_errors),
+                file_name=exporter.file_name("preprocessed_data", export_format),
+                mime=exporter.FORMATS[export_format][1],
+            )
         else:
             st.warning("No preprocessed data available to download.")
+
+
+# Write the preprocessed frame and the steps of this session to the store when they changed in this run
+if 'pipeline' in st.session_state and st.session_state.get('dataset_key'):
+    store.sync(session_id, st.session_state.dataset_key, st.session_state.pipeline)
+
+
+# Performance panel: the time and allocations of the rerun that just ended, of this session and of the process
+if st.sidebar.checkbox("Performance", key="performance_panel", help="Times every analysis, statistics, plotting, rendering and serialization call of each rerun."):
+    st.sidebar.checkbox("Trace Memory Allocations", key="performance_memory", help="Records the bytes each call allocates with tracemalloc, which slows down the whole app while it is on.")
+    if 'performance' not in st.session_state:
+        st.session_state.performance = instrumentation.SessionPerformance()
+    if trace is not None:
+        st.session_state.performance.add(trace.finish())
+    performance = st.session_state.performance
+    with st.sidebar.expander("Performance", expanded=True):
+        if performance.last is None:
+            st.write("Recording starts with the next rerun.")
+        else:
+            last = performance.last
+            st.write(f"**Last Rerun:** {last.seconds:.3f} s in {len(last.spans)} calls")
+            st.dataframe(last.by_category())
+            st.dataframe(last.summary().head(20), hide_index=True)
+            rerun_seconds = performance.rerun_seconds()
+            st.write(f"**Session:** {len(rerun_seconds)} reruns, median {rerun_seconds.median():.3f} s, slowest {rerun_seconds.max():.3f} s")
+            st.dataframe(performance.summary().head(20), hide_index=True)
+            st.download_button("Download JSON Trace", last.to_json(), file_name="autoeda_trace.json", mime="application/json")
+            st.download_button("Download Prometheus Metrics", instrumentation.process_totals.to_prometheus(), file_name="autoeda_metrics.prom", mime="text/plain")
@@ -0,0 +1,162 @@
+''' This file contains the memoization layer of the analysis and preprocessing functions.
+Streamlit runs main.py from the top on every widget interaction, so without it every statistic of every tab is
+computed again on each click. Results are cached under (dataset version, function, arguments) in an LRU bounded
+by bytes, so a rerun only executes the functions whose inputs changed. Every frame object gets a dataset version
+the first time it is seen; the preprocessing pipeline replaces its frame on every step, undo and redo, so a
+mutation shows up as a new version, and the results of a version are dropped once no frame holds it any more.
+'''
+
+import functools
+import inspect
+import itertools
+import os
+import sys
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+import data_loader
+
+DEFAULT_MEMO_BYTES = int(os.environ.get("AUTOEDA_MEMO_BYTES", 512 * 1024 ** 2))
+
+# id(frame) -> (weak reference to the frame, version)
+_frame_versions = {}
+_version_counter = itertools.count()
+_versions_lock = threading.Lock()
+# frames collected since the last lookup. The weakref callbacks only record them, they can run inside the garbage
+# collector at any allocation, also while this module or a cache holds its lock
+_collected = []
+# callbacks told about versions no live frame holds any more, e.g. the figure cache of charts
+_forget_listeners = []
+
+
+def _collect_forgotten():
+    forgotten = set()
+    with _versions_lock:
+        while _collected:
+            key, version = _collected.pop()
+            entry = _frame_versions.get(key)
+            if entry is not None and entry[1] == version and entry[0]() is None:
+                del _frame_versions[key]
+            forgotten.add(version)
+        # a version shared with a live frame (see share_version) is kept
+        forgotten -= {version for _, version in _frame_versions.values()}
+    for version in forgotten:
+        memo_cache.forget_version(version)
+        for listener in _forget_listeners:
+            listener(version)
+
+
+def _register(df, version):
+    key = id(df)
+    _frame_versions[key] = (weakref.ref(df, lambda _: _collected.append((key, version))), version)
+    return version
+
+
+# Function to get the dataset version of a frame, a number given to each frame object the first time it is seen
+def frame_version(df):
+    _collect_forgotten()
+    with _versions_lock:
+        entry = _frame_versions.get(id(df))
+        if entry is not None and entry[0]() is df:
+            return entry[1]
+        return _register(df, next(_version_counter))
+
+
+# Function to give `df` the version of `source`, for a frame known to hold the same data such as its
+# memory-mapped reload, so the results computed on `source` stay valid for it
+def share_version(df, source):
+    version = frame_version(source)
+    with _versions_lock:
+        return _register(df, version)
+
+
+# Function to give a frame modified in place a new version, so no result computed before the change is returned
+def invalidate(df):
+    with _versions_lock:
+        return _register(df, next(_version_counter))
+
+
+def add_forget_listener(listener):
+    _forget_listeners.append(listener)
+
+
+# Function to estimate the bytes held by a result: frames and arrays by their buffers, containers by their items
+def result_nbytes(value):
+    if isinstance(value, pd.DataFrame):
+        return data_loader.frame_nbytes(value)
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(result_nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(result_nbytes(key) + result_nbytes(item) for key, item in value.items())
+    return sys.getsizeof(value)
+
+
+class MemoCache(data_loader.DatasetCache):
+    '''LRU cache of function results keyed by (dataset version, function, arguments) and evicted by size.'''
+
+    def __init__(self, max_bytes=DEFAULT_MEMO_BYTES):
+        super().__init__(max_bytes)
+
+    # Function to drop every result computed on a dataset version
+    def forget_version(self, version):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == version]:
+                self.bytes_held -= self._entries.pop(key)[1]
+
+
+# Module level cache, shared by every rerun of the script in this process
+memo_cache = MemoCache()
+
+
+# Function to turn an argument into a hashable part of the cache key. Frames are represented by their version
+def _freeze(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return ("frame", frame_version(value))
+    if isinstance(value, pd.Index):
+        return ("index", tuple(value))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(item) for item in value)
+    hash(value)
+    return value
+
+
+# Decorator to memoize a function whose first argument is a dataframe that it does not modify.
+# Arguments named in `ignore` do not change the result (e.g. the executor or query engine that computes it)
+# and are left out of the key. Calls with arguments that cannot be hashed run uncached.
+# Results are returned by reference and shared by every caller of the same frame version, in every session: they
+# are read-only, a caller that needs to change one works on a copy (e.g. Series.rename or DataFrame.assign)
+def memoize(function=None, ignore=(), cache=None):
+    if function is None:
+        return functools.partial(memoize, ignore=ignore, cache=cache)
+    signature = inspect.signature(function)
+    name = f"{function.__module__}.{function.__qualname__}"
+
+    @functools.wraps(function)
+    def wrapper(df, *args, **kwargs):
+        bound = signature.bind(df, *args, **kwargs)
+        bound.apply_defaults()
+        try:
+            arguments = tuple((key, _freeze(value)) for key, value in list(bound.arguments.items())[1:] if key not in ignore)
+        except TypeError:
+            return function(df, *args, **kwargs)
+        # results are wrapped in a tuple, so a function returning None is cached too
+        result = (cache or memo_cache).get_or_load(
+            (frame_version(df), name, arguments),
+            lambda: (function(df, *args, **kwargs),),
+            lambda wrapped: result_nbytes(wrapped[0]),
+        )
+        return result[0]
+
+    wrapper.uncached = function
+    return wrapper
@@ -0,0 +1,192 @@
+''' This file contains the executor that runs column-independent preprocessing transforms in parallel.
+Columns are split into chunks and fanned out to a thread pool, or to a process pool where numeric columns travel
+through shared memory instead of being pickled.
+'''
+
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+# Worker count, columns per task and pool kind can be tuned per deployment with environment variables
+DEFAULT_WORKERS = int(os.environ.get("AUTOEDA_WORKERS", os.cpu_count() or 1))
+DEFAULT_CHUNK_COLUMNS = int(os.environ.get("AUTOEDA_CHUNK_COLUMNS", 4))
+DEFAULT_BACKEND = os.environ.get("AUTOEDA_EXECUTOR", "thread")
+
+# Below this many cells the pool overhead outweighs the work and columns are transformed inline
+MIN_PARALLEL_CELLS = 1_000_000
+
+
+def _is_shareable(values):
+    return isinstance(values, np.ndarray) and values.dtype.kind in "biuf"
+
+
+# Function to copy an array into a new shared memory block. Returns the block and a picklable description of it
+def _to_shared(values):
+    block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+    np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+    return block, (block.name, values.dtype.str, values.shape)
+
+
+def _from_shared(spec):
+    name, dtype, shape = spec
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+
+# Function to copy the values out of a shared memory block and free the block
+def _take_shared(spec):
+    block, array = _from_shared(spec)
+    values = array.copy()
+    del array
+    block.close()
+    block.unlink()
+    return values
+
+
+# Function to free the blocks a task left its results in, for results that will not be read. Blocks already freed
+# are skipped
+def _unlink_results(future):
+    try:
+        outputs = future.result()
+    except Exception:
+        return
+    for _, payload in outputs:
+        if isinstance(payload, tuple):
+            try:
+                block = shared_memory.SharedMemory(name=payload[0])
+            except FileNotFoundError:
+                continue
+            block.close()
+            block.unlink()
+
+
+def _run_inline(transform, kwargs, items):
+    return [(column, transform(values, **kwargs)) for column, values in items]
+
+
+# Runs in a worker process: reads input columns from shared memory and returns numeric results the same way.
+# Columns are transformed by position, with a default index, so the index of the frame is never pickled; the
+# results are arrays the parent assigns back by position
+def _run_shared(transform, kwargs, items):
+    results, out_blocks = [], []
+    try:
+        for column, payload in items:
+            block = None
+            if isinstance(payload, tuple):
+                block, array = _from_shared(payload)
+                values = pd.Series(array, name=column, copy=False)
+            else:
+                values = payload
+            result = transform(values, **kwargs)
+            # fitted transformers and other objects are pickled back as they are
+            result = result.to_numpy() if isinstance(result, pd.Series) else result
+            del values
+            if block is not None:
+                # a transform that left the column unchanged may return a view of the input block, copy it before closing
+                if isinstance(result, np.ndarray) and np.shares_memory(result, array):
+                    result = result.copy()
+                del array
+                block.close()
+
+            if _is_shareable(result):
+                out_block, spec = _to_shared(result)
+                out_blocks.append(out_block)
+                results.append((column, spec))
+            else:
+                results.append((column, result))
+    except BaseException:
+        # the parent never sees the results of a task that raised, their blocks are freed here
+        for out_block in out_blocks:
+            out_block.close()
+            out_block.unlink()
+        raise
+    for out_block in out_blocks:
+        out_block.close()
+    return results
+
+
+class ColumnExecutor:
+    '''Applies a per-column transform to many columns of a frame, in parallel across a thread or process pool.'''
+
+    def __init__(self, workers=DEFAULT_WORKERS, chunk_columns=DEFAULT_CHUNK_COLUMNS, backend=DEFAULT_BACKEND, min_parallel_cells=MIN_PARALLEL_CELLS):
+        if backend not in ("thread", "process"):
+            raise ValueError(f"Unknown executor backend: {backend}")
+        self.workers = max(1, workers)
+        self.chunk_columns = max(1, chunk_columns)
+        self.backend = backend
+        self.min_parallel_cells = min_parallel_cells
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            pool_class = ThreadPoolExecutor if self.backend == "thread" else ProcessPoolExecutor
+            self._pool = pool_class(max_workers=self.workers)
+        return self._pool
+
+    def _chunks(self, columns):
+        return [columns[i:i + self.chunk_columns] for i in range(0, len(columns), self.chunk_columns)]
+
+    # Function to transform every column in `columns`. Returns {column: new values} in the order of `columns`.
+    # transform must be a module level function (picklable) taking a Series and returning values of the same length,
+    # or an object computed from the column such as a fitted transformer
+    def map_columns(self, df, columns, transform, **kwargs):
+        columns = list(columns)
+        if self.workers == 1 or len(columns) < 2 or len(df) * len(columns) < self.min_parallel_cells:
+            return dict(_run_inline(transform, kwargs, [(column, df[column]) for column in columns]))
+        if self.backend == "thread":
+            return self._map_threads(df, columns, transform, kwargs)
+        return self._map_processes(df, columns, transform, kwargs)
+
+    def _map_threads(self, df, columns, transform, kwargs):
+        pool = self._get_pool()
+        futures = [pool.submit(_run_inline, transform, kwargs, [(column, df[column]) for column in chunk]) for chunk in self._chunks(columns)]
+        results = {}
+        for future in futures:
+            results.update(future.result())
+        return {column: results[column] for column in columns}
+
+    def _map_processes(self, df, columns, transform, kwargs):
+        blocks, futures, results = [], [], {}
+        try:
+            # input blocks are created before the pool is first started, so the workers share this process' resource tracker
+            tasks = []
+            for chunk in self._chunks(columns):
+                items = []
+                for column in chunk:
+                    values = df[column].to_numpy()
+                    if _is_shareable(values):
+                        block, spec = _to_shared(values)
+                        blocks.append(block)
+                        items.append((column, spec))
+                    else:
+                        items.append((column, df[column].reset_index(drop=True)))
+                tasks.append(items)
+
+            pool = self._get_pool()
+            futures = [pool.submit(_run_shared, transform, kwargs, items) for items in tasks]
+            for future in futures:
+                for column, payload in future.result():
+                    results[column] = _take_shared(payload) if isinstance(payload, tuple) else payload
+        except BaseException:
+            # once a task raised the results of the other tasks are not read, the blocks they are in are freed
+            for future in futures:
+                if not future.cancel():
+                    _unlink_results(future)
+            raise
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+        return {column: results[column] for column in columns}
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+
+# Executor shared by the preprocessing functions unless one is passed explicitly
+default_executor = ColumnExecutor()
@@ -0,0 +1,158 @@
+''' This file contains the loader for datasets split into many part files, such as partitioned directories written by
+Spark or Hive. Every csv, gzip csv and parquet part under a directory (or matching a glob pattern) is parsed with
+pyarrow on a pool of workers, the parts are brought to one schema and concatenated without copying their buffers,
+and the frame is built in a single conversion. Parts whose columns or types differ from the rest are reported.
+'''
+
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+import parallel_executor
+
+CSV_EXTENSIONS = (".csv", ".csv.gz")
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+PART_EXTENSIONS = CSV_EXTENSIONS + PARQUET_EXTENSIONS
+
+REPORT_COLUMNS = ["Rows", "Missing Columns", "Type Differences"]
+
+
+def _is_part(path):
+    name = os.path.basename(path)
+    # marker and checksum files such as _SUCCESS or .part-0.crc are not data
+    return not name.startswith(("_", ".")) and name.lower().endswith(PART_EXTENSIONS)
+
+
+# Function to list the part files of a directory (searched recursively) or of a glob pattern, in a stable order.
+# With `within`, a part that resolves outside that directory (through a symlink) raises ValueError
+def find_parts(source, within=None):
+    source = os.fspath(source)
+    if os.path.isdir(source):
+        paths = [os.path.join(directory, name) for directory, _, names in os.walk(source) for name in names]
+    else:
+        paths = glob.glob(source, recursive=True)
+    parts = sorted(path for path in paths if os.path.isfile(path) and _is_part(path))
+    if not parts:
+        raise ValueError(f"No csv or parquet files found in {source!r}")
+    if within is not None:
+        within = os.path.realpath(within)
+        outside = [path for path in parts if os.path.commonpath([os.path.realpath(path), within]) != within]
+        if outside:
+            raise ValueError(f"{outside[0]} is outside {within}")
+    return parts
+
+
+# Function to read the key=value directory names between the dataset root and a part, e.g. year=2024/month=01
+def partition_values(path, root):
+    relative = os.path.relpath(os.path.dirname(path), root) if root else ""
+    values = {}
+    for segment in relative.split(os.sep):
+        key, separator, value = segment.partition("=")
+        if separator and key:
+            values[key] = value
+    return values
+
+
+# Function to parse one part into an Arrow table, with its partition values as dictionary columns.
+# Runs on a worker thread or process
+def read_part(path, root=None, use_threads=False):
+    if path.lower().endswith(PARQUET_EXTENSIONS):
+        table = pq.read_table(path, use_threads=use_threads)
+    else:
+        # gzip parts are decompressed by Arrow, which picks the codec from the extension
+        table = pa_csv.read_csv(path, read_options=pa_csv.ReadOptions(use_threads=use_threads))
+    for key, value in partition_values(path, root).items():
+        if key not in table.column_names:
+            indices = pa.array([0] * table.num_rows, type=pa.int32())
+            table = table.append_column(key, pa.DictionaryArray.from_arrays(indices, pa.array([value])))
+    return table
+
+
+# Function to find the type every part can be cast to for each column. Types Arrow can promote (null to any type,
+# int to float, ...) are widened, columns whose types cannot be reconciled are read as strings
+def unify_schemas(schemas):
+    types = {}
+    for schema in schemas:
+        for field in schema:
+            types.setdefault(field.name, []).append(field.type)
+    fields = []
+    for name, column_types in types.items():
+        try:
+            unified = pa.unify_schemas([pa.schema([pa.field(name, column_type)]) for column_type in column_types], promote_options="permissive")
+            fields.append(unified.field(name))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+
+# csv parts read as string, parquet parts written by pandas as large_string, which only differ in their offset width
+def _same_type(left, right):
+    def logical(data_type):
+        if pa.types.is_large_string(data_type):
+            return pa.string()
+        if pa.types.is_large_binary(data_type):
+            return pa.binary()
+        return data_type
+    return logical(left) == logical(right)
+
+
+# Function to list how the schema of each part differs from the unified schema. Parts that match are left out
+def schema_report(paths, tables, schema):
+    rows = {}
+    for path, table in zip(paths, tables):
+        missing = [field.name for field in schema if field.name not in table.column_names]
+        differences = [
+            f"{field.name}: {table.schema.field(field.name).type} → {field.type}"
+            for field in schema
+            if field.name in table.column_names and not _same_type(table.schema.field(field.name).type, field.type)
+        ]
+        if missing or differences:
+            rows[path] = {"Rows": table.num_rows, "Missing Columns": ", ".join(missing), "Type Differences": ", ".join(differences)}
+    return pd.DataFrame.from_dict(rows, orient="index", columns=REPORT_COLUMNS).rename_axis("File")
+
+
+# Function to cast a part to the unified schema, missing columns become nulls. Columns that already have the
+# unified type keep their buffers
+def conform(table, schema):
+    columns = []
+    for field in schema:
+        if field.name not in table.column_names:
+            columns.append(pa.nulls(table.num_rows, field.type))
+        elif table.schema.field(field.name).type == field.type:
+            columns.append(table.column(field.name))
+        else:
+            columns.append(table.column(field.name).cast(field.type))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+# Function to parse every part with `workers` threads or processes and return the tables in the order of `paths`.
+# Arrow's readers release the GIL, so threads already spread the parsing over the cores without pickling the tables
+def read_parts(paths, root=None, workers=None, executor=None):
+    workers = parallel_executor.DEFAULT_WORKERS if workers is None else workers
+    executor = parallel_executor.DEFAULT_BACKEND if executor is None else executor
+    # with fewer parts than workers each part is also parsed on several threads
+    use_threads = len(paths) < workers
+    if workers <= 1 or len(paths) == 1:
+        return [read_part(path, root, use_threads) for path in paths]
+    pool_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    with pool_class(max_workers=min(workers, len(paths))) as pool:
+        return list(pool.map(read_part, paths, [root] * len(paths), [use_threads] * len(paths)))
+
+
+# Function to load every part of a directory or glob pattern into one dataframe, see find_parts for `within`.
+# Returns the frame and the schema report of the parts that differ from the unified schema
+def load_parts(source, workers=None, executor=None, within=None):
+    paths = find_parts(source, within)
+    root = os.fspath(source) if os.path.isdir(source) else None
+    tables = read_parts(paths, root, workers, executor)
+    schema = unify_schemas([table.schema for table in tables])
+    report = schema_report(paths, tables, schema)
+    # the concatenated table references the chunks of every part, nothing is copied until the pandas conversion
+    table = pa.concat_tables([conform(table, schema) for table in tables])
+    del tables
+    return table.to_pandas(split_blocks=True, self_destruct=True), report
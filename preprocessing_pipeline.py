@@ -0,0 +1,220 @@
+''' This file contains the preprocessing pipeline behind the Data Preprocessing tab.
+Every operation is recorded as a step with its parameters, so the pipeline can be undone, redone, saved as json
+and replayed against a fresh file. Steps keep copy-on-write snapshots of only the columns or rows they changed,
+so the memory held per step grows with what the step touched rather than with the dataset. Encoding and scaling
+steps also keep the transformers they fitted, so a replay on new data encodes and scales it the same way.
+'''
+
+import json
+
+import pandas as pd
+
+import data_preprocessing_function as preprocessing_function
+import fitted_transformers
+
+# pandas 3 always uses copy-on-write, earlier versions need it switched on so shallow copies share unchanged columns
+if int(pd.__version__.split(".")[0]) < 3 and hasattr(pd.options.mode, "copy_on_write"):
+    pd.options.mode.copy_on_write = True
+
+# Operations modify either the values of the columns they are given, or which columns / rows exist
+VALUES = "values"
+STRUCTURE = "structure"
+
+
+def _remove_outliers(df, column, method="zscore", by=None):
+    outliers = preprocessing_function.detect_outliers(df, column, method, by)
+    return preprocessing_function.remove_outliers(df, column, outliers)
+
+
+def _transform_outliers(df, column, method="zscore", by=None):
+    outliers = preprocessing_function.detect_outliers(df, column, method, by)
+    return preprocessing_function.transform_outliers(df, column, outliers)
+
+
+# name -> (function called with the frame and the step parameters, what the operation modifies)
+OPERATIONS = {
+    "remove_columns": (lambda df, columns: preprocessing_function.remove_selected_columns(df, columns), STRUCTURE),
+    "remove_rows_with_missing_data": (lambda df, columns: preprocessing_function.remove_rows_with_missing_data(df, columns), STRUCTURE),
+    "fill_missing_data": (lambda df, columns, method: preprocessing_function.fill_missing_data(df, columns, method), VALUES),
+    "one_hot_encode": (lambda df, columns, fitted, output=fitted_transformers.SPARSE: preprocessing_function.one_hot_encode(df, columns, output, fitted), STRUCTURE),
+    "label_encode": (lambda df, columns, fitted: preprocessing_function.label_encode(df, columns, fitted), VALUES),
+    "standard_scale": (lambda df, columns, fitted: preprocessing_function.standard_scale(df, columns, fitted), VALUES),
+    "min_max_scale": (lambda df, columns, fitted, feature_range=(0, 1): preprocessing_function.min_max_scale(df, columns, tuple(feature_range), fitted), VALUES),
+    "remove_outliers": (_remove_outliers, STRUCTURE),
+    "transform_outliers": (_transform_outliers, VALUES),
+}
+
+# Operations that fit a transformer per column. Their steps keep the fitted transformers, so a replay applies the
+# parameters learnt on the original data instead of fitting again
+FITTED_OPERATIONS = set(fitted_transformers.TRANSFORMERS)
+
+
+class Step:
+    '''One applied operation, with what is needed to undo it.'''
+
+    def __init__(self, operation, params, restored=False, fitted=None):
+        self.operation = operation
+        self.params = params
+        # column -> fitted transformer, filled in the first time the step runs
+        self.fitted = {} if fitted is None else fitted
+        # steps restored from a saved session have no undo data until they are run again
+        self.restored = restored
+        self.column_order = None
+        self.index = None
+        self.removed_rows = None
+        self.added_columns = []
+        self.snapshot = {}
+        self.shape_before = None
+        self.shape_after = None
+
+    def columns(self):
+        if "columns" in self.params:
+            return list(self.params["columns"])
+        if "column" in self.params:
+            return [self.params["column"]]
+        return []
+
+    def to_dict(self):
+        step = {"operation": self.operation, "params": self.params}
+        if self.fitted:
+            step["fitted"] = fitted_transformers.fitted_to_list(self.fitted.items())
+        return step
+
+    @classmethod
+    def from_dict(cls, step, restored=False):
+        return cls(step["operation"], step["params"], restored, fitted_transformers.fitted_from_list(step.get("fitted")))
+
+
+class PreprocessingPipeline:
+    '''Undoable sequence of preprocessing steps applied on top of an immutable base frame.'''
+
+    def __init__(self, base_df):
+        self.base = base_df
+        # a shallow copy shares every column with the base until a step writes to it
+        self.df = base_df.copy(deep=False)
+        self.steps = []
+        self.redo_stack = []
+        self.version = 0
+
+    def apply(self, operation, **params):
+        return self.apply_step(Step(operation, params))
+
+    def apply_step(self, step):
+        self._run(step)
+        self.redo_stack.clear()
+        return self.df
+
+    def _run(self, step):
+        function, modifies = OPERATIONS[step.operation]
+        before = self.df
+        params = dict(step.params, fitted=step.fitted) if step.operation in FITTED_OPERATIONS else step.params
+        after = function(before.copy(deep=False), **params)
+
+        step.column_order = list(before.columns)
+        step.shape_before, step.shape_after = before.shape, after.shape
+        step.added_columns = [col for col in after.columns if col not in before.columns]
+        removed_columns = [col for col in before.columns if col not in after.columns]
+        step.snapshot = {col: before[col] for col in removed_columns}
+
+        if modifies == VALUES:
+            step.snapshot.update({col: before[col] for col in step.columns() if col in before.columns})
+
+        if not after.index.equals(before.index):
+            step.index = before.index
+            step.removed_rows = before.loc[before.index.difference(after.index, sort=False)]
+
+        self.df = after
+        step.restored = False
+        self.steps.append(step)
+        self.version += 1
+
+    def undo(self):
+        if not self.steps:
+            return self.df
+        step = self.steps.pop()
+        if step.restored:
+            return self._undo_restored(step)
+        df = self.df.drop(columns=step.added_columns)
+        if step.removed_rows is not None:
+            df = pd.concat([df, step.removed_rows]).loc[step.index]
+        for col, values in step.snapshot.items():
+            df[col] = values
+        self.df = df[step.column_order]
+        self.redo_stack.append(step)
+        self.version += 1
+        return self.df
+
+    # a restored step cannot be reverted from snapshots, the steps before it are run again on the base frame
+    def _undo_restored(self, step):
+        remaining, self.steps = self.steps, []
+        self.df = self.base.copy(deep=False)
+        for previous in remaining:
+            self._run(previous)
+        self.redo_stack.append(step)
+        self.version += 1
+        return self.df
+
+    def redo(self):
+        if not self.redo_stack:
+            return self.df
+        self._run(self.redo_stack.pop())
+        return self.df
+
+    def reset(self):
+        self.df = self.base.copy(deep=False)
+        self.steps.clear()
+        self.redo_stack.clear()
+        self.version += 1
+        return self.df
+
+    def lineage(self):
+        return pd.DataFrame([
+            {
+                "Step": number,
+                "Operation": step.operation,
+                "Parameters": json.dumps(step.params),
+                "Rows": "restored" if step.restored else f"{step.shape_before[0]} → {step.shape_after[0]}",
+                "Columns": "restored" if step.restored else f"{step.shape_before[1]} → {step.shape_after[1]}",
+            }
+            for number, step in enumerate(self.steps, start=1)
+        ], columns=["Step", "Operation", "Parameters", "Rows", "Columns"])
+
+    def to_json(self):
+        return json.dumps({"steps": [step.to_dict() for step in self.steps]}, indent=2)
+
+    # Function to continue a saved session: `df` is the frame the saved steps produced. The steps are kept for the
+    # lineage and for undo without being run again
+    def restore(self, df, pipeline_json):
+        self.df = df
+        self.steps = [Step.from_dict(step, restored=True) for step in load_steps(pipeline_json)]
+        self.redo_stack.clear()
+        self.version += 1
+        return self.df
+
+    # Function to apply every step of a saved pipeline to this pipeline's current frame. Encoders and scalers
+    # saved with their fitted parameters apply them, rather than being fitted on this frame
+    def replay(self, pipeline_json):
+        for step in load_steps(pipeline_json):
+            self.apply_step(Step.from_dict(step))
+        return self.df
+
+    # Function to collect the transformers fitted by the steps, in the order the steps ran
+    def registry(self):
+        registry = fitted_transformers.TransformerRegistry()
+        for step in self.steps:
+            registry.add(step.fitted)
+        return registry
+
+
+# Function to read the steps of a pipeline saved with to_json, rejecting unknown operations
+def load_steps(pipeline_json):
+    steps = json.loads(pipeline_json)["steps"]
+    for step in steps:
+        if step["operation"] not in OPERATIONS:
+            raise ValueError(f"Unknown preprocessing operation: {step['operation']}")
+    return steps
+
+
+# Function to run a saved pipeline on a fresh dataframe and return the result
+def replay(df, pipeline_json):
+    return PreprocessingPipeline(df).replay(pipeline_json)
@@ -0,0 +1,68 @@
+''' This file contains the windowed preview of a dataframe shown by the app in place of the whole frame.
+Rows are sorted and filtered on the server and only a page of rows and of columns is sent to the browser, so the
+payload of an interaction has a fixed size whatever the size of the dataset. The order of the rows that pass the
+filter is memoized on the dataset version (see memo.py), so turning the pages of a sorted frame only slices it.
+'''
+
+import operator
+import re
+
+import numpy as np
+import pandas as pd
+
+import fitted_transformers
+import memo
+
+# Rows per page offered by the preview, and columns shown at once
+PAGE_ROWS = (20, 50, 100, 500)
+PAGE_COLUMNS = 50
+
+# A numeric filter such as ">5", "<= 2.5" or "= 3"
+_COMPARISON = re.compile(r"^\s*(<=|>=|!=|==|=|<|>)\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*$")
+_OPERATORS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge, "=": operator.eq, "==": operator.eq, "!=": operator.ne}
+
+
+# Function to find the rows of a column that match a filter. Numeric columns take comparisons, any column matches
+# the text anywhere in its values, case insensitive. Missing values never match
+def filter_mask(series, text):
+    match = _COMPARISON.match(text)
+    if match and pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        compare = _OPERATORS[match.group(1)]
+        return compare(series, float(match.group(2))).fillna(False).to_numpy(dtype=bool)
+    contains = series.astype("str").str.contains(text, case=False, regex=False)
+    return (contains.fillna(False) & series.notna()).to_numpy(dtype=bool)
+
+
+def _sort_positions(series, ascending):
+    try:
+        ordered = series.reset_index(drop=True).sort_values(ascending=ascending, kind="stable", na_position="last")
+    except TypeError:
+        # object columns mixing types are ordered by their text
+        ordered = series.reset_index(drop=True).astype("str").where(series.notna().to_numpy()).sort_values(ascending=ascending, kind="stable", na_position="last")
+    return ordered.index.to_numpy()
+
+
+def _column(df, column):
+    series = df[column]
+    return series.sparse.to_dense() if isinstance(series.dtype, pd.SparseDtype) else series
+
+
+# Function to find the positions of the rows of the preview, sorted by `sort_by` and filtered by `filter_text` on
+# `filter_column`. Returns None when the rows keep their order and all of them are shown
+@memo.memoize
+def row_positions(df, sort_by=None, ascending=True, filter_column=None, filter_text=""):
+    filtering = filter_column is not None and bool(filter_text)
+    if sort_by is None and not filtering:
+        return None
+    positions = _sort_positions(_column(df, sort_by), ascending) if sort_by is not None else np.arange(len(df))
+    if filtering:
+        positions = positions[filter_mask(_column(df, filter_column), filter_text)[positions]]
+    return positions
+
+
+# Function to cut the window of a frame: `rows` rows from `start` in the order of `positions`, of the given columns.
+# The rows are taken first, so only the window is copied, and sparse columns are densified in the window only
+def window(df, positions, start, rows, columns):
+    stop = start + rows
+    page = df.iloc[start:stop] if positions is None else df.iloc[positions[start:stop]]
+    return fitted_transformers.to_dense(page[list(columns)])
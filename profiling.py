@@ -0,0 +1,262 @@
+''' This file contains the column profiling engine behind the Dataset Overview tab.
+A profile is computed once per dataset and then read by every overview function, instead of each
+function scanning the dataframe again with describe, value_counts, isnull or unique.
+'''
+
+import warnings
+import weakref
+from dataclasses import dataclass, field
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from sketches import HyperLogLog, SpaceSaving
+
+# A column with at most this many distinct values (counting missing values as one) is treated as categorical
+CATEGORICAL_THRESHOLD = 30
+
+# Number of most frequent values kept per column
+TOP_K = 50
+
+QUANTILES = (0.25, 0.5, 0.75)
+
+# Columns longer than this are counted chunk by chunk with sketches, so high-cardinality columns use bounded memory
+SKETCH_CHUNK_ROWS = 1_000_000
+
+# First block scanned when checking a column against the categorical threshold, doubled on every step
+CLASSIFY_BLOCK_ROWS = 4096
+
+SUMMARY_INDEX = ['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max']
+
+
+@dataclass
+class ColumnProfile:
+    name: str
+    dtype: object
+    count: int
+    null_count: int
+    cardinality: int
+    min: float = np.nan
+    max: float = np.nan
+    mean: float = np.nan
+    std: float = np.nan
+    quantiles: dict = field(default_factory=dict)
+    top_values: pd.Series = None
+
+    @property
+    def is_numeric(self):
+        return pd.api.types.is_numeric_dtype(self.dtype) and not pd.api.types.is_bool_dtype(self.dtype)
+
+    @property
+    def is_categorical(self):
+        distinct = self.cardinality + (1 if self.null_count else 0)
+        return distinct <= CATEGORICAL_THRESHOLD or is_text_dtype(self.dtype)
+
+
+# Function to check whether a dtype holds strings (object in pandas 2, str in pandas 3) or categories
+def is_text_dtype(dtype):
+    return pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype)
+
+
+# Function to check whether a column holds more than `limit` distinct values (missing counted as one value).
+# Blocks of rows are scanned in growing sizes and the scan stops as soon as the limit is passed,
+# so a high-cardinality column is decided after its first few thousand rows.
+def has_more_distinct_than(series, limit, block_rows=CLASSIFY_BLOCK_ROWS):
+    seen = None
+    start = 0
+    while start < len(series):
+        distinct = pd.unique(series.iloc[start:start + block_rows])
+        if seen is not None:
+            distinct = pd.unique(pd.concat([pd.Series(seen), pd.Series(distinct)], ignore_index=True))
+        if len(distinct) > limit:
+            return True
+        seen = distinct
+        start += block_rows
+        block_rows *= 2
+    return False
+
+
+# Function to split columns into numerical and categorical without a profile, stopping early on every column
+def classify_columns(df, threshold=CATEGORICAL_THRESHOLD):
+    num_columns, cat_columns = [], []
+    for col in df.columns:
+        values = df[col]
+        if is_text_dtype(values.dtype) or not has_more_distinct_than(values, threshold):
+            cat_columns.append(col.strip())
+        else:
+            num_columns.append(col.strip())
+    return num_columns, cat_columns
+
+
+# Function to count the values of a column. Short columns are counted exactly; longer ones go through a
+# Space-Saving sketch for the top values and a HyperLogLog sketch for the distinct count once the
+# Space-Saving summary overflows. Returns (cardinality, top values, exact)
+def column_value_counts(series, top_k=TOP_K, chunk_rows=SKETCH_CHUNK_ROWS):
+    if len(series) <= chunk_rows:
+        counts = series.value_counts()
+        # categorical columns also report their unused categories with a zero count
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            counts = counts[counts > 0]
+        return len(counts), counts.head(top_k), True
+
+    heavy_hitters, distinct = SpaceSaving(), HyperLogLog()
+    for start in range(0, len(series), chunk_rows):
+        block = series.iloc[start:start + chunk_rows].dropna()
+        heavy_hitters.update(block)
+        distinct.update(block)
+
+    if heavy_hitters.exact:
+        return heavy_hitters.distinct_count(), heavy_hitters.top(top_k), True
+    return distinct.estimate(), heavy_hitters.top(top_k), False
+
+
+# Function to count the missing values of every column. pandas cannot reduce a frame that mixes sparse columns (the
+# one-hot indicators of the preprocessing tab) with dense ones, the sparse columns are counted one at a time
+def null_counts(df):
+    sparse = [col for col, dtype in df.dtypes.items() if isinstance(dtype, pd.SparseDtype)]
+    if not sparse:
+        return df.isnull().sum()
+    counts = df.drop(columns=sparse).isnull().sum()
+    sparse_counts = pd.Series({col: int(df[col].isna().sum()) for col in sparse}, dtype=counts.dtype)
+    return pd.concat([counts, sparse_counts]).reindex(df.columns)
+
+
+# Function to compute min, max, mean, std and quantiles of every numeric column in one vectorized pass
+def numeric_summary(df):
+    numeric_df = df.select_dtypes(include=['number'])
+    if numeric_df.shape[1] == 0:
+        return pd.DataFrame(index=SUMMARY_INDEX)
+
+    values = numeric_df.to_numpy(dtype=np.float64, na_value=np.nan)
+    with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+        warnings.simplefilter('ignore', RuntimeWarning)
+        count = np.sum(~np.isnan(values), axis=0)
+        summary = np.vstack([
+            count,
+            np.nanmean(values, axis=0),
+            np.nanstd(values, axis=0, ddof=1),
+            np.nanmin(values, axis=0),
+            np.nanquantile(values, QUANTILES, axis=0),
+            np.nanmax(values, axis=0),
+        ])
+    return pd.DataFrame(summary, index=SUMMARY_INDEX, columns=numeric_df.columns)
+
+
+class DatasetProfile:
+    '''Per-column profile of a dataframe. Each section is computed on first use and reused afterwards.'''
+
+    # True when the statistics come from sketches rather than from an exact scan
+    approximate = False
+
+    def __init__(self, df, top_k=TOP_K):
+        self._df = df
+        self.top_k = top_k
+        self.n_rows, self.n_columns = df.shape
+        self.dtypes = df.dtypes
+        # columns whose cardinality and top counts come from sketches
+        self.approximate_columns = set()
+
+    @cached_property
+    def null_counts(self):
+        return null_counts(self._df)
+
+    @cached_property
+    def numeric_summary(self):
+        return numeric_summary(self._df)
+
+    @cached_property
+    def value_counts(self):
+        # one hashing pass per column gives both the cardinality and the most frequent values
+        counts = {}
+        for col in self._df.columns:
+            cardinality, top_values, exact = column_value_counts(self._df[col], self.top_k)
+            counts[col] = (cardinality, top_values)
+            if not exact:
+                self.approximate_columns.add(col)
+        return counts
+
+    @cached_property
+    def duplicate_rows(self):
+        return int(self._df.duplicated().sum())
+
+    @cached_property
+    def columns(self):
+        profiles = {}
+        for col in self.dtypes.index:
+            cardinality, top_values = self.value_counts[col]
+            null_count = int(self.null_counts[col])
+            profile = ColumnProfile(
+                name=col,
+                dtype=self.dtypes[col],
+                count=self.n_rows - null_count,
+                null_count=null_count,
+                cardinality=cardinality,
+                top_values=top_values,
+            )
+            if col in self.numeric_summary.columns:
+                stats = self.numeric_summary[col]
+                profile.min, profile.max = stats['min'], stats['max']
+                profile.mean, profile.std = stats['mean'], stats['std']
+                profile.quantiles = {q: stats[f'{q:.0%}'] for q in QUANTILES}
+            profiles[col] = profile
+        return profiles
+
+    def compute(self):
+        # force every section and drop the reference to the dataframe
+        self.columns
+        self.duplicate_rows
+        self._df = None
+        return self
+
+    # Function to summarize columns the way DataFrame.describe does. Numeric columns are read off numeric_summary;
+    # the other columns classified as numerical, such as datetimes with many distinct values, are described by pandas
+    # while the profile still holds the frame, and have missing statistics otherwise
+    def describe(self, columns):
+        columns = list(columns)
+        summary = self.numeric_summary
+        missing = [col for col in columns if col not in summary.columns]
+        if missing and self._df is not None:
+            summary = pd.concat([summary, self._df[missing].describe().reindex(SUMMARY_INDEX)], axis=1)
+        return summary.reindex(columns=columns)
+
+    def missing_summary(self):
+        missing_count = self.null_counts
+        missing_percentage = (missing_count / self.n_rows) * 100 if self.n_rows else missing_count * 0.0
+        return pd.DataFrame({'Missing Count': missing_count, 'Missing Percentage': missing_percentage})
+
+    def top_values(self, column):
+        return self.value_counts[column][1]
+
+    def cardinality(self, column):
+        return self.value_counts[column][0]
+
+    def categorical_numerical(self):
+        num_columns, cat_columns = [], []
+        for col, profile in self.columns.items():
+            if profile.is_categorical:
+                cat_columns.append(col.strip())
+            else:
+                num_columns.append(col.strip())
+        return num_columns, cat_columns
+
+
+# Function to build the profile of a dataframe. Sections are computed lazily unless compute() is called
+def profile_dataset(df, top_k=TOP_K):
+    return DatasetProfile(df, top_k=top_k)
+
+
+_profiles = {}
+
+
+# Function to get the fully computed profile of a dataframe that is never mutated, such as a loaded dataset.
+# The profile is memoized on the identity of the frame and dropped together with the frame.
+def get_profile(df):
+    key = id(df)
+    entry = _profiles.get(key)
+    if entry is not None and entry[0]() is df:
+        return entry[1]
+
+    profile = profile_dataset(df).compute()
+    _profiles[key] = (weakref.ref(df, lambda _: _profiles.pop(key, None)), profile)
+    return profile
@@ -0,0 +1,178 @@
+''' This file contains the query backends behind the grouped aggregations and value counts of the exploration tab.
+pandas is the default. When polars or duckdb are installed the same queries can run on their lazy, multithreaded
+engines, which read only the columns a query needs, straight from a csv / parquet / feather file when given a path.
+Every backend returns plain pandas objects in the same order, so the results are interchangeable.
+'''
+
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+import lazy_imports
+
+# the optional engines are imported the first time a query runs on them, see lazy_imports.py
+pl = lazy_imports.lazy_import("polars") if lazy_imports.is_available("polars") else None
+duckdb = lazy_imports.lazy_import("duckdb") if lazy_imports.is_available("duckdb") else None
+
+# The backend used when none is chosen can be set per deployment with the AUTOEDA_BACKEND environment variable
+DEFAULT_BACKEND = os.environ.get("AUTOEDA_BACKEND", "pandas")
+
+
+def _file_format(path):
+    extension = os.fspath(path).lower().rsplit(".", 1)[-1]
+    if extension in ("parquet", "pq"):
+        return "parquet"
+    if extension in ("feather", "arrow", "ipc"):
+        return "feather"
+    return "csv"
+
+
+def _is_path(source):
+    return isinstance(source, (str, os.PathLike))
+
+
+# Files every backend can query straight from disk. Compressed csv files are read by pandas only
+SCANNABLE_EXTENSIONS = (".csv", ".parquet", ".pq", ".feather", ".arrow", ".ipc")
+
+
+def can_scan(path):
+    return os.fspath(path).lower().endswith(SCANNABLE_EXTENSIONS)
+
+
+def _sort_key(values):
+    # numbers are ordered by value, anything else by its text, so keys of mixed types still sort
+    if pd.api.types.is_numeric_dtype(values.dtype) or pd.api.types.is_bool_dtype(values.dtype):
+        return values
+    return values.astype(str)
+
+
+# Function to put value counts returned by any engine in the same form: counts sorted from most to least
+# frequent, ties by value, with the values converted to plain pandas types
+def counts_result(values, counts, column):
+    counts = pd.Series(np.asarray(counts, dtype=np.int64), index=pd.Index(list(values), name=column), name="count")
+    counts = counts[counts > 0]
+    order = pd.DataFrame({"count": -counts.to_numpy(), "value": _sort_key(counts.index.to_series()).to_numpy()})
+    return counts.iloc[order.sort_values(["count", "value"], kind="stable").index.to_numpy()]
+
+
+# Function to put grouped means returned by any engine in the same form: one row per group sorted by the group value
+def group_mean_result(keys, means, by, column):
+    result = pd.DataFrame({by: pd.Index(list(keys)), column: np.asarray(means, dtype=np.float64)})
+    order = _sort_key(result[by]).sort_values(kind="stable").index
+    return result.loc[order].reset_index(drop=True)
+
+
+class PandasBackend:
+    '''Eager pandas queries, the reference every other backend is checked against.'''
+
+    name = "pandas"
+
+    def _read(self, source, columns):
+        if not _is_path(source):
+            return source[columns]
+        file_format = _file_format(source)
+        if file_format == "parquet":
+            return pd.read_parquet(source, columns=columns)
+        if file_format == "feather":
+            return pd.read_feather(source, columns=columns)
+        return pd.read_csv(source, usecols=columns)
+
+    def value_counts(self, source, column):
+        counts = self._read(source, [column])[column].value_counts()
+        return counts_result(counts.index, counts.to_numpy(), column)
+
+    def group_mean(self, source, by, column):
+        means = self._read(source, list(dict.fromkeys([by, column]))).groupby(by, observed=True)[column].mean()
+        return group_mean_result(means.index, means.to_numpy(), by, column)
+
+
+class PolarsBackend:
+    '''Lazy polars queries. Files are scanned with projection and predicate pushdown.'''
+
+    name = "polars"
+
+    def _scan(self, source, columns):
+        if not _is_path(source):
+            return pl.from_pandas(source[columns]).lazy()
+        file_format = _file_format(source)
+        if file_format == "parquet":
+            return pl.scan_parquet(source).select(columns)
+        if file_format == "feather":
+            # feather files written by pandas can hold dictionary indices polars' ipc scanner rejects, pyarrow reads them
+            return pl.from_arrow(feather.read_table(source, columns=columns, memory_map=True)).lazy()
+        return pl.scan_csv(source).select(columns)
+
+    def value_counts(self, source, column):
+        counts = (
+            self._scan(source, [column])
+            .filter(pl.col(column).is_not_null())
+            .group_by(column)
+            .agg(pl.len().alias("count"))
+            .collect()
+        )
+        return counts_result(counts[column].to_list(), counts["count"].to_numpy(), column)
+
+    def group_mean(self, source, by, column):
+        means = (
+            self._scan(source, list(dict.fromkeys([by, column])))
+            .filter(pl.col(by).is_not_null())
+            .group_by(by)
+            .agg(pl.col(column).cast(pl.Float64).mean().alias("mean"))
+            .collect()
+        )
+        return group_mean_result(means[by].to_list(), means["mean"].to_numpy(), by, column)
+
+
+def _quote(identifier):
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+
+class DuckDBBackend:
+    '''DuckDB SQL queries. Dataframes are scanned in place, files through DuckDB's own readers.'''
+
+    name = "duckdb"
+
+    def _query(self, source, columns, sql):
+        with duckdb.connect() as connection:
+            if _is_path(source):
+                file_format = _file_format(source)
+                # duckdb has no feather reader, those files are read by pyarrow with only the needed columns
+                if file_format == "feather":
+                    connection.register("source", pd.read_feather(source, columns=columns))
+                elif file_format == "parquet":
+                    connection.read_parquet(os.fspath(source)).create_view("source")
+                else:
+                    connection.read_csv(os.fspath(source)).create_view("source")
+            else:
+                connection.register("source", source[columns])
+            return connection.sql(sql).df()
+
+    def value_counts(self, source, column):
+        name = _quote(column)
+        counts = self._query(source, [column], f"SELECT {name} AS value, COUNT(*) AS count FROM source WHERE {name} IS NOT NULL GROUP BY 1")
+        return counts_result(counts["value"], counts["count"], column)
+
+    def group_mean(self, source, by, column):
+        key, value = _quote(by), _quote(column)
+        means = self._query(source, list(dict.fromkeys([by, column])), f"SELECT {key} AS key, AVG(CAST({value} AS DOUBLE)) AS mean FROM source WHERE {key} IS NOT NULL GROUP BY 1")
+        return group_mean_result(means["key"], means["mean"], by, column)
+
+
+BACKENDS = {"pandas": PandasBackend}
+if pl is not None:
+    BACKENDS["polars"] = PolarsBackend
+if duckdb is not None:
+    BACKENDS["duckdb"] = DuckDBBackend
+
+
+def available_backends():
+    return list(BACKENDS)
+
+
+def get_backend(name=None):
+    name = DEFAULT_BACKEND if name is None else name
+    if name not in BACKENDS:
+        raise ValueError(f"Query backend {name!r} is not available, installed backends: {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
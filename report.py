@@ -0,0 +1,77 @@
+''' This file contains the rendering of dataset reports built by analysis.build_report as json or html.
+The html report is a single self-contained page with the overview, column, statistics and missing value tables.
+'''
+
+import html
+import json
+
+import pandas as pd
+
+FORMATS = ("json", "html")
+
+_STYLE = """
+body { font-family: sans-serif; margin: 2em; color: #222; }
+table { border-collapse: collapse; margin-bottom: 2em; }
+th, td { border: 1px solid #ccc; padding: 4px 8px; text-align: right; }
+th { background: #f3f3f3; }
+td:first-child, th:first-child { text-align: left; }
+.note { color: #666; }
+"""
+
+
+def to_json(report):
+    return json.dumps(report, indent=2)
+
+
+def _table(df):
+    return df.to_html(border=0, na_rep="", float_format=lambda value: f"{value:.6g}", escape=True)
+
+
+def to_html(report):
+    dataset = report["dataset"]
+    title = html.escape(f"AutoEDA report: {dataset['name']}" if dataset["name"] else "AutoEDA report")
+    columns = report["columns"]
+
+    overview = pd.DataFrame({"Value": {
+        "Rows": dataset["rows"],
+        "Columns": dataset["columns"],
+        "Duplicates": "not available in streaming mode" if dataset["duplicate_rows"] is None else dataset["duplicate_rows"],
+        "Categorical Columns": len(dataset["categorical_columns"]),
+        "Numerical Columns": len(dataset["numerical_columns"]),
+    }})
+    column_table = pd.DataFrame([
+        {"Column": col["name"], "Data Type": col["dtype"], "Kind": col["kind"], "Distinct": ("~" if col["approximate"] else "") + str(col["distinct"])}
+        for col in columns
+    ]).set_index("Column") if columns else pd.DataFrame()
+    statistics = pd.DataFrame({
+        col["name"]: {"count": col["count"], "mean": col["mean"], "std": col["std"], "min": col["min"], **col["quantiles"], "max": col["max"]}
+        for col in columns if "mean" in col
+    })
+    missing = pd.DataFrame([
+        {"Column": col["name"], "Missing Count": col["missing"], "Missing Percentage": col["missing_percentage"]}
+        for col in sorted(columns, key=lambda col: -col["missing"]) if col["missing"]
+    ])
+
+    sections = [f"<h1>{title}</h1>"]
+    if dataset["approximate"]:
+        sections.append('<p class="note">Streaming mode: distinct counts, quantiles and top values are approximate.</p>')
+    sections += ["<h2>Dataset Overview</h2>", _table(overview), "<h2>Columns</h2>", _table(column_table)]
+    sections += ["<h2>Summary Statistics for Numerical Columns</h2>", _table(statistics) if not statistics.empty else '<p class="note">No numerical columns</p>']
+    sections += ["<h2>Missing Values</h2>", _table(missing.set_index("Column")) if not missing.empty else '<p class="note">No missing values</p>']
+    sections.append("<h2>Most Frequent Values of Categorical Columns</h2>")
+    for col in columns:
+        if col["kind"] == "categorical" and col.get("top_values"):
+            sections += [f"<h3>{html.escape(col['name'])}</h3>", _table(pd.DataFrame(col["top_values"]).set_index("value"))]
+
+    return (
+        f"<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n<title>{title}</title>\n<style>{_STYLE}</style>\n</head>\n"
+        f"<body>\n" + "\n".join(sections) + "\n</body>\n</html>\n"
+    )
+
+
+def render(report, report_format):
+    if report_format == "json":
+        return to_json(report)
+    if report_format == "html":
+        return to_html(report)
+    raise ValueError(f"Unknown report format: {report_format}")
@@ -0,0 +1,184 @@
+''' This file contains the sample behind the fast exploration mode of the Data Exploration tab.
+A simple random or stratified sample of a fixed number of rows is drawn once per frame, and statistics are
+estimated from it with confidence intervals: means with the normal interval (stratified variance when the sample is
+stratified), proportions with the Wilson score interval and quantiles with the distribution-free order statistic
+interval. The cost of a chart or statistic then depends on the sample size, not on the number of rows.
+'''
+
+import os
+from collections import namedtuple
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+import memo
+
+DEFAULT_SAMPLE_ROWS = int(os.environ.get("AUTOEDA_SAMPLE_ROWS", 100_000))
+CONFIDENCE = 0.95
+
+# Columns with more distinct values than this are not offered for stratification, every value takes at least one row
+MAX_STRATA = 1000
+
+# A point estimate with the bounds of its confidence interval
+Estimate = namedtuple('Estimate', ['value', 'low', 'high'])
+
+
+# the normal quantile of the standard library, scipy.stats takes about a second to import
+def _z(confidence):
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+# Function to compute the Wilson score interval of a proportion from `successes` out of `n` trials
+def wilson_interval(successes, n, confidence=CONFIDENCE):
+    if n <= 0:
+        return Estimate(np.nan, np.nan, np.nan)
+    z = _z(confidence)
+    p = successes / n
+    center = (p + z * z / (2 * n)) / (1 + z * z / n)
+    margin = z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return Estimate(p, max(0.0, center - margin), min(1.0, center + margin))
+
+
+# Function to compute the distribution-free interval of a quantile: the order statistics whose ranks bound the
+# binomial(n, q) count of values below the quantile
+def quantile_interval(values, q, confidence=CONFIDENCE):
+    values = np.sort(np.asarray(values, dtype=np.float64)[~np.isnan(values)])
+    n = len(values)
+    if n == 0:
+        return Estimate(np.nan, np.nan, np.nan)
+    z = _z(confidence)
+    spread = z * np.sqrt(n * q * (1 - q))
+    low = int(np.clip(np.floor(n * q - spread), 0, n - 1))
+    high = int(np.clip(np.ceil(n * q + spread), 0, n - 1))
+    return Estimate(np.quantile(values, q), values[low], values[high])
+
+
+class Sample:
+    '''Rows sampled from a frame, with the stratum of each row and the stratum sizes of the whole frame.'''
+
+    def __init__(self, frame, population_rows, strata=None, stratum_rows=None, method="random", by=None):
+        self.frame = frame
+        self.population_rows = population_rows
+        self.method = method
+        self.by = by
+        # a simple random sample is a single stratum
+        self.strata = np.zeros(len(frame), dtype=np.int64) if strata is None else strata
+        self.stratum_rows = np.array([population_rows]) if stratum_rows is None else stratum_rows
+
+    def __len__(self):
+        return len(self.frame)
+
+    # counted by the memo cache, which bounds its entries by bytes
+    def __sizeof__(self):
+        return int(self.frame.memory_usage(index=True, deep=True).sum()) + self.strata.nbytes + self.stratum_rows.nbytes
+
+    @property
+    def is_complete(self):
+        return len(self.frame) >= self.population_rows
+
+    # Function to estimate the mean of a column over the whole frame. Each stratum is weighted by its share of the
+    # rows, the variance includes the finite population correction, so a sample of every row has no uncertainty
+    def mean(self, column, confidence=CONFIDENCE):
+        values = pd.to_numeric(self.frame[column], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+        present = ~np.isnan(values)
+        strata, values, size = self.strata[present], values[present], len(self.stratum_rows)
+        counts = np.bincount(strata, minlength=size)
+        if counts.sum() == 0:
+            return Estimate(np.nan, np.nan, np.nan)
+        means = np.bincount(strata, weights=values, minlength=size) / np.maximum(counts, 1)
+        deviations = np.bincount(strata, weights=(values - means[strata]) ** 2, minlength=size)
+        variances = np.where(counts > 1, deviations / np.maximum(counts - 1, 1), 0.0)
+
+        # strata without values do not take part, the others share their weight
+        weights = np.where(counts > 0, self.stratum_rows, 0.0)
+        weights = weights / weights.sum()
+        correction = np.clip(1 - np.bincount(self.strata, minlength=size) / self.stratum_rows, 0.0, 1.0)
+        estimate = float(np.sum(weights * means))
+        margin = _z(confidence) * np.sqrt(np.sum(weights ** 2 * variances / np.maximum(counts, 1) * correction))
+        return Estimate(estimate, estimate - margin, estimate + margin)
+
+    # Function to estimate the share of the rows of every value of a column, with Wilson intervals.
+    # Stratified rows are weighted by the inverse of their sampling rate and n is Kish's effective sample size
+    def proportions(self, column, confidence=CONFIDENCE):
+        weights = self._row_weights()
+        values = self.frame[column]
+        totals = pd.Series(weights, index=values.index).groupby(values.to_numpy(), dropna=False, sort=False).sum()
+        effective_n = weights.sum() ** 2 / np.sum(weights ** 2)
+        rows = []
+        for value, weight in totals.sort_values(ascending=False).items():
+            estimate = wilson_interval(weight / weights.sum() * effective_n, effective_n, confidence)
+            rows.append({"value": value, "proportion": estimate.value, "low": estimate.low, "high": estimate.high})
+        return pd.DataFrame(rows, columns=["value", "proportion", "low", "high"]).set_index("value").rename_axis(column)
+
+    def proportion_missing(self, column, confidence=CONFIDENCE):
+        missing = self.frame[column].isna().to_numpy()
+        weights = self._row_weights()
+        effective_n = weights.sum() ** 2 / np.sum(weights ** 2)
+        return wilson_interval(weights[missing].sum() / weights.sum() * effective_n, effective_n, confidence)
+
+    # quantiles are read off the rows as sampled, stratified samples are allocated in proportion to the strata and
+    # are close to self-weighting
+    def quantile(self, column, q, confidence=CONFIDENCE):
+        return quantile_interval(pd.to_numeric(self.frame[column], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan), q, confidence)
+
+    # Function to estimate the mean of `column` within every group of `by`, with the interval of each group mean
+    def group_means(self, by, column, confidence=CONFIDENCE):
+        rows = []
+        z = _z(confidence)
+        values = pd.to_numeric(self.frame[column], errors="coerce")
+        for key, group in values.groupby(self.frame[by], observed=True, sort=True):
+            group = group.dropna()
+            mean = group.mean() if len(group) else np.nan
+            margin = z * group.std(ddof=1) / np.sqrt(len(group)) if len(group) > 1 else np.nan
+            rows.append({by: key, column: mean, "low": mean - margin, "high": mean + margin, "rows": len(group)})
+        return pd.DataFrame(rows, columns=[by, column, "low", "high", "rows"])
+
+    def _row_weights(self):
+        sampled = np.bincount(self.strata, minlength=len(self.stratum_rows))
+        return (self.stratum_rows / np.maximum(sampled, 1))[self.strata].astype(np.float64)
+
+
+def _take(df, positions):
+    return df.iloc[np.sort(positions)].reset_index(drop=True)
+
+
+# Function to draw `rows` rows of a frame without replacement, each row equally likely.
+# Drawing positions for a sample much smaller than the frame costs O(rows), not O(len(df))
+@memo.memoize
+def random_sample(df, rows=DEFAULT_SAMPLE_ROWS, seed=0):
+    if rows >= len(df):
+        return Sample(df, len(df))
+    positions = np.random.default_rng(seed).choice(len(df), size=rows, replace=False)
+    return Sample(_take(df, positions), len(df))
+
+
+# Function to draw a sample stratified by the values of a column: every value gets a share of the sample in
+# proportion to its rows, and at least one row, so rare groups are not missed
+@memo.memoize
+def stratified_sample(df, by, rows=DEFAULT_SAMPLE_ROWS, seed=0):
+    codes, _ = pd.factorize(df[by], use_na_sentinel=False)
+    stratum_rows = np.bincount(codes)
+    if len(stratum_rows) > MAX_STRATA:
+        raise ValueError(f"{by!r} has {len(stratum_rows)} distinct values, at most {MAX_STRATA} can be used as strata")
+    if rows >= len(df):
+        return Sample(df, len(df), codes.astype(np.int64), stratum_rows.astype(np.float64), method="stratified", by=by)
+    rng = np.random.default_rng(seed)
+    allocation = np.minimum(stratum_rows, np.maximum(1, np.round(rows * stratum_rows / len(df)).astype(np.int64)))
+
+    order = np.argsort(codes, kind="stable")
+    starts = np.concatenate([[0], np.cumsum(stratum_rows)[:-1]])
+    positions, strata = [], []
+    for stratum, (start, size, take) in enumerate(zip(starts, stratum_rows, allocation)):
+        positions.append(order[start + rng.choice(size, size=take, replace=False)])
+        strata.append(np.full(take, stratum, dtype=np.int64))
+    positions, strata = np.concatenate(positions), np.concatenate(strata)
+    sort = np.argsort(positions)
+    return Sample(_take(df, positions), len(df), strata[sort], stratum_rows.astype(np.float64), method="stratified", by=by)
+
+
+# Function to get the sample of the fast exploration mode, stratified when `by` is given
+def get_sample(df, rows=DEFAULT_SAMPLE_ROWS, by=None, seed=0):
+    if by is None:
+        return random_sample(df, rows, seed)
+    return stratified_sample(df, by, rows, seed)
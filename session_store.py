@@ -0,0 +1,239 @@
+''' This file contains the on-disk session store for the original and preprocessed dataframes.
+Frames are written as uncompressed Feather (Arrow IPC) files under <store>/<session>/<content hash>/, together with
+the preprocessing pipeline json, so a session survives a restart of the Streamlit worker. Frames are read back
+memory-mapped: numeric columns stay views of the file, so only the pages of the columns a widget touches are
+read into memory and the operating system can drop them again under memory pressure. The mapping is private
+(copy on write), so pandas can still modify a column in place without changing the stored file.
+'''
+
+import mmap
+import os
+import secrets
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+import memo
+import preprocessing_pipeline
+import fitted_transformers
+
+# The store location and how long an unused session is kept can be tuned per deployment with environment variables
+DEFAULT_STORE_DIR = os.environ.get("AUTOEDA_STORE_DIR", os.path.join(tempfile.gettempdir(), "autoeda_sessions"))
+DEFAULT_SESSION_TTL = int(os.environ.get("AUTOEDA_SESSION_TTL", 7 * 24 * 3600))
+
+ORIGINAL = "original"
+PREPROCESSED = "preprocessed"
+PIPELINE_FILE = "pipeline.json"
+
+
+def new_session_id():
+    return secrets.token_urlsafe(16)
+
+
+def is_valid_id(value):
+    # ids become directory names, anything that could escape the store is rejected
+    return bool(value) and all(char.isalnum() or char in "-_" for char in value)
+
+
+# Function to turn an Arrow column into a pandas column. Numeric columns without missing values become writable
+# views of the private mapping, every other column is converted by Arrow
+def _column_to_pandas(column, mapped, buffer):
+    if column.num_chunks == 1 and column.null_count == 0 and (pa.types.is_integer(column.type) or pa.types.is_floating(column.type)):
+        chunk = column.chunk(0)
+        dtype = chunk.type.to_pandas_dtype()
+        offset = chunk.buffers()[1].address - buffer.address + chunk.offset * chunk.type.byte_width
+        return np.frombuffer(mapped, dtype=dtype, count=len(chunk), offset=offset)
+    return column.to_pandas().array
+
+
+# Function to memory-map a Feather file privately and read its table, optionally only some of its columns
+def _open_table(path, columns=None):
+    with open(path, "rb") as handle:
+        mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_COPY)
+    buffer = pa.py_buffer(mapped)
+    table = pa.ipc.open_file(buffer).read_all()
+    if columns is not None:
+        table = table.select(columns)
+    return table, mapped, buffer
+
+
+def _index_columns(schema):
+    return [col for col in (schema.pandas_metadata or {}).get("index_columns", []) if isinstance(col, str)]
+
+
+# Function to build a dataframe from a memory-mapped Arrow table written by frame_to_table, restoring its index
+def _table_to_frame(table, mapped, buffer):
+    metadata = table.schema.pandas_metadata or {}
+    index_columns = [col for col in _index_columns(table.schema) if col in table.column_names]
+    data = {name: _column_to_pandas(table.column(name), mapped, buffer) for name in table.column_names if name not in index_columns}
+
+    # a RangeIndex is stored in the metadata only, any other index as columns of the table
+    index = pd.RangeIndex(table.num_rows)
+    ranges = [col for col in metadata.get("index_columns", []) if isinstance(col, dict) and col.get("kind") == "range"]
+    if ranges and ranges[0]["stop"] - ranges[0]["start"] == table.num_rows * ranges[0]["step"]:
+        index = pd.RangeIndex(ranges[0]["start"], ranges[0]["stop"], ranges[0]["step"], name=ranges[0].get("name"))
+    elif index_columns:
+        names = {field.get("field_name"): field.get("name") for field in metadata.get("columns", [])}
+        arrays = [table.column(col).to_pandas() for col in index_columns]
+        index = pd.MultiIndex.from_arrays(arrays) if len(arrays) > 1 else pd.Index(arrays[0])
+        index = index.set_names([names.get(col) for col in index_columns])
+    return pd.DataFrame(data, index=index, copy=False)
+
+
+def _read_schema(path):
+    with pa.memory_map(path) as source:
+        return pa.ipc.open_file(source).schema
+
+
+# sparse one-hot columns are stored dense, Arrow has no sparse type
+def frame_to_table(df):
+    return pa.Table.from_pandas(fitted_transformers.to_dense(df), preserve_index=None)
+
+
+class SessionStore:
+    '''Feather files of the original and preprocessed frames of each session, keyed by session id and content hash.'''
+
+    def __init__(self, root=DEFAULT_STORE_DIR, ttl=DEFAULT_SESSION_TTL):
+        self.root = root
+        self.ttl = ttl
+        # pipeline version last written per (session, dataset), so unchanged pipelines are not written again
+        self._saved_versions = {}
+
+    def _directory(self, session_id, key):
+        if not (is_valid_id(session_id) and is_valid_id(key)):
+            raise ValueError(f"Invalid session or dataset id: {session_id!r}, {key!r}")
+        return os.path.join(self.root, session_id, key)
+
+    def _path(self, session_id, key, name):
+        return os.path.join(self._directory(session_id, key), f"{name}.feather")
+
+    # Files are written next to their destination and renamed over it, so a reader never sees a partial file and
+    # frames still memory-mapped from the previous file keep their data
+    def _write_atomic(self, path, write):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        os.close(handle)
+        try:
+            write(temporary)
+            os.replace(temporary, path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+    def has_frame(self, session_id, key, name):
+        return os.path.exists(self._path(session_id, key, name))
+
+    def save_frame(self, session_id, key, name, df):
+        table = frame_to_table(df)
+        # uncompressed, so the file can be memory-mapped and its buffers used in place
+        self._write_atomic(self._path(session_id, key, name), lambda path: feather.write_feather(table, path, compression="uncompressed"))
+
+    # Function to read a stored frame, memory-mapped. `columns` limits the read to the columns a caller needs
+    def load_frame(self, session_id, key, name, columns=None):
+        path = self._path(session_id, key, name)
+        if columns is not None:
+            columns = list(columns)
+            columns += [col for col in _index_columns(_read_schema(path)) if col not in columns]
+        return _table_to_frame(*_open_table(path, columns))
+
+    def column_names(self, session_id, key, name):
+        schema = _read_schema(self._path(session_id, key, name))
+        index_columns = set(_index_columns(schema))
+        return [col for col in schema.names if col not in index_columns]
+
+    def save_pipeline(self, session_id, key, pipeline):
+        path = os.path.join(self._directory(session_id, key), PIPELINE_FILE)
+        pipeline_json = pipeline.to_json()
+
+        def write(temporary):
+            with open(temporary, "w") as handle:
+                handle.write(pipeline_json)
+
+        self._write_atomic(path, write)
+
+    def load_pipeline(self, session_id, key):
+        path = os.path.join(self._directory(session_id, key), PIPELINE_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path) as handle:
+            return handle.read()
+
+    # Function to find the dataset a session worked on last, used to restore a session after a restart
+    def latest(self, session_id):
+        if not is_valid_id(session_id):
+            return None
+        directory = os.path.join(self.root, session_id)
+        if not os.path.isdir(directory):
+            return None
+        datasets = [entry for entry in os.scandir(directory) if entry.is_dir() and os.path.exists(os.path.join(entry.path, f"{ORIGINAL}.feather"))]
+        if not datasets:
+            return None
+        return max(datasets, key=lambda entry: entry.stat().st_mtime).name
+
+    # Function to get the preprocessing pipeline of a session. A pipeline saved earlier continues from the stored
+    # preprocessed frame, otherwise a new pipeline starts from base_df and the original frame is stored
+    def open_pipeline(self, session_id, key, base_df):
+        pipeline = preprocessing_pipeline.PreprocessingPipeline(base_df)
+        pipeline_json = self.load_pipeline(session_id, key)
+        if pipeline_json is not None and self.has_frame(session_id, key, PREPROCESSED):
+            pipeline.restore(self.load_frame(session_id, key, PREPROCESSED), pipeline_json)
+        elif not self.has_frame(session_id, key, ORIGINAL):
+            self.save_frame(session_id, key, ORIGINAL, base_df)
+        self._saved_versions[(session_id, key)] = pipeline.version
+        return pipeline
+
+    # Function to write the pipeline and its current frame when they changed since the last write. The frame is
+    # then swapped for its memory-mapped copy, so the session stops holding it in process memory.
+    # Returns False when the frame has columns Arrow cannot store, the session then lives in memory only
+    def sync(self, session_id, key, pipeline):
+        if self._saved_versions.get((session_id, key)) == pipeline.version:
+            return True
+        try:
+            self.save_frame(session_id, key, PREPROCESSED, pipeline.df)
+        except (pa.ArrowException, TypeError, ValueError):
+            return False
+        self.save_pipeline(session_id, key, pipeline)
+        self._saved_versions[(session_id, key)] = pipeline.version
+
+        mapped = self.load_frame(session_id, key, PREPROCESSED)
+        # columns whose type does not survive the round trip (e.g. nullable integers) keep the in-memory frame
+        if mapped.columns.equals(pipeline.df.columns) and mapped.dtypes.equals(pipeline.df.dtypes) and mapped.index.equals(pipeline.df.index):
+            # the mapped frame holds the same data, results memoized on the in-memory frame stay valid for it
+            memo.share_version(mapped, pipeline.df)
+            pipeline.df = mapped
+        return True
+
+    def delete(self, session_id):
+        if is_valid_id(session_id):
+            shutil.rmtree(os.path.join(self.root, session_id), ignore_errors=True)
+        self._saved_versions = {saved: version for saved, version in self._saved_versions.items() if saved[0] != session_id}
+
+    # Function to delete sessions that were not written to for longer than the ttl
+    def prune(self, now=None):
+        now = time.time() if now is None else now
+        if not os.path.isdir(self.root):
+            return []
+        expired = []
+        for entry in os.scandir(self.root):
+            if not entry.is_dir():
+                continue
+            modified = max([entry.stat().st_mtime] + [dataset.stat().st_mtime for dataset in os.scandir(entry.path)])
+            if now - modified > self.ttl:
+                self.delete(entry.name)
+                expired.append(entry.name)
+        return expired
+
+    def disk_usage(self, session_id):
+        directory = os.path.join(self.root, session_id) if is_valid_id(session_id) else None
+        if directory is None or not os.path.isdir(directory):
+            return 0
+        return int(sum(os.path.getsize(os.path.join(path, name)) for path, _, names in os.walk(directory) for name in names))
+
+
+# Module level store, shared by every session of this process
+session_store = SessionStore()
@@ -0,0 +1,238 @@
+''' This file contains the bounded-memory sketches used to profile datasets that are read in chunks.
+Every sketch can be updated one chunk at a time and merged with another sketch of the same kind,
+so the memory they hold does not grow with the number of rows.
+'''
+
+import numpy as np
+import pandas as pd
+
+
+class MomentsAccumulator:
+    '''Running count, mean and variance of many numeric columns (Welford, merged per chunk with Chan's formula).'''
+
+    def __init__(self, n_columns=0):
+        self.count = np.zeros(n_columns)
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+        self.min = np.full(n_columns, np.inf)
+        self.max = np.full(n_columns, -np.inf)
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == 1:
+            values = values[:, None]
+        valid = ~np.isnan(values)
+        count = valid.sum(axis=0).astype(np.float64)
+        filled = np.where(valid, values, 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count > 0, filled.sum(axis=0) / count, 0.0)
+        m2 = (np.where(valid, values - mean, 0.0) ** 2).sum(axis=0)
+
+        other = MomentsAccumulator()
+        other.count, other.mean, other.m2 = count, mean, m2
+        other.min = np.where(valid, values, np.inf).min(axis=0, initial=np.inf)
+        other.max = np.where(valid, values, -np.inf).max(axis=0, initial=-np.inf)
+        self.merge(other)
+
+    def merge(self, other):
+        if len(self.count) == 0:
+            self.count, self.mean, self.m2 = other.count.copy(), other.mean.copy(), other.m2.copy()
+            self.min, self.max = other.min.copy(), other.max.copy()
+            return self
+
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(total > 0, other.count / total, 0.0)
+        self.mean = self.mean + delta * weight
+        self.m2 = self.m2 + other.m2 + delta ** 2 * self.count * weight
+        self.count = total
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        return self
+
+    def variance(self, ddof=1):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > ddof, self.m2 / (self.count - ddof), np.nan)
+
+    def std(self, ddof=1):
+        return np.sqrt(self.variance(ddof))
+
+
+class QuantileSketch:
+    '''Mergeable quantile sketch holding at most about `compression` weighted centroids (a merging t-digest).'''
+
+    def __init__(self, compression=200):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self._compress(np.concatenate([self.means, values]), np.concatenate([self.weights, np.ones(len(values))]))
+        return self
+
+    def merge(self, other):
+        if len(other.weights) == 0:
+            return self
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(np.concatenate([self.means, other.means]), np.concatenate([self.weights, other.weights]))
+        return self
+
+    def _compress(self, means, weights):
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        cumulative = np.cumsum(weights)
+        total = cumulative[-1]
+
+        # the arcsine scale keeps centroids small near the tails, where quantiles need the most precision
+        q = (cumulative - weights / 2) / total
+        scale = np.floor(self.compression * (np.arcsin(2 * q - 1) / np.pi + 0.5))
+        starts = np.flatnonzero(np.r_[True, scale[1:] != scale[:-1]])
+
+        merged_weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / merged_weights
+        self.weights = merged_weights
+
+    def quantile(self, q):
+        if len(self.weights) == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        cumulative = np.cumsum(self.weights)
+        centers = cumulative - self.weights / 2
+        positions = np.concatenate([[0.0], centers, [cumulative[-1]]])
+        values = np.concatenate([[self.min], self.means, [self.max]])
+        return np.interp(np.asarray(q) * cumulative[-1], positions, values)
+
+
+class SpaceSaving:
+    '''Space-Saving heavy hitter sketch, monitoring at most `capacity` values with their counts and error bounds.'''
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+        self.errors = pd.Series(dtype=np.int64)
+        # while no counter has ever been evicted, the counts and the number of distinct values are exact
+        self.exact = True
+
+    def update(self, values):
+        counts = pd.Series(values).value_counts()
+        return self._merge(counts, pd.Series(0, index=counts.index, dtype=np.int64), exact=True)
+
+    def merge(self, other):
+        return self._merge(other.counts, other.errors, other.exact)
+
+    def _min_count(self, counts):
+        # a full summary may have missed a value up to as many times as its smallest counter
+        return int(counts.min()) if len(counts) >= self.capacity else 0
+
+    def _merge(self, counts, errors, exact):
+        own_floor = self._min_count(self.counts)
+        other_floor = 0 if exact else self._min_count(counts)
+        keys = self.counts.index.union(counts.index)
+        merged_counts = self.counts.reindex(keys, fill_value=own_floor) + counts.reindex(keys, fill_value=other_floor)
+        merged_errors = self.errors.reindex(keys, fill_value=own_floor) + errors.reindex(keys, fill_value=other_floor)
+
+        self.exact = self.exact and exact and len(keys) <= self.capacity
+        if len(keys) > self.capacity:
+            merged_counts = merged_counts.nlargest(self.capacity)
+        self.counts = merged_counts.astype(np.int64)
+        self.errors = merged_errors.reindex(self.counts.index).astype(np.int64)
+        return self
+
+    def top(self, k):
+        top_counts = self.counts.sort_values(ascending=False, kind='stable').head(k)
+        top_counts.name = 'count'
+        return top_counts
+
+    def distinct_count(self):
+        # exact while the summary never overflowed, a lower bound afterwards
+        return len(self.counts)
+
+
+class HyperLogLog:
+    '''HyperLogLog distinct counter with 2**precision one-byte registers (about 1.04 / sqrt(2**precision) relative error).'''
+
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values):
+        values = pd.Series(values).dropna()
+        if len(values) == 0:
+            return self
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+        buckets = (hashes >> np.uint64(64 - self.precision)).astype(np.intp)
+        remainder = hashes << np.uint64(self.precision)
+
+        # rank is the position of the first set bit of the remaining hash bits; frexp is exact on 32-bit halves
+        high = (remainder >> np.uint64(32)).astype(np.float64)
+        low = (remainder & np.uint64(0xFFFFFFFF)).astype(np.float64)
+        bit_length = np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+        ranks = np.minimum(65 - bit_length, 64 - self.precision + 1).astype(np.uint8)
+
+        np.maximum.at(self.registers, buckets, ranks)
+        return self
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = np.count_nonzero(self.registers == 0)
+        # linear counting is more accurate while many registers are still empty
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * np.log(m / zeros)))
+        return int(round(raw))
+
+
+class ReservoirSample:
+    '''Uniform random sample of at most `size` rows from a stream of dataframe chunks (vectorized Algorithm R).'''
+
+    def __init__(self, size=100_000, seed=None):
+        self.size = size
+        self.seen = 0
+        self.sample = None
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, chunk):
+        n = len(chunk)
+        positions = np.arange(self.seen, self.seen + n)
+        # row i of the stream takes slot j, drawn uniformly from [0, i], whenever j falls inside the reservoir
+        slots = np.where(positions < self.size, positions, self._rng.integers(0, positions + 1))
+        accepted = np.flatnonzero(slots < self.size)
+        self.seen += n
+        if len(accepted) == 0:
+            return self
+
+        # when two rows of the chunk take the same slot the later one wins, as it would one row at a time
+        reversed_slots = slots[accepted][::-1]
+        _, first = np.unique(reversed_slots, return_index=True)
+        rows = accepted[::-1][first]
+
+        incoming = chunk.iloc[rows]
+        incoming.index = slots[rows]
+        if self.sample is None:
+            self.sample = incoming
+        else:
+            self.sample = pd.concat([self.sample.drop(index=incoming.index, errors='ignore'), incoming])
+        return self
+
+    def to_frame(self):
+        if self.sample is None:
+            return pd.DataFrame()
+        return self.sample.sort_index().reset_index(drop=True)
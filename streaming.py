@@ -0,0 +1,158 @@
+''' This file contains the streaming ingestion mode for csv files that do not fit in memory.
+The file is read in fixed-size chunks and the column profile is accumulated with the sketches in sketches.py,
+keeping only a bounded reservoir sample of rows for previews and plots.
+'''
+
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+import profiling
+from sketches import HyperLogLog, MomentsAccumulator, QuantileSketch, ReservoirSample, SpaceSaving
+
+DEFAULT_CHUNK_ROWS = 200_000
+DEFAULT_SAMPLE_ROWS = 100_000
+HEAVY_HITTER_CAPACITY = 1000
+
+
+class StreamingProfile(profiling.DatasetProfile):
+    '''DatasetProfile accumulated one chunk at a time. Statistics cover every row, `sample` holds a bounded subset.'''
+
+    approximate = True
+
+    def __init__(self, top_k=profiling.TOP_K, sample_rows=DEFAULT_SAMPLE_ROWS, capacity=HEAVY_HITTER_CAPACITY, seed=None):
+        self._df = None
+        self.top_k = top_k
+        self.capacity = capacity
+        self.n_rows, self.n_columns = 0, 0
+        self.dtypes = pd.Series(dtype=object)
+        self.sample = None
+        self.chunks = 0
+
+        self._columns = None
+        self._text_columns = set()
+        self._null_counts = None
+        self._moments = {}
+        self._quantiles = {}
+        self._heavy_hitters = {}
+        self._distinct = {}
+        self._reservoir = ReservoirSample(sample_rows, seed=seed)
+
+    def update(self, chunk):
+        if self._columns is None:
+            self._columns = list(chunk.columns)
+            self._null_counts = pd.Series(0, index=chunk.columns, dtype=np.int64)
+            for col in self._columns:
+                self._moments[col] = MomentsAccumulator()
+                self._quantiles[col] = QuantileSketch()
+                self._heavy_hitters[col] = SpaceSaving(self.capacity)
+                self._distinct[col] = HyperLogLog()
+
+        self._null_counts += chunk.isnull().sum()
+        for col in self._columns:
+            values = chunk[col]
+            is_numeric = pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype)
+
+            # a column is numeric only if every chunk parsed it as numeric
+            if not is_numeric and values.notna().any():
+                self._text_columns.add(col)
+            if is_numeric and col not in self._text_columns:
+                array = values.to_numpy(dtype=np.float64, na_value=np.nan)
+                self._moments[col].update(array)
+                self._quantiles[col].update(array)
+            present = values.dropna()
+            self._heavy_hitters[col].update(present)
+            self._distinct[col].update(present)
+
+        self._reservoir.update(chunk)
+        self.n_rows += len(chunk)
+        self.chunks += 1
+        return self
+
+    def finish(self):
+        self.sample = self._reservoir.to_frame()
+        self.n_columns = len(self._columns or [])
+        dtypes = self.sample.dtypes.copy()
+        for col in self._text_columns:
+            dtypes[col] = np.dtype(object)
+        self.dtypes = dtypes
+
+        self.null_counts = self._null_counts if self._null_counts is not None else pd.Series(dtype=np.int64)
+        # the heavy hitter summary is exact until it overflows, after that the distinct count comes from HyperLogLog
+        self.value_counts = {}
+        self.approximate_columns = set()
+        for col, sketch in self._heavy_hitters.items():
+            cardinality = sketch.distinct_count() if sketch.exact else self._distinct[col].estimate()
+            self.value_counts[col] = (cardinality, sketch.top(self.top_k))
+            if not sketch.exact:
+                self.approximate_columns.add(col)
+        # exact duplicate detection needs every row, it is not available when streaming
+        self.duplicate_rows = None
+
+        numeric_columns = [col for col in self._columns or [] if col not in self._text_columns and self._moments[col].count.size]
+        summary = {}
+        for col in numeric_columns:
+            moments, quantiles = self._moments[col], self._quantiles[col]
+            count = moments.count[0]
+            summary[col] = [
+                count,
+                moments.mean[0] if count else np.nan,
+                moments.std()[0],
+                moments.min[0] if count else np.nan,
+                *quantiles.quantile(profiling.QUANTILES),
+                moments.max[0] if count else np.nan,
+            ]
+        self.numeric_summary = pd.DataFrame(summary, index=profiling.SUMMARY_INDEX, columns=numeric_columns)
+        return self
+
+
+# Function to profile a csv file chunk by chunk. The returned profile carries the reservoir sample in `sample`
+def stream_profile(source, chunk_rows=DEFAULT_CHUNK_ROWS, sample_rows=DEFAULT_SAMPLE_ROWS, top_k=profiling.TOP_K, seed=0):
+    profile = StreamingProfile(top_k=top_k, sample_rows=sample_rows, seed=seed)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    with pd.read_csv(source, chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            profile.update(chunk)
+    return profile.finish()
+
+
+def _is_parquet(source):
+    return os.fspath(source).lower().endswith((".parquet", ".pq"))
+
+
+# Function to find the dtypes a csv file must be read with so every chunk gets the same ones. pandas infers the
+# dtypes of each chunk on its own: a column empty in the first chunks is float there and text later, an integer
+# column is float in the chunks where it has missing values. Only the columns whose dtype changes between chunks are
+# returned, as float64 when all their values are numbers and as text otherwise. Parquet files have a schema, None
+def chunk_dtypes(source, chunk_rows=DEFAULT_CHUNK_ROWS):
+    if _is_parquet(source):
+        return None
+    seen, filled = {}, {}
+    with pd.read_csv(source, chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            for column, dtype in chunk.dtypes.items():
+                seen.setdefault(column, set()).add(dtype)
+                if chunk[column].notna().any():
+                    filled.setdefault(column, set()).add(dtype)
+    dtypes = {}
+    for column, kinds in seen.items():
+        values = filled.get(column)
+        if len(kinds) == 1 or not values:
+            continue
+        numeric = all(pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype) for dtype in values)
+        dtypes[column] = "float64" if numeric else "str"
+    return dtypes
+
+
+# Function to read a csv or parquet file `chunk_rows` rows at a time, parquet files one batch of row groups at a time.
+# `dtype` is passed to read_csv, see chunk_dtypes
+def read_chunks(source, chunk_rows=DEFAULT_CHUNK_ROWS, dtype=None):
+    if _is_parquet(source):
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+        return
+    with pd.read_csv(source, chunksize=chunk_rows, dtype=dtype) as reader:
+        yield from reader